@@ -0,0 +1,310 @@
+"""
+Creation date: 2026, October
+Author: L. Gardy
+E-mail: ludovic.gardy@cnrs.fr
+Encoding: UTF-8
+
+Related publication
+--------------------
+Title: A meta-analysis of semantic memory in prodromal Alzheimer’s Disease.
+Authors: Joubert S., Gardy L., Didic M., Rouleau I., Barbeau E.J.
+Journal: Neuropsychology Review, 31(2): 221-232, 2021.
+DOI: https://doi.org/10.1007/s11065-020-09453-5
+
+# Note
+#---------
+# Benchmarks of the pipeline stages on synthetic tables (benchmarks/synthetic_data.py):
+#   python -m benchmarks.run_benchmarks                       # k = 10 ... 10^4
+#   python -m benchmarks.run_benchmarks --k 10 1000 1000000   # up to a million studies
+#   python -m benchmarks.run_benchmarks --save-baseline       # store the reference timings
+# Each run writes its timings and peak memory to benchmarks/results/, and exits with
+# status 1 when a stage is slower than the baseline. Baselines depend on the machine,
+# so they are not committed.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic_data import make_input_data
+from modules.calculate_random_effect import calculate_random_effect
+from modules.meta_analysis import calculate_fail_safe_N
+from modules.plot_results import plot_meta_analysis
+from modules.prepare_meta_dataframe import prepare_meta_dataframe
+from modules.utils import get_authors_with_multiple_measures
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(BENCHMARKS_DIR, "baseline.json")
+DEFAULT_RESULTS_DIR = os.path.join(BENCHMARKS_DIR, "results")
+DEFAULT_K = [10, 100, 1000, 10000]
+STAGES = [
+    "get_authors_with_multiple_measures",
+    "prepare_meta_dataframe",
+    "calculate_random_effect",
+    "calculate_fail_safe_N",
+    "plot_meta_analysis",
+]
+
+
+def build_stages(
+    input_data: pd.DataFrame,
+    effect_size_method: str,
+    output_dir: str,
+    output_format: str = "csv",
+):
+    """
+    The benchmarked stages, as (name, function) pairs run in order. Each function reads
+    the results of the previous stages from a shared dict and adds its own.
+    """
+    state = {}
+
+    def authors():
+        state["studies"] = get_authors_with_multiple_measures(input_data)
+
+    def prepare():
+        state["dataset"] = prepare_meta_dataframe(
+            input_data,
+            state["studies"],
+            effect_size_method,
+            output_format,
+            output_dir,
+            as_dataset=True,
+        )
+        state["global_scores_table"] = (
+            state["dataset"].study_rows().to_frame(mean_suffix=False)
+        )
+
+    def random_effect():
+        table = state["global_scores_table"]
+        state["random_effect_results"] = calculate_random_effect(
+            table["d"].to_numpy(),
+            table["Weight"].to_numpy(),
+            table["Var"].to_numpy(),
+            len(table),
+        )
+
+    def fail_safe():
+        table = state["global_scores_table"]
+        state["fail_safe_N"] = calculate_fail_safe_N(
+            table["d"].tolist(),
+            table["Weight"].tolist(),
+            table["Var"].tolist(),
+            len(table),
+            table,
+        )
+
+    def plot():
+        table = state["global_scores_table"]
+        results = state["random_effect_results"]
+        with contextlib.redirect_stdout(io.StringIO()):
+            plot_meta_analysis(
+                len(table),
+                table,
+                table["Weight"].tolist(),
+                results.Mstar,
+                len(table),
+                results.T_squared,
+                results.p_val_text,
+                results.IC95text,
+                state["fail_safe_N"],
+                output_path=os.path.join(output_dir, "forest_plot.png"),
+            )
+
+    return list(zip(STAGES, [authors, prepare, random_effect, fail_safe, plot]))
+
+
+def benchmark_size(
+    k: int,
+    repeat: int = 3,
+    seed: int = 0,
+    effect_size_method: str = "Hedges_g",
+    max_plot_k: int = 200,
+    output_format: str = "csv",
+):
+    """
+    Time every stage on a synthetic table of k studies.
+
+    Each stage is timed repeat times, then run once more under tracemalloc for its peak
+    memory (tracemalloc slows the code down, so it is kept out of the timings). The
+    forest plot is skipped above max_plot_k studies. output_format is the format of the
+    meta_frame written by prepare_meta_dataframe.
+    """
+    input_data = make_input_data(k, seed=seed)
+    records = []
+    with tempfile.TemporaryDirectory() as output_dir:
+        stages = build_stages(input_data, effect_size_method, output_dir, output_format)
+        timings = {name: [] for name, _ in stages}
+        for _ in range(repeat):
+            for name, function in stages:
+                if name == "plot_meta_analysis" and k > max_plot_k:
+                    continue
+                start = time.perf_counter()
+                function()
+                timings[name].append(time.perf_counter() - start)
+
+        for name, function in stages:
+            if not timings[name]:
+                continue
+            tracemalloc.start()
+            function()
+            _, peak_memory = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            records.append(
+                {
+                    "k": k,
+                    "rows": len(input_data),
+                    "stage": name,
+                    "seconds_min": min(timings[name]),
+                    "seconds_median": statistics.median(timings[name]),
+                    "peak_memory_bytes": peak_memory,
+                }
+            )
+    return records
+
+
+def compare_with_baseline(
+    records: list, baseline: dict, tolerance: float = 0.25, min_seconds: float = 0.005
+):
+    """
+    Stages slower than the baseline: best time above (1 + tolerance) x the baseline
+    best time, and by more than min_seconds (timer noise on the fastest stages).
+    """
+    reference = {
+        (record["k"], record["stage"]): record["seconds_min"]
+        for record in baseline["results"]
+    }
+    regressions = []
+    for record in records:
+        key = (record["k"], record["stage"])
+        if key not in reference:
+            continue
+        limit = max(reference[key] * (1 + tolerance), reference[key] + min_seconds)
+        if record["seconds_min"] > limit:
+            regressions.append(
+                {**record, "baseline_seconds_min": reference[key], "limit": limit}
+            )
+    return regressions
+
+
+def get_metadata(args):
+    return {
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "seed": args.seed,
+        "repeat": args.repeat,
+        "effect_size_method": args.method,
+        "output_format": args.output_format,
+    }
+
+
+def save_json(content: dict, path: str):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as file:
+        json.dump(content, file, indent=2)
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.run_benchmarks",
+        description="Time and memory of the pipeline stages on synthetic tables.",
+    )
+    parser.add_argument(
+        "--k", type=int, nargs="+", default=DEFAULT_K, help="numbers of studies"
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--method",
+        default="Hedges_g",
+        choices=["Hedges_g", "Cohens_d", "Glass_delta"],
+    )
+    parser.add_argument(
+        "--max-plot-k",
+        type=int,
+        default=200,
+        help="skip the forest plot above this number of studies",
+    )
+    parser.add_argument(
+        "--output-format",
+        default="csv",
+        choices=["csv", "parquet", "arrow"],
+        help="format of the tables written by prepare_meta_dataframe",
+    )
+    parser.add_argument("--output", help="JSON results file (default: results/)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="store these results as the baseline instead of comparing",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="allowed slowdown over the baseline (default: 0.25, i.e. 25%%)",
+    )
+    args = parser.parse_args(argv)
+
+    records = []
+    for k in args.k:
+        for record in benchmark_size(
+            k,
+            args.repeat,
+            args.seed,
+            args.method,
+            args.max_plot_k,
+            args.output_format,
+        ):
+            records.append(record)
+            print(
+                f"k = {k:>8} | {record['stage']:<34} | {record['seconds_min']:10.4f} s | {record['peak_memory_bytes'] / 1024**2:9.1f} MB"
+            )
+
+    content = {"metadata": get_metadata(args), "results": records}
+    output_path = args.output or os.path.join(
+        DEFAULT_RESULTS_DIR,
+        "benchmark_{}.json".format(datetime.now().strftime("%Y%m%d_%H%M%S")),
+    )
+    print(f"Results written to {save_json(content, output_path)}")
+
+    if args.save_baseline:
+        print(f"Baseline written to {save_json(content, args.baseline)}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline} (run with --save-baseline first)")
+        return 0
+
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    regressions = compare_with_baseline(records, baseline, args.tolerance)
+    for regression in regressions:
+        print(
+            f"REGRESSION k = {regression['k']} | {regression['stage']} | {regression['seconds_min']:.4f} s > {regression['limit']:.4f} s (baseline {regression['baseline_seconds_min']:.4f} s)"
+        )
+    if regressions:
+        return 1
+    print("No stage slower than the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
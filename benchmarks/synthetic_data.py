@@ -0,0 +1,139 @@
+"""
+Creation date: 2026, October
+Author: L. Gardy
+E-mail: ludovic.gardy@cnrs.fr
+Encoding: UTF-8
+
+Related publication
+--------------------
+Title: A meta-analysis of semantic memory in prodromal Alzheimer’s Disease.
+Authors: Joubert S., Gardy L., Didic M., Rouleau I., Barbeau E.J.
+Journal: Neuropsychology Review, 31(2): 221-232, 2021.
+DOI: https://doi.org/10.1007/s11065-020-09453-5
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+INPUT_COLUMNS = [
+    "Authors",
+    "Authors_save",
+    "MCI_size",
+    "MCI_Mean",
+    "MCI_SD",
+    "MCI_Var",
+    "Control_size",
+    "Control_Mean",
+    "Control_SD",
+    "Control_VAR",
+    "MMSE_score",
+    "MoCA_score",
+    "Task_difficulty",
+    "NamingVsSemantic",
+    "Task",
+]
+
+TASK_DIFFICULTIES = np.array(["Effortless", "Effortfull"])
+NAMING_VS_SEMANTIC = np.array(["Semantics", "Naming"])
+TASKS = np.array(
+    [
+        "Test of famous persons",
+        "Name famous faces",
+        "Person information",
+        "Person Identification",
+        "Naming famous faces",
+        "WAIS-III Information",
+        "Forced task - famous or not famous",
+        "Famous people with cue",
+    ]
+)
+
+
+def make_input_data(
+    k: int,
+    seed: int = 0,
+    multiple_measures_fraction: float = 0.5,
+    max_measures: int = 9,
+    nan_fraction: float = 0.02,
+):
+    """
+    Synthetic extraction table shaped like input_data/input_data.csv.
+
+    Parameters
+    ----------
+    k : int
+        Number of studies.
+    seed : int
+        Seed of the generator: the same arguments always give the same table.
+    multiple_measures_fraction : float
+        Share of the studies reporting several measures (2 to max_measures).
+    max_measures : int
+        Largest number of measures of a study.
+    nan_fraction : float
+        Share of the measures with a missing mean or SD (dropped by the pipeline).
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per measure, with the columns of input_data.csv. MMSE and MoCA scores
+        are missing for most studies, as in the real table.
+    """
+    rng = np.random.default_rng(seed)
+
+    # Measures per study
+    nb_measures = np.ones(k, dtype=np.int64)
+    multiple = rng.random(k) < multiple_measures_fraction
+    nb_measures[multiple] = rng.integers(2, max_measures + 1, size=multiple.sum())
+    study = np.repeat(np.arange(k), nb_measures)
+    n = len(study)
+
+    # Study level values, repeated over the measures of the study
+    years = rng.integers(1995, 2021, size=k)
+    labels = np.char.add("Author", np.arange(k).astype(str))
+    authors = np.char.add(np.char.add(labels, " et al. "), years.astype(str))
+    authors_save = np.char.add(np.char.add(years.astype(str), ". "), labels)
+    MCI_size = rng.integers(8, 55, size=k)
+    Control_size = np.maximum(MCI_size + rng.integers(-6, 8, size=k), 6)
+    true_effect = rng.normal(1.0, 0.4, size=k)
+    MMSE_score = np.where(rng.random(k) < 0.8, rng.normal(27.0, 0.6, size=k), np.nan)
+    MoCA_score = np.where(rng.random(k) < 0.15, rng.normal(26.0, 0.1, size=k), np.nan)
+
+    # Measure level values
+    Control_Mean = rng.lognormal(3.0, 0.9, size=n)
+    Control_SD = Control_Mean * rng.uniform(0.05, 0.3, size=n)
+    MCI_SD = Control_SD * rng.uniform(0.9, 1.8, size=n)
+    effect = true_effect[study] + rng.normal(0.0, 0.2, size=n)
+    MCI_Mean = Control_Mean - effect * np.sqrt((MCI_SD**2 + Control_SD**2) / 2)
+
+    missing = rng.random(n) < nan_fraction
+    MCI_SD[missing] = np.nan
+
+    return pd.DataFrame(
+        {
+            "Authors": authors[study],
+            "Authors_save": authors_save[study],
+            "MCI_size": MCI_size[study],
+            "MCI_Mean": MCI_Mean.round(3),
+            "MCI_SD": MCI_SD.round(3),
+            "MCI_Var": (MCI_SD**2).round(4),
+            "Control_size": Control_size[study],
+            "Control_Mean": Control_Mean.round(3),
+            "Control_SD": Control_SD.round(3),
+            "Control_VAR": (Control_SD**2).round(4),
+            "MMSE_score": MMSE_score[study].round(1),
+            "MoCA_score": MoCA_score[study].round(1),
+            "Task_difficulty": rng.choice(TASK_DIFFICULTIES, size=n),
+            "NamingVsSemantic": rng.choice(NAMING_VS_SEMANTIC, size=n, p=[0.75, 0.25]),
+            "Task": rng.choice(TASKS, size=n),
+        },
+        columns=INPUT_COLUMNS,
+    )
+
+
+if __name__ == "__main__":
+    input_data = make_input_data(10)
+    print(input_data)
+    os.makedirs("output", exist_ok=True)
+    input_data.to_csv(r"output/synthetic_input_data.csv", index=False)
@@ -0,0 +1,401 @@
+"""
+Creation date: 2026, October
+Author: L. Gardy
+E-mail: ludovic.gardy@cnrs.fr
+Encoding: UTF-8
+
+Related publication
+--------------------
+Title: A meta-analysis of semantic memory in prodromal Alzheimer’s Disease.
+Authors: Joubert S., Gardy L., Didic M., Rouleau I., Barbeau E.J.
+Journal: Neuropsychology Review, 31(2): 221-232, 2021.
+DOI: https://doi.org/10.1007/s11065-020-09453-5
+
+# Note
+#---------
+# Command line interface of the pipeline:
+#   python -m modules run input_data/input_data.csv --output-dir output
+#   python -m modules run input_data/input_data.csv --method Cohens_d --subgroup Task_difficulty=Effortfull --plot
+#   python -m modules run input_data/input_data.csv --group-by Task --plot --plot-format pdf
+#   python -m modules run input_data/input_data.csv --plot --plot-format pdf --rows-per-page 40 --sort-by d
+#   python -m modules run input_data/input_data.csv --metrics output/metrics.json --profile
+#   python -m modules serve --dataset main=input_data/input_data.csv --port 8765
+# The modules are imported inside the commands, so that `--help` stays instant and
+# matplotlib is only loaded by --plot.
+"""
+
+import argparse
+import logging
+import os
+import re
+import sys
+
+EFFECT_SIZE_METHODS = ["Hedges_g", "Cohens_d", "Glass_delta"]
+OUTPUT_FORMATS = ["csv", "parquet", "arrow"]
+PLOT_FORMATS = ["png", "svg", "pdf"]
+LOG_LEVELS = ["DEBUG", "INFO", "WARNING", "ERROR"]
+
+logger = logging.getLogger("modules.cli")
+
+
+def parse_subgroup(text: str):
+    """'Column=Value' -> ('Column', 'Value')."""
+    column, separator, value = text.partition("=")
+    if not separator or not column.strip():
+        raise argparse.ArgumentTypeError(
+            "expected COLUMN=VALUE, e.g. Task_difficulty=Effortfull (got {!r})".format(
+                text
+            )
+        )
+    return column.strip(), value.strip()
+
+
+def parse_dataset(text: str):
+    """'name=path' -> ('name', 'path')."""
+    name, separator, path = text.partition("=")
+    if not separator or not name.strip() or not path.strip():
+        raise argparse.ArgumentTypeError(
+            "expected NAME=PATH, e.g. main=input_data/input_data.csv (got {!r})".format(
+                text
+            )
+        )
+    return name.strip(), path.strip()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m modules",
+        description="Random effect meta-analysis of an extraction table.",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser(
+        "run", help="compute the meta-analysis (and optionally the forest plots)"
+    )
+    run_parser.add_argument(
+        "input_path", help="CSV extraction table (see input_data/input_data.csv)"
+    )
+    run_parser.add_argument(
+        "-o",
+        "--output-dir",
+        default="output",
+        help="folder of the output tables and figures (default: output)",
+    )
+    run_parser.add_argument(
+        "-m",
+        "--method",
+        default="Hedges_g",
+        choices=EFFECT_SIZE_METHODS,
+        help="effect size (default: Hedges_g)",
+    )
+    run_parser.add_argument(
+        "-s",
+        "--subgroup",
+        action="append",
+        default=[],
+        type=parse_subgroup,
+        metavar="COLUMN=VALUE",
+        help="only keep the rows where COLUMN equals VALUE (repeatable)",
+    )
+    run_parser.add_argument(
+        "-g",
+        "--group-by",
+        metavar="COLUMN",
+        help="one meta-analysis per value of COLUMN, each in its own sub-folder",
+    )
+    run_parser.add_argument(
+        "--output-format",
+        default="csv",
+        choices=OUTPUT_FORMATS,
+        help="format of the intermediate tables (default: csv)",
+    )
+    run_parser.add_argument(
+        "--plot", action="store_true", help="also save the forest plot of each run"
+    )
+    run_parser.add_argument(
+        "--plot-format",
+        default="png",
+        choices=PLOT_FORMATS,
+        help="format of the forest plots (default: png)",
+    )
+    run_parser.add_argument(
+        "--rows-per-page",
+        type=int,
+        metavar="N",
+        help="split each forest plot into pages of N rows (large analyses; one "
+        "multi-page file for pdf, one file per page otherwise)",
+    )
+    run_parser.add_argument(
+        "--sort-by",
+        metavar="COLUMN",
+        help="order the rows of the paginated forest plots (e.g. d, Weight, Author)",
+    )
+    run_parser.add_argument(
+        "--plot-group-by",
+        metavar="COLUMN",
+        help="group the rows of the paginated forest plots by COLUMN",
+    )
+    run_parser.add_argument(
+        "--processes",
+        type=int,
+        default=1,
+        help="worker processes for the forest plots (default: 1)",
+    )
+    run_parser.add_argument(
+        "--log-level",
+        default="INFO",
+        choices=LOG_LEVELS,
+        help="WARNING only shows the problems (default: INFO)",
+    )
+    run_parser.add_argument("--log-file", help="write the logs to this file")
+    run_parser.add_argument(
+        "--metrics",
+        metavar="PATH",
+        help="write the stage timings and counters of the run to this JSON file",
+    )
+    run_parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="add the cProfile summary of each stage to the metrics",
+    )
+    run_parser.add_argument(
+        "--trace-memory",
+        action="store_true",
+        help="add the peak memory of each stage (tracemalloc) to the metrics",
+    )
+
+    serve_parser = subparsers.add_parser(
+        "serve",
+        help="keep extraction tables in memory and answer JSON queries over HTTP",
+    )
+    serve_parser.add_argument(
+        "-d",
+        "--dataset",
+        action="append",
+        required=True,
+        type=parse_dataset,
+        metavar="NAME=PATH",
+        help="CSV extraction table served as /datasets/NAME (repeatable)",
+    )
+    serve_parser.add_argument(
+        "--host", default="127.0.0.1", help="address to listen on (default: 127.0.0.1)"
+    )
+    serve_parser.add_argument(
+        "--port", type=int, default=8765, help="TCP port (default: 8765)"
+    )
+    serve_parser.add_argument(
+        "--unix-socket",
+        metavar="PATH",
+        help="listen on this Unix socket instead of host:port",
+    )
+    serve_parser.add_argument(
+        "--workers",
+        type=int,
+        default=4,
+        help="worker threads answering the queries (default: 4)",
+    )
+    serve_parser.add_argument(
+        "--max-pending",
+        type=int,
+        default=64,
+        help="queued or running queries before answering 503 (default: 64)",
+    )
+    serve_parser.add_argument(
+        "--log-level",
+        default="INFO",
+        choices=LOG_LEVELS,
+        help="DEBUG also logs every request (default: INFO)",
+    )
+    serve_parser.add_argument("--log-file", help="write the logs to this file")
+
+    return parser
+
+
+def select_subgroups(input_data, subgroups: list):
+    """
+    Rows of the extraction table matching every COLUMN=VALUE filter. VALUE must be one
+    of the values of COLUMN in the table.
+    """
+    selected = input_data
+    for column, value in subgroups:
+        if column not in input_data.columns:
+            raise ValueError("Unknown subgroup column: {}".format(column))
+        levels = input_data[column].dropna().astype(str).str.strip().unique()
+        if value not in levels:
+            raise ValueError(
+                "Unknown value of {}: {!r} (expected one of {})".format(
+                    column, value, ", ".join(sorted(levels))
+                )
+            )
+        selected = selected[selected[column].astype(str).str.strip() == value]
+    return selected
+
+
+def folder_name(value):
+    """File system friendly label of a group value."""
+    return re.sub(r"[^\w.-]+", "_", str(value).strip()) or "empty"
+
+
+def analyse(input_data, method: str, output_dir: str, output_format: str):
+    """Meta-frame, global scores, random effect model and fail-safe N of one run."""
+    from modules.meta_analysis import meta_analysis
+    from modules.prepare_meta_dataframe import prepare_meta_dataframe
+    from modules.utils import get_authors_with_multiple_measures
+
+    dataset = prepare_meta_dataframe(
+        input_data,
+        get_authors_with_multiple_measures(input_data),
+        method,
+        output_format,
+        output_dir,
+        as_dataset=True,
+    )
+    _, fail_safe_N, global_scores_table, random_effect_results = meta_analysis(
+        dataset,
+        plot=False,
+        output_format=output_format,
+        output_dir=output_dir,
+        return_random_effect=True,
+    )
+    return global_scores_table, random_effect_results, fail_safe_N
+
+
+def run(args):
+    import numpy as np
+    import pandas as pd
+
+    from modules.storage import get_output_path, write_table
+
+    input_data = select_subgroups(pd.read_csv(args.input_path), args.subgroup)
+    if len(input_data) == 0:
+        raise ValueError("No row of {} matches the subgroups".format(args.input_path))
+
+    if args.group_by is None:
+        runs = [("all", input_data, args.output_dir)]
+    else:
+        if args.group_by not in input_data.columns:
+            raise ValueError("Unknown group-by column: {}".format(args.group_by))
+        labels = input_data[args.group_by].astype(str).str.strip()
+        runs = [
+            (
+                label,
+                input_data[labels == label],
+                os.path.join(args.output_dir, folder_name(label)),
+            )
+            for label in sorted(labels.unique())
+        ]
+
+    rows = []
+    plot_jobs = []
+    for label, group_data, output_dir in runs:
+        global_scores_table, random_effect_results, fail_safe_N = analyse(
+            group_data, args.method, output_dir, args.output_format
+        )
+        if len(global_scores_table) < 2:
+            # A single study has no meta-analysis (no between-studies variance)
+            rows.append(
+                {
+                    "group": label,
+                    "studies": len(global_scores_table),
+                    "estimable": False,
+                }
+            )
+            logger.warning(
+                f"[{label}] Nb studies = {len(global_scores_table)} | not estimable (fewer than 2 studies)"
+            )
+            continue
+
+        SE_Mstar = np.sqrt(1 / np.sum(random_effect_results.Wstar))
+        rows.append(
+            {
+                "group": label,
+                "studies": len(global_scores_table),
+                "estimable": True,
+                "Mstar": random_effect_results.Mstar,
+                "T_squared": random_effect_results.T_squared,
+                "p_value": random_effect_results.p_value,
+                "IC95_inf": random_effect_results.Mstar - 1.96 * SE_Mstar,
+                "IC95_sup": random_effect_results.Mstar + 1.96 * SE_Mstar,
+                "fail_safe_N": fail_safe_N,
+            }
+        )
+        logger.info(
+            f"[{label}] Nb studies = {len(global_scores_table)} | M* = {round(random_effect_results.Mstar, 3)} | Tau squared = {round(random_effect_results.T_squared, 3)} | {random_effect_results.p_val_text} | {random_effect_results.IC95text} | Fail Safe N = {fail_safe_N}"
+        )
+        if args.plot and args.rows_per_page:
+            from modules.plot_results import render_paginated_forest_plot
+
+            paths = render_paginated_forest_plot(
+                global_scores_table,
+                os.path.join(output_dir, "forest_plot." + args.plot_format),
+                args.rows_per_page,
+                sort_by=args.sort_by,
+                group_by=args.plot_group_by,
+                Mstar=random_effect_results.Mstar,
+                summary_text=random_effect_results.IC95text,
+                processes=args.processes,
+            )
+            logger.info(f"Forest plot written to {paths[0]} ({len(paths)} file(s))")
+        elif args.plot:
+            plot_jobs.append(
+                {
+                    "global_scores_table": global_scores_table,
+                    "weight_of_studies": global_scores_table["Weight"].tolist(),
+                    "randomeffect_model_result": random_effect_results.Mstar,
+                    "output_path": os.path.join(
+                        output_dir, "forest_plot." + args.plot_format
+                    ),
+                }
+            )
+
+    summary = pd.DataFrame(rows)
+    if "fail_safe_N" in summary:
+        summary["fail_safe_N"] = summary["fail_safe_N"].astype("Int64")
+    summary_path = write_table(
+        summary,
+        get_output_path("summary", args.output_format, args.output_dir),
+    )
+    logger.info(f"Summary written to {summary_path}")
+
+    if plot_jobs:
+        from modules.plot_results import render_forest_plots
+
+        for path in render_forest_plots(plot_jobs, processes=args.processes):
+            logger.info(f"Forest plot written to {path}")
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == "run" and not args.rows_per_page:
+        if args.sort_by or args.plot_group_by:
+            parser.error("--sort-by and --plot-group-by need --rows-per-page")
+    try:
+        if args.command == "run":
+            from modules.instrumentation import Instrumentation, configure_logging
+
+            configure_logging(args.log_level, args.log_file)
+            with Instrumentation(
+                args.metrics, profile=args.profile, trace_memory=args.trace_memory
+            ):
+                run(args)
+        elif args.command == "serve":
+            from modules.instrumentation import configure_logging
+            from modules.service import run_service
+
+            configure_logging(args.log_level, args.log_file)
+            run_service(
+                dict(args.dataset),
+                args.host,
+                args.port,
+                args.unix_socket,
+                args.workers,
+                args.max_pending,
+            )
+    except (ValueError, KeyError, FileNotFoundError) as error:
+        parser.exit(1, "error: {}\n".format(error))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
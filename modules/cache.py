@@ -0,0 +1,221 @@
+"""
+Creation date: 2026, October
+Author: L. Gardy
+E-mail: ludovic.gardy@cnrs.fr
+Encoding: UTF-8
+
+Related publication
+--------------------
+Title: A meta-analysis of semantic memory in prodromal Alzheimer’s Disease.
+Authors: Joubert S., Gardy L., Didic M., Rouleau I., Barbeau E.J.
+Journal: Neuropsychology Review, 31(2): 221-232, 2021.
+DOI: https://doi.org/10.1007/s11065-020-09453-5
+"""
+
+import glob
+import hashlib
+import io
+import json
+import os
+import pickle
+
+import pandas as pd
+
+from modules.calculate_random_effect import calculate_random_effect
+from modules.meta_analysis import export_global_scores, meta_analysis
+from modules.prepare_meta_dataframe import prepare_meta_dataframe
+from modules.storage import get_output_path, write_table
+from modules.utils import get_authors_with_multiple_measures
+
+MODULES_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def hash_code_version():
+    """Hash of the source of the modules package: any code change gives a new version."""
+    digest = hashlib.sha256()
+    for path in sorted(glob.glob(os.path.join(MODULES_DIR, "*.py"))):
+        digest.update(os.path.basename(path).encode())
+        with open(path, "rb") as file:
+            digest.update(file.read())
+    return digest.hexdigest()
+
+
+def make_cache_key(stage, input_bytes, effect_size_method, **parameters):
+    """
+    Key of a cached result: hash of the stage name, the input bytes, the effect size
+    method, the code version and the other parameters.
+    """
+    digest = hashlib.sha256()
+    digest.update(stage.encode())
+    digest.update(hashlib.sha256(input_bytes).digest())
+    digest.update(effect_size_method.encode())
+    digest.update(hash_code_version().encode())
+    digest.update(json.dumps(parameters, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    On-disk cache of pipeline results (one pickle file per key).
+
+    Reading an entry refreshes its modification time, and the least recently used
+    entries are deleted once the cache grows over max_bytes.
+    """
+
+    def __init__(self, cache_dir="output/cache", max_bytes=512 * 1024**2):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + ".pkl")
+
+    def __contains__(self, key):
+        return os.path.exists(self._path(key))
+
+    def get(self, key, default=None):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as file:
+                value = pickle.load(file)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return default
+        os.utime(path)
+        return value
+
+    def set(self, key, value):
+        path = self._path(key)
+        temporary_path = path + ".tmp"
+        with open(temporary_path, "wb") as file:
+            pickle.dump(value, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary_path, path)
+        self.evict()
+
+    def memoize(self, key, function, *args, **kwargs):
+        """Return the cached result of key, or compute it with function and store it."""
+        sentinel = object()
+        value = self.get(key, sentinel)
+        if value is sentinel:
+            value = function(*args, **kwargs)
+            self.set(key, value)
+        return value
+
+    def invalidate(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def clear(self):
+        for path in glob.glob(os.path.join(self.cache_dir, "*.pkl")):
+            os.remove(path)
+
+    def evict(self):
+        """Delete the least recently used entries until the cache fits in max_bytes."""
+        entries = [
+            (os.stat(path).st_mtime, os.stat(path).st_size, path)
+            for path in glob.glob(os.path.join(self.cache_dir, "*.pkl"))
+        ]
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_bytes:
+                break
+            os.remove(path)
+            total_size -= size
+
+
+def cached_meta_analysis(
+    input_path,
+    effect_size_method="Hedges_g",
+    cache=None,
+    output_format="csv",
+    output_dir="output",
+    tau2_method="DL",
+):
+    """
+    Meta-frame, random effect model and fail-safe N of an input table, memoized on disk.
+
+    Every result is keyed on the bytes of the input file, the effect size method, the
+    code version and the parameters it depends on, so a changed analysis is always
+    recomputed and an unchanged one is read back from the cache. The tables of
+    output_dir are rewritten from the returned results, so they always match the last
+    analysis.
+
+    Parameters
+    ----------
+    input_path : str
+        CSV extraction table.
+    effect_size_method : str
+        'Hedges_g', 'Cohens_d' or 'Glass_delta'.
+    cache : ResultCache, optional
+        Default: ResultCache() in output/cache.
+    output_format : str
+        Format of the output tables: 'csv', 'parquet' or 'arrow'.
+    output_dir : str
+        Folder of the output tables.
+    tau2_method : str
+        Estimator of T^2 of the returned random effect model ("DL", "REML", "PM" or
+        "EB"). The fail-safe N of meta_analysis uses DerSimonian and Laird.
+
+    Returns
+    -------
+    meta_frame, global_scores_table, random_effect_results, fail_safe_N
+    """
+    if cache is None:
+        cache = ResultCache()
+
+    with open(input_path, "rb") as file:
+        input_bytes = file.read()
+
+    def key(stage, **parameters):
+        return make_cache_key(stage, input_bytes, effect_size_method, **parameters)
+
+    def prepare():
+        input_data = pd.read_csv(io.BytesIO(input_bytes))
+        return prepare_meta_dataframe(
+            input_data,
+            get_authors_with_multiple_measures(input_data),
+            effect_size_method,
+            output_format,
+            output_dir,
+        )
+
+    meta_frame = cache.memoize(key("meta_frame"), prepare)
+
+    def analyse():
+        _, fail_safe_N, global_scores_table = meta_analysis(
+            meta_frame, plot=False, output_format=output_format, output_dir=output_dir
+        )
+        return global_scores_table, fail_safe_N
+
+    global_scores_table, fail_safe_N = cache.memoize(key("fail_safe_N"), analyse)
+
+    def random_effect():
+        return calculate_random_effect(
+            global_scores_table["d"].to_numpy(),
+            global_scores_table["Weight"].to_numpy(),
+            global_scores_table["Var"].to_numpy(),
+            len(global_scores_table),
+            tau2_method=tau2_method,
+        )
+
+    random_effect_results = cache.memoize(
+        key("random_effect", tau2_method=tau2_method), random_effect
+    )
+
+    write_table(meta_frame, get_output_path("meta_frame", output_format, output_dir))
+    export_global_scores(
+        global_scores_table,
+        get_output_path("global_scores_table", output_format, output_dir),
+    )
+
+    return meta_frame, global_scores_table, random_effect_results, fail_safe_N
+
+
+if __name__ == "__main__":
+    cache = ResultCache()
+    meta_frame, global_scores_table, random_effect_results, fail_safe_N = (
+        cached_meta_analysis(r"input_data/input_data.csv", "Hedges_g", cache)
+    )
+    print(random_effect_results)
+    print(f"Fail Safe N = {fail_safe_N}")
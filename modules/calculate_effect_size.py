@@ -32,8 +32,9 @@ DOI: https://doi.org/10.1007/s11065-020-09453-5
 # value for Hedges's g.
 """
 
+from functools import lru_cache
+
 import numpy as np
-from scipy import stats
 
 
 def calculate_pooled_SD(sd_1, sd_2):
@@ -106,75 +107,184 @@ def calculate_weights(mean_1, mean_2, sd_1, sd_2, size_1, size_2, effect_size_me
     return var_d, weight_of_the_study
 
 
-def calculate_confidence_interval(mean_1, mean_2, sd_1, sd_2, size_1, size_2):
-    # Calculations for equal sample sizes
-    # -------------------------------------
-    if size_1 == size_2:
-        df = size_1 - 1
-        df_total = df * 2
-        n = size_1
+def calculate_Cohens_d_array(mean_1, mean_2, sd_1, sd_2):
+    """Column-wise Cohen's d, rounded like calculate_Cohens_d."""
+    SD_pooled = calculate_pooled_SD(sd_1, sd_2)
+    return np.round((mean_2 - mean_1) / SD_pooled, 5)
 
-        tval_2tails = stats.t.ppf(1 - 0.025, df_total)
-        tval_1tail = stats.t.ppf(1 - 0.05, df_total)
 
-        # Get variance from sd
-        var_1 = sd_1**2
-        var_2 = sd_2**2
+def calculate_Glass_delta_array(mean_1, mean_2, sd):
+    """Column-wise Glass' delta, rounded like calculate_Glass_delta."""
+    return np.round((mean_2 - mean_1) / sd, 5)
 
-        # Calculation of the Mean Squared Error
-        MSE = (var_1 + var_2) / 2
 
-        # Calculation of the standard error of the difference between means
-        sigma = np.sqrt((2 * MSE) / n)
+def calculate_Hedges_g_array(mean_1, mean_2, sd_1, sd_2, size_1, size_2):
+    """Column-wise Hedges' g, with the small sample correction applied where N < 50."""
+    N = size_1 + size_2
+    samp1 = (size_1 - 1) * sd_1**2
+    samp2 = (size_2 - 1) * sd_2**2
+    norm = size_1 + size_2 - 2
+    SD_weighted = np.sqrt((samp1 + samp2) / norm)
+    Hedges_g = np.round((mean_2 - mean_1) / SD_weighted, 5)
+    correction = ((N - 3) / (N - 2.25)) * np.sqrt((N - 2) / N)
+    corrected_Hg = np.round(Hedges_g * correction, 5)
+    return np.where(N < 50, corrected_Hg, Hedges_g)
 
-        mean_diff = mean_1 - mean_2
 
-        # Calculation of the lower and upper limits of the 95% CI
-        lower_limit = mean_diff - (tval_2tails * sigma)
-        upper_limit = mean_diff + (tval_2tails * sigma)
+def calculate_effect_size_array(
+    mean_1, mean_2, sd_1, sd_2, size_1, size_2, effect_size_method
+):
+    if effect_size_method == "Cohens_d":
+        return calculate_Cohens_d_array(mean_1, mean_2, sd_1, sd_2)
+    elif effect_size_method == "Glass_delta":
+        return calculate_Glass_delta_array(mean_1, mean_2, sd_2)
+    elif effect_size_method == "Hedges_g":
+        return calculate_Hedges_g_array(mean_1, mean_2, sd_1, sd_2, size_1, size_2)
+    raise ValueError(
+        "Unknown effect size method: {} (expected 'Hedges_g', 'Cohens_d' or 'Glass_delta')".format(
+            effect_size_method
+        )
+    )
+
 
-    # Calculations for different sample sizes
-    # -----------------------------------------
+def calculate_variance_of_effect_size_array(d, size_1, size_2):
+    return ((size_1 + size_2) / (size_1 * size_2)) + ((d**2) / (2 * (size_1 + size_2)))
 
-    elif size_1 != size_2:
-        df_1 = size_1 - 1
-        df_2 = size_2 - 1
-        df_total = df_1 + df_2
-        n = size_1 + size_2
 
-        tval_2tails = stats.t.ppf(1 - 0.025, df_total)
-        tval_1tail = stats.t.ppf(1 - 0.05, df_total)
+def calculate_effect_size_table(
+    mean_1, mean_2, sd_1, sd_2, size_1, size_2, effect_size_method
+):
+    """
+    Array version of calulate_confint_of_effect_size and calculate_weights.
+
+    Every argument is a column (array-like of the same length). The effect size is
+    computed once per row and shared by the confidence interval and the weight. Rows
+    with a missing value in any of the six inputs are flagged in "valid" and get NaN
+    in every output column.
+
+    Returns
+    -------
+    dict
+        Arrays "CI95inf", "d", "CI95sup", "Var", "Weight" and the boolean mask "valid".
+    """
+    columns = [
+        np.asarray(column, dtype=float)
+        for column in (mean_1, mean_2, sd_1, sd_2, size_1, size_2)
+    ]
+    valid = ~np.any(np.isnan(np.vstack(columns)), axis=0)
 
-        # Get variance from sd
-        var_1 = sd_1**2
-        var_2 = sd_2**2
+    results = {
+        name: np.full(valid.shape, np.nan)
+        for name in ("CI95inf", "d", "CI95sup", "Var", "Weight")
+    }
+    results["valid"] = valid
 
-        # Get the some of squares from variance
-        SS_1 = var_1 * df_1
-        SS_2 = var_2 * df_2
+    mean_1, mean_2, sd_1, sd_2, size_1, size_2 = [column[valid] for column in columns]
+    d = calculate_effect_size_array(
+        mean_1, mean_2, sd_1, sd_2, size_1, size_2, effect_size_method
+    )
+    var_d = calculate_variance_of_effect_size_array(d, size_1, size_2)
+    sigma_d = np.sqrt(var_d)
 
-        # Get the sum of squares error
-        SSE = SS_1 + SS_2
+    results["CI95inf"][valid] = d - (1.96 * sigma_d)
+    results["d"][valid] = d
+    results["CI95sup"][valid] = d + (1.96 * sigma_d)
+    results["Var"][valid] = var_d
+    results["Weight"][valid] = 1 / var_d
 
-        # Calculation of the Mean Squared Error
-        MSE = SSE / df_total
+    return results
 
-        # Calculation of the harmonic mean of the saple sizes (nh)
-        nh = 2 / (1 / size_1 + 1 / size_2)
 
-        # Calculation of the standard error of the difference between means
-        sigma = np.sqrt((2 * MSE) / nh)
+@lru_cache(maxsize=None)
+def get_t_critical_value(df_total: float, quantile: float = 0.975):
+    """Quantile of the Student t distribution, computed once per distinct df."""
+    from scipy.special import stdtrit
 
-        mean_diff = mean_1 - mean_2
+    return float(stdtrit(df_total, quantile))
 
-        # Calculation of the lower and upper limits of the 95% CI
-        lower_limit = mean_diff - (tval_2tails * sigma)
-        upper_limit = mean_diff + (tval_2tails * sigma)
 
-    print_interval = [
+def get_t_critical_values(df_total, quantile: float = 0.975):
+    """get_t_critical_value for a column of df: one t quantile per distinct value."""
+    df_total = np.asarray(df_total, dtype=float)
+    t_values = np.full(df_total.shape, np.nan)
+    finite = np.isfinite(df_total)
+    distinct_df, inverse = np.unique(df_total[finite], return_inverse=True)
+    table = np.array([get_t_critical_value(df, quantile) for df in distinct_df])
+    t_values[finite] = table[inverse] if len(table) else np.nan
+    return t_values
+
+
+def calculate_confidence_interval_array(
+    mean_1, mean_2, sd_1, sd_2, size_1, size_2, alpha=0.05
+):
+    """
+    Confidence interval of the raw mean difference (mean_1 - mean_2) of every row.
+
+    The standard error uses the pooled Mean Squared Error SSE / df_total and the
+    harmonic mean nh of the sample sizes: sigma = sqrt(2 * MSE / nh). With equal sample
+    sizes, MSE is the mean of the two variances and nh the sample size, so one formula
+    covers both cases of calculate_confidence_interval.
+
+    Returns
+    -------
+    dict
+        Arrays "lower_limit", "mean_diff", "upper_limit", "sigma" and "df_total". Rows
+        with a missing value get NaN.
+    """
+    mean_1, mean_2, sd_1, sd_2, size_1, size_2 = [
+        np.asarray(column, dtype=float)
+        for column in (mean_1, mean_2, sd_1, sd_2, size_1, size_2)
+    ]
+    df_1 = size_1 - 1
+    df_2 = size_2 - 1
+    df_total = df_1 + df_2
+
+    # Pooled Mean Squared Error, from the sums of squares of the two groups
+    SSE = (sd_1**2) * df_1 + (sd_2**2) * df_2
+    MSE = SSE / df_total
+
+    # Harmonic mean of the sample sizes (nh)
+    nh = 2 / (1 / size_1 + 1 / size_2)
+
+    sigma = np.sqrt((2 * MSE) / nh)
+    mean_diff = mean_1 - mean_2
+    tval_2tails = get_t_critical_values(df_total, 1 - alpha / 2)
+
+    return {
+        "lower_limit": mean_diff - (tval_2tails * sigma),
+        "mean_diff": mean_diff,
+        "upper_limit": mean_diff + (tval_2tails * sigma),
+        "sigma": sigma,
+        "df_total": df_total,
+    }
+
+
+def format_confidence_interval(lower_limit, mean_diff, upper_limit):
+    """Text of confidence intervals: '[lower: ...] [mean: ...] [upper: ...]' per row."""
+    return [
         "[lower: {}] [mean: {}] [upper: {}]".format(
-            round(lower_limit, 5), round(mean_diff, 5), round(upper_limit, 5)
-        ),
+            round(lower, 5), round(mean, 5), round(upper, 5)
+        )
+        for lower, mean, upper in zip(
+            np.atleast_1d(lower_limit).tolist(),
+            np.atleast_1d(mean_diff).tolist(),
+            np.atleast_1d(upper_limit).tolist(),
+        )
+    ]
+
+
+def calculate_confidence_interval(mean_1, mean_2, sd_1, sd_2, size_1, size_2):
+    interval = calculate_confidence_interval_array(
+        mean_1, mean_2, sd_1, sd_2, size_1, size_2
+    )
+    lower_limit, mean_diff, upper_limit = (
+        interval["lower_limit"].item(),
+        interval["mean_diff"].item(),
+        interval["upper_limit"].item(),
+    )
+
+    print_interval = [
+        format_confidence_interval(lower_limit, mean_diff, upper_limit)[0],
         [lower_limit, mean_diff, upper_limit],
     ]
 
@@ -18,7 +18,9 @@ from typing import List
 import numpy as np
 import pandas as pd
 from numpy.typing import NDArray
-from scipy.stats import norm
+from scipy.special import ndtr
+
+from modules.instrumentation import instrumented
 
 
 @dataclass
@@ -29,10 +31,23 @@ class RandomEffectResults:
     p_value: float
     IC95text: str
     Wstar: list
+    tau2_method: str = "DL"
+    iterations: int = 0
+
+
+TAU2_METHODS = ("DL", "REML", "PM", "EB")
 
 
+@instrumented
 def calculate_random_effect(
-    Y: NDArray, W: NDArray, var: NDArray, k: int, wstar: List = []
+    Y: NDArray,
+    W: NDArray,
+    var: NDArray,
+    k: int,
+    wstar: List = [],
+    tau2_method: str = "DL",
+    tol: float = 1e-10,
+    max_iter: int = 100,
 ):
     """
     Parameters
@@ -47,64 +62,429 @@ def calculate_random_effect(
         Number of studies.
     wstar : list, optional
         List of weights of each study : 1 / (variance of effect size).
+    tau2_method : str, optional
+        Estimator of T^2: "DL" (DerSimonian and Laird), "REML", "PM" (Paule and Mandel)
+        or "EB" (empirical Bayes).
+    tol : float, optional
+        Convergence tolerance on T^2 of the iterative estimators.
+    max_iter : int, optional
+        Maximum number of iterations of the iterative estimators.
     """
 
-    freedom_degrees = k - 1
-
-    WY = W * Y
-
-    W_squared = W**2
-    Ysquared = Y**2
-    W_Ysquared = W * Ysquared
+    Y = np.asarray(Y, dtype=float)
+    W = np.asarray(W, dtype=float)
 
-    Q = sum(W_Ysquared) - ((sum(WY) ** 2) / sum(W))
-
-    # Estimating C
-    C = sum(W) - (sum(W_squared) / sum(W))
-
-    # Estimating T^2
-    T_squared = (Q - freedom_degrees) / C
+    Q, C, T_squared = calculate_dersimonian_laird_tau2(
+        np.sum(W), np.sum(W**2), np.sum(W * Y), np.sum(W * Y**2), k
+    )
+    iterations = 0
+    if tau2_method != "DL":
+        T_squared, iterations, _ = estimate_tau2_iterative(
+            Y,
+            np.asarray(var, dtype=float),
+            np.zeros(len(Y), dtype=np.int64),
+            np.atleast_1d(T_squared),
+            tau2_method,
+            tol,
+            max_iter,
+        )
+        T_squared, iterations = T_squared[0], int(iterations[0])
 
     # Estimating New Weights (Random weights instead of fixed)
     if len(wstar) == 0:
-        Wstar_list = list(wstar)
-        for i in range(0, len(var)):
-            Wstar_list.append(1 / (np.array(var[i]) + T_squared))
-        Wstar = np.array(Wstar_list)
+        Wstar = 1 / (np.asarray(var, dtype=float) + T_squared)
     else:
         Wstar = np.array(wstar)
 
     Wstar_Y = Wstar * Y
 
-    Mstar = sum(Wstar_Y) / sum(Wstar)
+    Mstar = np.sum(Wstar_Y) / np.sum(Wstar)
 
     # Estimating the p_value
-    V_Mstar = 1 / sum(Wstar)
+    V_Mstar = 1 / np.sum(Wstar)
 
     SE_Mstar = np.sqrt(V_Mstar)
 
     Z = Mstar / SE_Mstar
 
-    fi = norm.cdf(abs(Z))
+    fi = ndtr(abs(Z))
 
     p_value = 2 * (1 - fi)
 
+    p_val_text, IC95text = format_random_effect_text(Mstar, SE_Mstar, p_value)
+
+    random_effect_results = RandomEffectResults(
+        Mstar,
+        T_squared,
+        p_val_text,
+        p_value,
+        IC95text,
+        list(Wstar),
+        tau2_method,
+        iterations,
+    )
+
+    return random_effect_results
+
+
+def calculate_dersimonian_laird_tau2(sum_W, sum_W_squared, sum_WY, sum_WY_squared, k):
+    """
+    Q, C and T^2 of the DerSimonian and Laird estimator from the sums of W, W^2, W*Y and W*Y^2.
+
+    Works on scalars or on arrays of sums (one value per meta-analysis). T^2 is 0 when k < 2.
+    """
+    freedom_degrees = k - 1
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        Q = sum_WY_squared - ((sum_WY**2) / sum_W)
+
+        # Estimating C
+        C = sum_W - (sum_W_squared / sum_W)
+
+        # Estimating T^2 (truncated at 0, a variance cannot be negative)
+        T_squared = np.maximum((Q - freedom_degrees) / C, 0)
+
+    # With less than 2 studies there is no between-studies variance to estimate, and C
+    # is only rounding noise: T^2 is 0 (the model reduces to the fixed effect model)
+    T_squared = np.where((k >= 2) & (C > 0), T_squared, 0.0)[()]
+
+    return Q, C, T_squared
+
+
+def estimate_tau2_iterative(
+    Y: NDArray,
+    var: NDArray,
+    groups: NDArray,
+    T_squared: NDArray,
+    tau2_method: str,
+    tol: float = 1e-10,
+    max_iter: int = 100,
+):
+    """
+    Iterative estimators of T^2, run together for every group of a flat array.
+
+    - "REML": Fisher scoring on the restricted likelihood.
+    - "PM": Paule and Mandel, Newton steps on sum(W* (Y - M*)^2) = k - 1 from T^2 = 0.
+    - "EB": empirical Bayes (Morris) fixed-point iterations.
+
+    Parameters
+    ----------
+    Y, var : NDArray
+        Flat effect sizes and variances.
+    groups : NDArray
+        Group index of each study (0 to number of groups - 1).
+    T_squared : NDArray
+        Starting value of T^2 of each group (used by REML and EB).
+    tau2_method : str
+        "REML", "PM" or "EB".
+    tol : float
+        An analysis stops once its T^2 changes by less than tol.
+    max_iter : int
+        Maximum number of iterations.
+
+    Returns
+    -------
+    T_squared, iterations, converged : NDArray
+        One value per group.
+    """
+    if tau2_method not in TAU2_METHODS or tau2_method == "DL":
+        raise ValueError(
+            "Unknown iterative T^2 estimator: {} (expected one of {})".format(
+                tau2_method, ", ".join(TAU2_METHODS[1:])
+            )
+        )
+
+    nb_groups = len(T_squared)
+    k = np.bincount(groups, minlength=nb_groups)
+
+    def group_sum(values):
+        return np.bincount(groups, weights=values, minlength=nb_groups)
+
+    if tau2_method == "PM":
+        T_squared = np.zeros(nb_groups)
+    else:
+        T_squared = np.nan_to_num(np.asarray(T_squared, dtype=float), nan=0.0)
+    iterations = np.zeros(nb_groups, dtype=np.int64)
+    converged = k < 2
+    T_squared[converged] = 0.0
+
+    # Each estimator solves score(T^2) = 0, with score > 0 below the solution. The
+    # proposed steps are kept inside the bracket [lower, upper] known so far, and
+    # replaced by its middle when they leave it or do not shrink fast enough (at
+    # least half of the previous step). lower = -1 means T^2 = 0 was not tried.
+    lower = np.full(nb_groups, -1.0)
+    upper = np.full(nb_groups, np.inf)
+    previous_step = np.full(nb_groups, np.inf)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for _ in range(max_iter):
+            if np.all(converged):
+                break
+
+            Wstar = 1 / (var + T_squared[groups])
+            sum_Wstar = group_sum(Wstar)
+            Mstar = group_sum(Wstar * Y) / sum_Wstar
+            residuals_squared = (Y - Mstar[groups]) ** 2
+
+            if tau2_method == "REML":
+                sum_Wstar_squared = group_sum(Wstar**2)
+                trace_P = sum_Wstar - sum_Wstar_squared / sum_Wstar
+                trace_PP = (
+                    sum_Wstar_squared
+                    - 2 * group_sum(Wstar**3) / sum_Wstar
+                    + (sum_Wstar_squared / sum_Wstar) ** 2
+                )
+                score = group_sum(Wstar**2 * residuals_squared) - trace_P
+                proposal = T_squared + score / trace_PP
+            elif tau2_method == "PM":
+                score = group_sum(Wstar * residuals_squared) - (k - 1)
+                derivative = group_sum(Wstar**2 * residuals_squared)
+                proposal = T_squared + score / derivative
+            else:
+                proposal = (
+                    group_sum(Wstar * ((k / (k - 1))[groups] * residuals_squared - var))
+                    / sum_Wstar
+                )
+                score = proposal - T_squared
+
+            active = ~converged
+            at_zero_boundary = (T_squared == 0) & (score <= 0)
+
+            lower = np.where(active & (score > 0), T_squared, lower)
+            upper = np.where(active & (score <= 0), T_squared, upper)
+            proposal = np.maximum(np.nan_to_num(proposal, nan=0.0), 0)
+            outside = (
+                (proposal <= lower)
+                | (proposal >= upper)
+                | (2 * np.abs(proposal - T_squared) > previous_step)
+            )
+            middle = np.where(
+                np.isfinite(upper), (np.maximum(lower, 0) + upper) / 2, proposal
+            )
+            new_T_squared = np.where(outside, middle, proposal)
+            new_T_squared = np.where(at_zero_boundary, 0.0, new_T_squared)
+
+            change = np.abs(new_T_squared - T_squared)
+            previous_step = np.where(active, change, previous_step)
+            T_squared = np.where(active, new_T_squared, T_squared)
+            iterations += active
+            converged = converged | at_zero_boundary | (change < tol)
+
+    return T_squared, iterations, converged
+
+
+def format_random_effect_text(Mstar, SE_Mstar, p_value):
     # Estimating 95% CI
     IC95total_inf = round(Mstar - 1.96 * SE_Mstar, 3)
     IC95total_sup = round(Mstar + 1.96 * SE_Mstar, 3)
 
-    if p_value > 0.001:
+    if not np.isfinite(p_value):
+        p_val_text = "p value = NA"
+    elif p_value > 0.001:
         p_val_text = "p.value = {}".format(round(p_value, 5))
     else:
         p_val_text = "p value < 0.001"
 
     IC95text = "95% CI = [{}; {}]".format(IC95total_inf, IC95total_sup)
 
-    random_effect_results = RandomEffectResults(
-        Mstar, T_squared, p_val_text, p_value, IC95text, list(Wstar)
+    return p_val_text, IC95text
+
+
+def calculate_random_weight_sums(
+    Y: NDArray,
+    var: NDArray,
+    T_squared: NDArray,
+    chunk_size: int = 1024,
+    nb_included: NDArray = None,
+):
+    """
+    sum(W*) and sum(W*Y) of one set of studies for many values of T^2.
+
+    W* = 1 / (var + T^2) changes with T^2, so the sums are evaluated in chunks of T^2
+    values to keep the (chunk_size x k) weight matrix small. When nb_included is given,
+    the sums for T_squared[j] only cover the first nb_included[j] studies.
+    """
+    Y = np.asarray(Y, dtype=float)
+    var = np.asarray(var, dtype=float)
+    T_squared = np.atleast_1d(np.asarray(T_squared, dtype=float))
+
+    sum_Wstar = np.empty(len(T_squared))
+    sum_Wstar_Y = np.empty(len(T_squared))
+    for start in range(0, len(T_squared), chunk_size):
+        stop = start + chunk_size
+        Wstar = 1 / (var[np.newaxis, :] + T_squared[start:stop, np.newaxis])
+        if nb_included is not None:
+            excluded = np.arange(len(var)) >= nb_included[start:stop, np.newaxis]
+            Wstar[excluded] = 0
+        sum_Wstar[start:stop] = Wstar.sum(axis=1)
+        sum_Wstar_Y[start:stop] = Wstar @ Y
+
+    return sum_Wstar, sum_Wstar_Y
+
+
+@dataclass
+class RandomEffectBatchResults:
+    """
+    Results of many random effect models, one entry per group.
+
+    Wstar is flat and aligned with the flat input: the random weights of group i are
+    Wstar[offsets[i]:offsets[i + 1]]. Indexing the batch returns a RandomEffectResults.
+    """
+
+    Mstar: NDArray
+    T_squared: NDArray
+    Q: NDArray
+    C: NDArray
+    SE_Mstar: NDArray
+    Z: NDArray
+    p_value: NDArray
+    IC95_inf: NDArray
+    IC95_sup: NDArray
+    k: NDArray
+    Wstar: NDArray
+    offsets: NDArray
+    tau2_method: str = "DL"
+    iterations: NDArray = None
+    converged: NDArray = None
+
+    def __len__(self):
+        return len(self.Mstar)
+
+    def __getitem__(self, i):
+        p_val_text, IC95text = format_random_effect_text(
+            self.Mstar[i], self.SE_Mstar[i], self.p_value[i]
+        )
+        return RandomEffectResults(
+            self.Mstar[i],
+            self.T_squared[i],
+            p_val_text,
+            self.p_value[i],
+            IC95text,
+            list(self.Wstar[self.offsets[i] : self.offsets[i + 1]]),
+            self.tau2_method,
+            0 if self.iterations is None else int(self.iterations[i]),
+        )
+
+    def to_list(self):
+        return [self[i] for i in range(len(self))]
+
+    def to_frame(self):
+        return pd.DataFrame(
+            {
+                "k": self.k,
+                "Mstar": self.Mstar,
+                "T_squared": self.T_squared,
+                "Q": self.Q,
+                "SE": self.SE_Mstar,
+                "Z": self.Z,
+                "p_value": self.p_value,
+                "CI95inf": self.IC95_inf,
+                "CI95sup": self.IC95_sup,
+            }
+        )
+
+
+def flatten_padded_groups(Y: NDArray, W: NDArray, var: NDArray):
+    """
+    Turn padded 2-D arrays (one row per meta-analysis, NaN after the last study) into
+    flat arrays and group offsets.
+    """
+    Y = np.asarray(Y, dtype=float)
+    mask = ~np.isnan(Y)
+    counts = mask.sum(axis=1)
+    offsets = np.concatenate([[0], np.cumsum(counts)])
+    return (
+        Y[mask],
+        np.asarray(W, dtype=float)[mask],
+        np.asarray(var, dtype=float)[mask],
+        offsets,
     )
 
-    return random_effect_results
+
+@instrumented
+def calculate_random_effect_batch(
+    Y: NDArray,
+    W: NDArray,
+    var: NDArray,
+    offsets: NDArray = None,
+    tau2_method: str = "DL",
+    tol: float = 1e-10,
+    max_iter: int = 100,
+):
+    """
+    Random effect model for many meta-analyses at once.
+
+    Parameters
+    ----------
+    Y : NDArray
+        Effect sizes. Either flat, with the groups delimited by offsets, or 2-D padded
+        with NaN (one row per meta-analysis) when offsets is None.
+    W : NDArray
+        Weights of each study: 1 / (variance of effect size). Same shape as Y.
+    var : NDArray
+        Variance of effect sizes. Same shape as Y.
+    offsets : NDArray, optional
+        Start of each group in the flat arrays, followed by the total length
+        (group i is Y[offsets[i]:offsets[i + 1]]).
+    tau2_method : str, optional
+        Estimator of T^2: "DL", "REML", "PM" or "EB". The iterative estimators run for
+        all groups at once, each group stopping on its own convergence.
+    tol, max_iter : optional
+        Convergence tolerance and maximum number of iterations of the iterative
+        estimators.
+    """
+    if offsets is None:
+        Y, W, var, offsets = flatten_padded_groups(Y, W, var)
+    else:
+        Y = np.asarray(Y, dtype=float)
+        W = np.asarray(W, dtype=float)
+        var = np.asarray(var, dtype=float)
+        offsets = np.asarray(offsets, dtype=np.int64)
+
+    k = np.diff(offsets)
+    nb_groups = len(k)
+    groups = np.repeat(np.arange(nb_groups), k)
+
+    def group_sum(values):
+        return np.bincount(groups, weights=values, minlength=nb_groups)
+
+    Q, C, T_squared = calculate_dersimonian_laird_tau2(
+        group_sum(W), group_sum(W**2), group_sum(W * Y), group_sum(W * Y**2), k
+    )
+
+    iterations = np.zeros(nb_groups, dtype=np.int64)
+    converged = np.ones(nb_groups, dtype=bool)
+    if tau2_method != "DL":
+        T_squared, iterations, converged = estimate_tau2_iterative(
+            Y, var, groups, T_squared, tau2_method, tol, max_iter
+        )
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        Wstar = 1 / (var + T_squared[groups])
+        sum_Wstar = group_sum(Wstar)
+        Mstar = group_sum(Wstar * Y) / sum_Wstar
+        SE_Mstar = np.sqrt(1 / sum_Wstar)
+        Z = Mstar / SE_Mstar
+
+    p_value = 2 * (1 - ndtr(np.abs(Z)))
+
+    return RandomEffectBatchResults(
+        Mstar=Mstar,
+        T_squared=T_squared,
+        Q=Q,
+        C=C,
+        SE_Mstar=SE_Mstar,
+        Z=Z,
+        p_value=p_value,
+        IC95_inf=Mstar - 1.96 * SE_Mstar,
+        IC95_sup=Mstar + 1.96 * SE_Mstar,
+        k=k,
+        Wstar=Wstar,
+        offsets=offsets,
+        tau2_method=tau2_method,
+        iterations=iterations,
+        converged=converged,
+    )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,120 @@
+"""
+Creation date: 2026, October
+Author: L. Gardy
+E-mail: ludovic.gardy@cnrs.fr
+Encoding: UTF-8
+
+Related publication
+--------------------
+Title: A meta-analysis of semantic memory in prodromal Alzheimer’s Disease.
+Authors: Joubert S., Gardy L., Didic M., Rouleau I., Barbeau E.J.
+Journal: Neuropsychology Review, 31(2): 221-232, 2021.
+DOI: https://doi.org/10.1007/s11065-020-09453-5
+"""
+
+import numpy as np
+import pandas as pd
+from numpy.typing import NDArray
+from scipy.special import ndtr
+
+from modules.calculate_random_effect import (
+    calculate_dersimonian_laird_tau2,
+    calculate_random_weight_sums,
+)
+
+
+def extract_publication_year(authors: pd.Series):
+    """
+    Publication year of each study, taken from the 4-digit number in its label
+    ("Ahmed et al. 2008" in Authors, "2008. Ahmed" in Authors_save).
+    """
+    years = authors.str.extract(r"((?:19|20)\d{2})", expand=False)
+    return pd.to_numeric(years)
+
+
+def calculate_cumulative_meta_analysis_arrays(
+    Y: NDArray, W: NDArray, var: NDArray, chunk_size: int = 1024
+):
+    """
+    Random effect model after each study is added, in the order of the arrays.
+
+    Q, C and T^2 of the first j studies come from the running sums of W, W^2, WY and
+    WY^2, in O(k). The random weights W* = 1 / (var + T^2) depend on the T^2 of each
+    step, so every step needs new sums of W* and W*Y over the studies already included:
+    the whole table is O(k^2) operations, evaluated in vectorized chunks of steps.
+
+    Parameters
+    ----------
+    Y, W, var : NDArray
+        Effect size, weight and variance of each study, in the order of inclusion.
+    chunk_size : int
+        Steps evaluated at a time. It bounds the memory: the weight matrix of a chunk
+        holds chunk_size x k values.
+    """
+    Y = np.asarray(Y, dtype=float)
+    W = np.asarray(W, dtype=float)
+    var = np.asarray(var, dtype=float)
+    nb_included = np.arange(1, len(Y) + 1)
+
+    Q, C, T_squared = calculate_dersimonian_laird_tau2(
+        np.cumsum(W),
+        np.cumsum(W**2),
+        np.cumsum(W * Y),
+        np.cumsum(W * Y**2),
+        nb_included,
+    )
+
+    sum_Wstar, sum_Wstar_Y = calculate_random_weight_sums(
+        Y, var, T_squared, chunk_size, nb_included
+    )
+    Mstar = sum_Wstar_Y / sum_Wstar
+    SE_Mstar = np.sqrt(1 / sum_Wstar)
+    Z = Mstar / SE_Mstar
+    p_value = 2 * (1 - ndtr(np.abs(Z)))
+
+    return {
+        "k": nb_included,
+        "Mstar": Mstar,
+        "T_squared": T_squared,
+        "Q": Q,
+        "SE": SE_Mstar,
+        "p_value": p_value,
+        "CI95inf": Mstar - 1.96 * SE_Mstar,
+        "CI95sup": Mstar + 1.96 * SE_Mstar,
+    }
+
+
+def calculate_cumulative_meta_analysis(
+    global_scores_table: pd.DataFrame, plot: bool = False
+):
+    """
+    Cumulative meta-analysis of the global_scores_table, adding the studies by year of
+    publication (then by Author within a year). Each row gives the random effect model
+    once the study of that row has been added.
+    """
+    table = global_scores_table.assign(
+        Year=extract_publication_year(global_scores_table["Author"])
+    )
+    table = table.sort_values(by=["Year", "Author"], kind="stable").reset_index(
+        drop=True
+    )
+
+    cumulative = calculate_cumulative_meta_analysis_arrays(
+        table["d"].to_numpy(), table["Weight"].to_numpy(), table["Var"].to_numpy()
+    )
+    cumulative_table = pd.concat(
+        [table[["Author", "Year"]], pd.DataFrame(cumulative)], axis=1
+    )
+
+    if plot:
+        from modules.plot_results import plot_cumulative_meta_analysis
+
+        plot_cumulative_meta_analysis(cumulative_table)
+
+    return cumulative_table
+
+
+if __name__ == "__main__":
+    global_scores_table = pd.read_csv(r"output/global_scores_table.csv")
+    cumulative_table = calculate_cumulative_meta_analysis(global_scores_table)
+    print(cumulative_table)
@@ -0,0 +1,234 @@
+"""
+Creation date: 2026, October
+Author: L. Gardy
+E-mail: ludovic.gardy@cnrs.fr
+Encoding: UTF-8
+
+Related publication
+--------------------
+Title: A meta-analysis of semantic memory in prodromal Alzheimer’s Disease.
+Authors: Joubert S., Gardy L., Didic M., Rouleau I., Barbeau E.J.
+Journal: Neuropsychology Review, 31(2): 221-232, 2021.
+DOI: https://doi.org/10.1007/s11065-020-09453-5
+
+# Note
+#---------
+# Stage timers, counters and optional cProfile / tracemalloc capture of the pipeline:
+#   with Instrumentation(metrics_path="output/metrics.json", profile=True):
+#       meta_frame = prepare_meta_dataframe(...)
+#       meta_analysis(meta_frame)
+# Nothing is recorded outside of an Instrumentation block. The active block is held in
+# a context variable, so it only sees the stages of its own thread (or asyncio task):
+# the worker threads of a ThreadPoolExecutor run outside of it. The summaries of the
+# pipeline are logged on the "modules" logger: configure_logging() prints them.
+"""
+
+import cProfile
+import functools
+import io
+import json
+import logging
+import os
+import pstats
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+LOGGER_NAME = "modules"
+
+_active = ContextVar("active_instrumentation", default=None)
+
+
+def configure_logging(level="INFO", log_file: str = None, log_format: str = None):
+    """
+    Send the logs of the modules package to the console (or to log_file).
+
+    Parameters
+    ----------
+    level : str or int
+        'DEBUG' also shows the details of the fail-safe N search, 'WARNING' hides the
+        summaries.
+    log_file : str, optional
+        Append the logs to this file instead of the console.
+    log_format : str, optional
+        logging format string (default: the message only).
+    """
+    logger = logging.getLogger(LOGGER_NAME)
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+        handler.close()
+
+    handler = logging.FileHandler(log_file) if log_file else logging.StreamHandler()
+    handler.setFormatter(logging.Formatter(log_format or "%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(level)
+    logger.propagate = False
+    return logger
+
+
+class Instrumentation:
+    """
+    Collects stage timers and counters while it is active (in a `with` block).
+
+    Parameters
+    ----------
+    metrics_path : str, optional
+        JSON file written with the metrics when the block exits.
+    callback : callable, optional
+        Called with the metrics dict when the block exits.
+    profile : bool
+        cProfile each top-level stage, and keep its most expensive functions.
+    trace_memory : bool
+        Peak memory of each top-level stage, with tracemalloc.
+    profile_limit : int
+        Number of functions kept per profiled stage.
+    """
+
+    def __init__(
+        self,
+        metrics_path: str = None,
+        callback=None,
+        profile: bool = False,
+        trace_memory: bool = False,
+        profile_limit: int = 20,
+    ):
+        self.metrics_path = metrics_path
+        self.callback = callback
+        self.profile = profile
+        self.trace_memory = trace_memory
+        self.profile_limit = profile_limit
+        self.timers = defaultdict(lambda: {"calls": 0, "seconds": 0.0})
+        self.counters = defaultdict(int)
+        self.profiles = {}
+        self.peak_memory = {}
+        self._depth = 0
+        self._token = None
+
+    def __enter__(self):
+        self._token = _active.set(self)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        _active.reset(self._token)
+        self.total_seconds = time.perf_counter() - self._start
+        metrics = self.to_dict()
+        if self.metrics_path is not None:
+            self.write_json(self.metrics_path)
+        if self.callback is not None:
+            self.callback(metrics)
+        return False
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time a stage. Top-level stages are also profiled / memory-traced if asked."""
+        top_level = self._depth == 0
+        profiler = cProfile.Profile() if self.profile and top_level else None
+        trace_memory = self.trace_memory and top_level
+        started_tracing = False
+        if trace_memory:
+            started_tracing = not tracemalloc.is_tracing()
+            if started_tracing:
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+
+        self._depth += 1
+        start = time.perf_counter()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield self
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            elapsed = time.perf_counter() - start
+            self._depth -= 1
+
+            self.timers[name]["calls"] += 1
+            self.timers[name]["seconds"] += elapsed
+            if trace_memory:
+                peak = tracemalloc.get_traced_memory()[1]
+                self.peak_memory[name] = max(self.peak_memory.get(name, 0), peak)
+                if started_tracing:
+                    tracemalloc.stop()
+            if profiler is not None:
+                self.profiles.setdefault(name, []).append(
+                    self._summarize_profile(profiler)
+                )
+
+    def _summarize_profile(self, profiler):
+        stats = pstats.Stats(profiler, stream=io.StringIO())
+        rows = []
+        for (filename, line, function), (_, calls, own, cumulative, _) in sorted(
+            stats.stats.items(), key=lambda item: item[1][3], reverse=True
+        )[: self.profile_limit]:
+            rows.append(
+                {
+                    "function": f"{os.path.basename(filename)}:{line}({function})",
+                    "calls": calls,
+                    "own_seconds": own,
+                    "cumulative_seconds": cumulative,
+                }
+            )
+        return rows
+
+    def count(self, name: str, value: int = 1):
+        self.counters[name] += int(value)
+
+    def to_dict(self):
+        metrics = {
+            "timers": {name: dict(timer) for name, timer in self.timers.items()},
+            "counters": dict(self.counters),
+        }
+        if hasattr(self, "total_seconds"):
+            metrics["total_seconds"] = self.total_seconds
+        if self.peak_memory:
+            metrics["peak_memory_bytes"] = dict(self.peak_memory)
+        if self.profiles:
+            metrics["profiles"] = self.profiles
+        return metrics
+
+    def write_json(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as file:
+            json.dump(self.to_dict(), file, indent=2)
+        return path
+
+
+def get_instrumentation():
+    """The active Instrumentation of the current context, or None."""
+    return _active.get()
+
+
+def count(name: str, value: int = 1):
+    """Add value to a counter of the active Instrumentation (no-op without one)."""
+    instrumentation = _active.get()
+    if instrumentation is not None:
+        instrumentation.count(name, value)
+
+
+@contextmanager
+def stage(name: str):
+    """Time a block as a stage of the active Instrumentation (no-op without one)."""
+    instrumentation = _active.get()
+    if instrumentation is None:
+        yield None
+    else:
+        with instrumentation.stage(name):
+            yield instrumentation
+
+
+def instrumented(function):
+    """Time every call of a pipeline function as a stage named after it."""
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        instrumentation = _active.get()
+        if instrumentation is None:
+            return function(*args, **kwargs)
+        with instrumentation.stage(function.__name__):
+            return function(*args, **kwargs)
+
+    return wrapper
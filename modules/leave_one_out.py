@@ -0,0 +1,109 @@
+"""
+Creation date: 2026, October
+Author: L. Gardy
+E-mail: ludovic.gardy@cnrs.fr
+Encoding: UTF-8
+
+Related publication
+--------------------
+Title: A meta-analysis of semantic memory in prodromal Alzheimer’s Disease.
+Authors: Joubert S., Gardy L., Didic M., Rouleau I., Barbeau E.J.
+Journal: Neuropsychology Review, 31(2): 221-232, 2021.
+DOI: https://doi.org/10.1007/s11065-020-09453-5
+"""
+
+import numpy as np
+import pandas as pd
+from numpy.typing import NDArray
+from scipy.special import ndtr
+
+from modules.calculate_random_effect import (
+    calculate_dersimonian_laird_tau2,
+    calculate_random_effect,
+    calculate_random_weight_sums,
+)
+
+
+def calculate_leave_one_out_arrays(Y: NDArray, W: NDArray, var: NDArray):
+    """
+    Random effect model refitted without each study in turn.
+
+    Q, C and T^2 without study i are obtained by removing its terms from the totals
+    sum(W), sum(W^2), sum(WY) and sum(WY^2), in O(1) per study. The random weights
+    1 / (var + T^2) change with the T^2 of each omitted study, so their sums are
+    recomputed over all the studies for every omitted study (then the own term of
+    study i is subtracted): the whole table is O(k^2) operations, evaluated in
+    vectorized chunks (see calculate_random_weight_sums).
+
+    Returns
+    -------
+    dict
+        Arrays (one value per omitted study) "Mstar", "T_squared", "Q", "SE", "p_value",
+        "CI95inf", "CI95sup", "delta_Mstar", "cooks_distance" and "cov_ratio".
+    """
+    Y = np.asarray(Y, dtype=float)
+    W = np.asarray(W, dtype=float)
+    var = np.asarray(var, dtype=float)
+    k = len(Y)
+
+    full_model = calculate_random_effect(Y, W, var, k)
+    V_Mstar = 1 / np.sum(full_model.Wstar)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        Q, C, T_squared = calculate_dersimonian_laird_tau2(
+            np.sum(W) - W,
+            np.sum(W**2) - W**2,
+            np.sum(W * Y) - W * Y,
+            np.sum(W * Y**2) - W * Y**2,
+            k - 1,
+        )
+
+        sum_Wstar, sum_Wstar_Y = calculate_random_weight_sums(Y, var, T_squared)
+        own_Wstar = 1 / (var + T_squared)
+        sum_Wstar -= own_Wstar
+        sum_Wstar_Y -= own_Wstar * Y
+
+        Mstar = sum_Wstar_Y / sum_Wstar
+        SE_Mstar = np.sqrt(1 / sum_Wstar)
+        Z = Mstar / SE_Mstar
+
+    p_value = 2 * (1 - ndtr(np.abs(Z)))
+    delta_Mstar = full_model.Mstar - Mstar
+
+    return {
+        "Mstar": Mstar,
+        "T_squared": T_squared,
+        "Q": Q,
+        "SE": SE_Mstar,
+        "p_value": p_value,
+        "CI95inf": Mstar - 1.96 * SE_Mstar,
+        "CI95sup": Mstar + 1.96 * SE_Mstar,
+        "delta_Mstar": delta_Mstar,
+        "cooks_distance": delta_Mstar**2 / V_Mstar,
+        "cov_ratio": SE_Mstar**2 / V_Mstar,
+    }
+
+
+def calculate_leave_one_out(global_scores_table: pd.DataFrame):
+    """
+    Leave-one-out table of the random effect model, one row per study of the
+    global_scores_table (indexed by Author).
+
+    cooks_distance is the squared shift of M* when the study is omitted, divided by the
+    variance of M* in the full model. cov_ratio is the variance of M* without the study
+    over the variance of M* in the full model.
+    """
+    leave_one_out = calculate_leave_one_out_arrays(
+        global_scores_table["d"].to_numpy(),
+        global_scores_table["Weight"].to_numpy(),
+        global_scores_table["Var"].to_numpy(),
+    )
+    return pd.DataFrame(
+        leave_one_out, index=pd.Index(global_scores_table["Author"], name="Author")
+    )
+
+
+if __name__ == "__main__":
+    global_scores_table = pd.read_csv(r"output/global_scores_table.csv")
+    leave_one_out = calculate_leave_one_out(global_scores_table)
+    print(leave_one_out.sort_values(by="cooks_distance", ascending=False))
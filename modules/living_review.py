@@ -0,0 +1,285 @@
+"""
+Creation date: 2026, October
+Author: L. Gardy
+E-mail: ludovic.gardy@cnrs.fr
+Encoding: UTF-8
+
+Related publication
+--------------------
+Title: A meta-analysis of semantic memory in prodromal Alzheimer’s Disease.
+Authors: Joubert S., Gardy L., Didic M., Rouleau I., Barbeau E.J.
+Journal: Neuropsychology Review, 31(2): 221-232, 2021.
+DOI: https://doi.org/10.1007/s11065-020-09453-5
+
+# Note
+#---------
+# Living review: the analysis state of an extraction table is kept on disk and updated
+# when studies are added or removed, without recomputing the other studies:
+#   review = LivingReview.load("output/living_review")
+#   review.add_studies(new_rows)
+#   print(review.results())
+#   review.save("output/living_review")
+"""
+
+import json
+import os
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from scipy.special import ndtr
+
+from modules.calculate_effect_size import calculate_effect_size_table
+from modules.calculate_random_effect import (
+    calculate_dersimonian_laird_tau2,
+    format_random_effect_text,
+)
+from modules.instrumentation import count
+from modules.meta_analysis import solve_fail_safe_N
+from modules.storage import read_table, write_table
+from modules.streaming import MEASURE_COLUMNS
+
+EFFECT_COLUMNS = ["d", "Var", "Weight"]
+SUM_COLUMNS = EFFECT_COLUMNS + ["measures"]
+TOTAL_NAMES = ["k", "sum_W", "sum_W_squared", "sum_WY", "sum_WY_squared"]
+
+
+@dataclass
+class LivingReviewResults:
+    measures: int
+    studies: int
+    Mstar: float
+    T_squared: float
+    SE_Mstar: float
+    p_value: float
+    CI95inf: float
+    CI95sup: float
+    fail_safe_N: int
+    p_val_text: str
+    IC95text: str
+
+
+def calculate_study_totals(study_sums: pd.DataFrame):
+    """
+    Sums of W, W^2, W*Y and W*Y^2 (and number of studies) of the studies of study_sums,
+    whose effect size and weight are the means of the measures, as in
+    prepare_meta_dataframe.
+    """
+    W = study_sums["Weight"].to_numpy() / study_sums["measures"].to_numpy()
+    Y = study_sums["d"].to_numpy() / study_sums["measures"].to_numpy()
+    return np.array([len(W), np.sum(W), np.sum(W**2), np.sum(W * Y), np.sum(W * Y**2)])
+
+
+class LivingReview:
+    """
+    Analysis state of a living review, updated study by study.
+
+    The state holds the effect size of every measure, the sums of d, Var and Weight of
+    each study, and the running totals of the DerSimonian and Laird estimator (sums of
+    W, W^2, W*Y and W*Y^2 over the studies). Adding or removing studies only computes
+    the effect sizes of the new rows and replaces the contribution of the changed
+    studies in the totals. T^2 then comes from the totals, and M*, its CI and p-value
+    and the fail-safe N from one vectorized pass over the study variances, so an
+    update never refits the measures that did not change.
+
+    Parameters
+    ----------
+    effect_size_method : str
+        'Hedges_g', 'Cohens_d' or 'Glass_delta'.
+    """
+
+    def __init__(self, effect_size_method: str = "Hedges_g"):
+        self.effect_size_method = effect_size_method
+        self.measures = pd.DataFrame(
+            {
+                column: pd.Series(dtype=object if column == "Authors" else float)
+                for column in ["Authors"] + MEASURE_COLUMNS + EFFECT_COLUMNS
+            }
+        )
+        self.study_sums = pd.DataFrame(
+            {column: pd.Series(dtype=float) for column in SUM_COLUMNS},
+            index=pd.Index([], name="Authors", dtype=object),
+        )
+        self.totals = np.zeros(len(TOTAL_NAMES))
+        self.skipped_rows = 0
+        self._results = None
+
+    @classmethod
+    def from_table(cls, input_data: pd.DataFrame, effect_size_method="Hedges_g"):
+        """Living review of a whole extraction table."""
+        review = cls(effect_size_method)
+        review.add_studies(input_data)
+        return review
+
+    @property
+    def studies(self):
+        return self.study_sums.index
+
+    def _replace_studies(self, authors, new_sums: pd.DataFrame = None):
+        """Replace the sums of the studies authors (and their part of the totals)."""
+        old_sums = self.study_sums[self.study_sums.index.isin(authors)]
+        self.totals -= calculate_study_totals(old_sums)
+        self.study_sums = self.study_sums.drop(old_sums.index)
+        if new_sums is not None and len(new_sums):
+            self.totals += calculate_study_totals(new_sums)
+            self.study_sums = pd.concat([self.study_sums, new_sums])
+        self._results = None
+
+    def add_studies(self, rows: pd.DataFrame):
+        """
+        Add measures (rows with the columns of input_data/input_data.csv).
+
+        The rows may belong to new studies or add measures to existing ones: only the
+        effect sizes of these rows are computed, and only the studies they belong to
+        are updated. Rows with a missing value are skipped, as in
+        prepare_meta_dataframe.
+        """
+        effect_data = calculate_effect_size_table(
+            *[rows[column] for column in MEASURE_COLUMNS], self.effect_size_method
+        )
+        valid = effect_data["valid"]
+        count("rows_ingested", len(valid))
+        count("rows_skipped", (~valid).sum())
+        self.skipped_rows += int((~valid).sum())
+
+        new_measures = rows.loc[valid, ["Authors"] + MEASURE_COLUMNS].assign(
+            **{column: effect_data[column][valid] for column in EFFECT_COLUMNS}
+        )
+        if len(new_measures) == 0:
+            return self
+
+        added_sums = (
+            new_measures[["Authors"] + EFFECT_COLUMNS]
+            .assign(measures=1.0)
+            .groupby("Authors", sort=False)
+            .sum()
+        )
+        updated_sums = added_sums.add(
+            self.study_sums.reindex(added_sums.index, fill_value=0)
+        )
+        self._replace_studies(added_sums.index, updated_sums)
+        self.measures = pd.concat(
+            [self.measures, new_measures], ignore_index=True
+        ).astype({column: float for column in MEASURE_COLUMNS + EFFECT_COLUMNS})
+        return self
+
+    def remove_study(self, author: str):
+        """Remove every measure of a study."""
+        if author not in self.study_sums.index:
+            raise KeyError("Unknown study: {}".format(author))
+        self._replace_studies([author])
+        self.measures = self.measures[self.measures["Authors"] != author].reset_index(
+            drop=True
+        )
+        return self
+
+    def refresh_totals(self):
+        """Recompute the running totals from the study sums (drops rounding drift)."""
+        self.totals = calculate_study_totals(self.study_sums)
+        self._results = None
+        return self.totals
+
+    def global_scores_table(self):
+        """One row per study: Author and the mean d, Var and Weight of its measures."""
+        table = self.study_sums[EFFECT_COLUMNS].div(self.study_sums["measures"], axis=0)
+        table.insert(0, "Author", self.study_sums.index)
+        return table.reset_index(drop=True)
+
+    def results(self, alpha: float = 0.05):
+        """
+        Random effect model (DerSimonian and Laird) and fail-safe N of the current
+        studies, the same values as meta_analysis.meta_analysis on the whole table.
+        """
+        if self._results is not None:
+            return self._results
+
+        k, sum_W, sum_W_squared, sum_WY, sum_WY_squared = self.totals
+        k = int(round(k))
+        if k == 0:
+            raise ValueError("The living review has no study")
+        _, _, T_squared = calculate_dersimonian_laird_tau2(
+            sum_W, sum_W_squared, sum_WY, sum_WY_squared, k
+        )
+
+        nb_measures = self.study_sums["measures"].to_numpy()
+        Y = self.study_sums["d"].to_numpy() / nb_measures
+        var = self.study_sums["Var"].to_numpy() / nb_measures
+        Wstar = 1 / (var + T_squared)
+        sum_Wstar = np.sum(Wstar)
+        sum_Wstar_Y = np.sum(Wstar * Y)
+
+        Mstar = sum_Wstar_Y / sum_Wstar
+        SE_Mstar = np.sqrt(1 / sum_Wstar)
+        p_value = 2 * (1 - ndtr(abs(Mstar / SE_Mstar)))
+        p_val_text, IC95text = format_random_effect_text(Mstar, SE_Mstar, p_value)
+
+        self._results = LivingReviewResults(
+            measures=int(np.sum(nb_measures)),
+            studies=k,
+            Mstar=Mstar,
+            T_squared=T_squared,
+            SE_Mstar=SE_Mstar,
+            p_value=p_value,
+            CI95inf=Mstar - 1.96 * SE_Mstar,
+            CI95sup=Mstar + 1.96 * SE_Mstar,
+            fail_safe_N=solve_fail_safe_N(sum_Wstar, sum_Wstar_Y, sum_W / k, alpha),
+            p_val_text=p_val_text,
+            IC95text=IC95text,
+        )
+        return self._results
+
+    def save(self, state_dir: str, output_format: str = "csv"):
+        """
+        Write the state to state_dir: the measures table (as 'csv', 'parquet' or
+        'arrow') and state.json with the method, the running totals and the counters.
+        """
+        os.makedirs(state_dir, exist_ok=True)
+        measures_file = "measures." + output_format
+        write_table(self.measures, os.path.join(state_dir, measures_file))
+        state = {
+            "effect_size_method": self.effect_size_method,
+            "measures_file": measures_file,
+            "totals": dict(zip(TOTAL_NAMES, self.totals.tolist())),
+            "skipped_rows": self.skipped_rows,
+        }
+        with open(os.path.join(state_dir, "state.json"), "w") as file:
+            json.dump(state, file, indent=2)
+        return state_dir
+
+    @classmethod
+    def load(cls, state_dir: str):
+        """
+        Read a state written by save. The study sums are regrouped from the stored
+        effect sizes of the measures: no effect size is computed again.
+        """
+        with open(os.path.join(state_dir, "state.json")) as file:
+            state = json.load(file)
+
+        review = cls(state["effect_size_method"])
+        measures = read_table(os.path.join(state_dir, state["measures_file"]))
+        measures["Authors"] = measures["Authors"].astype(object)
+        review.measures = measures
+        review.study_sums = (
+            measures[["Authors"] + EFFECT_COLUMNS]
+            .assign(measures=1.0)
+            .groupby("Authors", sort=False)
+            .sum()
+        )
+        review.totals = np.array([state["totals"][name] for name in TOTAL_NAMES])
+        review.skipped_rows = state["skipped_rows"]
+        return review
+
+
+if __name__ == "__main__":
+    input_data = pd.read_csv(r"input_data/input_data.csv")
+    authors = input_data["Authors"].unique()
+    # Start with half of the studies, then add the others as they are published
+    review = LivingReview.from_table(
+        input_data[input_data["Authors"].isin(authors[: len(authors) // 2])]
+    )
+    print(review.results())
+    review.add_studies(
+        input_data[input_data["Authors"].isin(authors[len(authors) // 2 :])]
+    )
+    print(review.results())
+    review.save(r"output/living_review")
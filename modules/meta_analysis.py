@@ -12,135 +12,187 @@ Journal: Neuropsychology Review, 31(2): 221-232, 2021.
 DOI: https://doi.org/10.1007/s11065-020-09453-5
 """
 
-import os
+import logging
 
 import numpy as np
-import pandas as pd
+from scipy.special import ndtr, ndtri
 
 from modules.calculate_random_effect import calculate_random_effect
-from modules.plot_results import plot_meta_analysis
+from modules.instrumentation import configure_logging, count, instrumented
+from modules.meta_dataset import MetaDataset
+from modules.storage import get_output_path, read_table, write_table
+
+logger = logging.getLogger(__name__)
 
 
 def export_global_scores(global_scores_table, output_path):
-    global_scores_table.to_csv(output_path, index=False)
+    write_table(global_scores_table, output_path)
 
 
-def meta_analysis(meta_frame):
+@instrumented
+def meta_analysis(
+    meta_frame,
+    plot=True,
+    output_format="csv",
+    output_dir="output",
+    return_random_effect=False,
+):
     """
     This function calculates the meta-analysis of the global scores. It filters the global scores, calculates
-    the average effect size, the fail-safe N, and the comments on the plots.
+    the average effect size, the fail-safe N, and the comments on the plots (skipped when plot is False).
+    The global scores table is written to output_dir as 'csv', 'parquet' or 'arrow' (output_format).
+    meta_frame is a DataFrame or the MetaDataset of prepare_meta_dataframe(..., as_dataset=True).
+    With return_random_effect, the RandomEffectResults of the model are returned as a fourth value.
     """
 
-    # Filter the global scores
-    globalScore_lines = meta_frame["Color"] == "orange"
-    global_scores_table = meta_frame[globalScore_lines].copy()
-    global_scores_table.index = np.arange(0, len(global_scores_table.index))
-    nb_plots = len(global_scores_table["Author"])
-
-    for i in range(nb_plots):
-        if "_mean" in global_scores_table.loc[i, "Author"]:
-            global_scores_table.loc[i, "Author"] = global_scores_table.loc[
-                i, "Author"
-            ].replace("_mean", "")
-        global_scores_table.loc[i, "Author"] = global_scores_table.loc[i, "Author"]
-
-    # Get the weight, d and var of each study
-    weight_of_studies = []  # W in Borenstein's book
-    d_of_studies = []  # Y in Borenstein's book
-    var_of_studies = []  # Vy in Borenstein's book
-
-    for i in range(nb_plots):
-        if global_scores_table.loc[i, "Color"] == "orange":
-            weight_of_studies.append(global_scores_table.loc[i, "Weight"])
-            d_of_studies.append(global_scores_table.loc[i, "d"])
-            var_of_studies.append(global_scores_table.loc[i, "Var"])
-
-    # Calculate the average effect size (global)
-    studies = pd.Series(global_scores_table["Author"], dtype="category").cat.categories
-    nb_studies = len(studies)
+    dataset = (
+        meta_frame
+        if isinstance(meta_frame, MetaDataset)
+        else MetaDataset.from_frame(meta_frame)
+    )
 
+    # The global scores are the STUDY rows (a view on the arrays of the dataset)
+    studies = dataset.study_rows()
+    nb_plots = len(studies)
+    nb_studies = studies.nb_studies
+
+    # W, Y and Vy in Borenstein's book
     random_effect_results = calculate_random_effect(
-        np.array(d_of_studies),
-        np.array(weight_of_studies),
-        np.array(var_of_studies),
-        nb_studies,
+        studies.d, studies.Weight, studies.Var, nb_studies
     )
     fail_safe_N = calculate_fail_safe_N(
-        d_of_studies, weight_of_studies, var_of_studies, nb_studies, global_scores_table
+        studies.d, studies.Weight, studies.Var, nb_studies, studies
     )
 
+    # The strings of the table are only built for the plot and the export
+    global_scores_table = studies.to_frame(mean_suffix=False)
+
     # Comments on the plots
-    plot_meta_analysis(
-        nb_plots,
+    if plot:
+        # matplotlib is only imported when a figure is drawn
+        from modules.plot_results import plot_meta_analysis
+
+        plot_meta_analysis(
+            nb_plots,
+            global_scores_table,
+            studies.Weight,
+            random_effect_results.Mstar,
+            nb_studies,
+            random_effect_results.T_squared,
+            random_effect_results.p_val_text,
+            random_effect_results.IC95text,
+            fail_safe_N,
+        )
+
+    export_global_scores(
         global_scores_table,
-        weight_of_studies,
-        random_effect_results.Mstar,
-        nb_studies,
-        random_effect_results.T_squared,
-        random_effect_results.p_val_text,
-        random_effect_results.IC95text,
-        fail_safe_N,
+        get_output_path("global_scores_table", output_format, output_dir),
     )
 
-    if "global_scores_table.csv" not in os.listdir("output/"):
-        export_global_scores(global_scores_table, r"output/global_scores_table.csv")
-
+    if return_random_effect:
+        return meta_frame, fail_safe_N, global_scores_table, random_effect_results
     return meta_frame, fail_safe_N, global_scores_table
 
 
+@instrumented
 def calculate_fail_safe_N(
-    d_of_studies, weight_of_studies, var_of_studies, nb_studies, global_scores_table
+    d_of_studies,
+    weight_of_studies,
+    var_of_studies,
+    nb_studies,
+    global_scores_table,
+    verbose=False,
 ):
     """
     The fail safe N is the number of studies with null effect size that would be needed to make the p-value of
     the random effect model greater than 0.05. It is a measure of the robustness of the meta-analysis. In other
     words, it represents the number of studies that would be needed to make the meta-analysis not significant.
+
+    Each 'null study' has an effect size of 0 and the mean weight of the real studies, and it is added to the
+    random weights of the model. Adding null studies only changes the sum of the random weights, so the count is
+    solved from the sums of W* and W*Y instead of refitting the model once per added study.
     """
 
-    # Initial p-value
     random_effect_results = calculate_random_effect(
         np.array(d_of_studies),
         np.array(weight_of_studies),
         np.array(var_of_studies),
         nb_studies,
     )
-    Wstar = random_effect_results.Wstar
-    failure_pval = random_effect_results.p_value
-
-    count_failure = 0
-    # Add studies with null effect size until the p-value is greater than 0.05
-    while failure_pval < 0.05:
-        null_diff = 0
-        mean_weight = np.mean(
-            global_scores_table["Weight"]
-        )  # simulating the weight of the new 'null study' using the mean weight of real studies
-
-        d_of_studies.append(null_diff)
-        weight_of_studies.append(mean_weight)
-        Wstar.append(mean_weight)
-        nb_studies += 1
-        count_failure += 1
-
-        random_effect_results = calculate_random_effect(
-            np.array(d_of_studies),
-            np.array(weight_of_studies),
-            np.array(var_of_studies),
-            nb_studies,
-            Wstar,
-        )
-        failure_pval = random_effect_results.p_value
+    Wstar = np.array(random_effect_results.Wstar)
 
-        print("Count failure... ", count_failure)
-        print("p.value... ", failure_pval)
-        print("")
+    # simulating the weight of the new 'null study' using the mean weight of real studies
+    mean_weight = np.mean(global_scores_table["Weight"])
 
-    fail_safe_N = count_failure
+    sum_Wstar = np.sum(Wstar)
+    sum_Wstar_Y = np.sum(Wstar * np.array(d_of_studies))
+    fail_safe_N = solve_fail_safe_N(sum_Wstar, sum_Wstar_Y, mean_weight)
+
+    logger.log(
+        logging.INFO if verbose else logging.DEBUG,
+        "Fail safe N = %s | p.value = %s",
+        fail_safe_N,
+        calculate_fail_safe_p_value(sum_Wstar, sum_Wstar_Y, mean_weight, fail_safe_N),
+    )
 
     return fail_safe_N
 
 
+def calculate_fail_safe_p_value(sum_Wstar, sum_Wstar_Y, null_weight, nb_null_studies):
+    """
+    p-value of the random effect model once nb_null_studies studies with a null effect size and a weight of
+    null_weight have been added to the random weights (the null studies leave sum(W*Y) unchanged).
+    """
+    sum_Wstar = sum_Wstar + nb_null_studies * null_weight
+    Mstar = sum_Wstar_Y / sum_Wstar
+    SE_Mstar = np.sqrt(1 / sum_Wstar)
+    Z = Mstar / SE_Mstar
+    return 2 * (1 - ndtr(abs(Z)))
+
+
+def solve_fail_safe_N(sum_Wstar, sum_Wstar_Y, null_weight, alpha=0.05):
+    """
+    Smallest number of null studies for which the p-value of the random effect model is >= alpha.
+
+    The closed form comes from |Z| = |sum(W*Y)| / sqrt(sum(W*) + N * null_weight) <= z_crit. It is then checked
+    against the exact p-value, with a bisection over N when rounding puts the closed form off the boundary.
+    """
+    if not (np.isfinite(null_weight) and null_weight > 0):
+        raise ValueError("The weight of the null studies must be a positive number")
+
+    def is_significant(nb_null_studies):
+        count("fail_safe_iterations")
+        p_value = calculate_fail_safe_p_value(
+            sum_Wstar, sum_Wstar_Y, null_weight, nb_null_studies
+        )
+        return p_value < alpha
+
+    if not is_significant(0):
+        return 0
+
+    z_crit = ndtri(1 - alpha / 2)
+    closed_form = int(np.ceil(((sum_Wstar_Y / z_crit) ** 2 - sum_Wstar) / null_weight))
+
+    # Bracket the answer: lower is significant, upper is not
+    lower, upper = max(closed_form - 1, 0), max(closed_form, 1)
+    while lower > 0 and not is_significant(lower):
+        lower //= 2
+    while is_significant(upper):
+        upper *= 2
+
+    while upper - lower > 1:
+        middle = (lower + upper) // 2
+        if is_significant(middle):
+            lower = middle
+        else:
+            upper = middle
+
+    return upper
+
+
 if __name__ == "__main__":
-    meta_frame = pd.read_csv(r"output/meta_frame.csv")
+    configure_logging()
+    meta_frame = read_table(r"output/meta_frame.csv")
     meta_frame, fail_safe_N, global_scores_table = meta_analysis(meta_frame)
     print(fail_safe_N)
     print(meta_frame)
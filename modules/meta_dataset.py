@@ -0,0 +1,254 @@
+"""
+Creation date: 2026, October
+Author: L. Gardy
+E-mail: ludovic.gardy@cnrs.fr
+Encoding: UTF-8
+
+Related publication
+--------------------
+Title: A meta-analysis of semantic memory in prodromal Alzheimer’s Disease.
+Authors: Joubert S., Gardy L., Didic M., Rouleau I., Barbeau E.J.
+Journal: Neuropsychology Review, 31(2): 221-232, 2021.
+DOI: https://doi.org/10.1007/s11065-020-09453-5
+
+# Note
+#---------
+# MetaDataset: the rows of the meta_frame as contiguous arrays (structure of arrays),
+# passed from prepare_meta_dataframe to meta_analysis. The role of a row is an integer
+# (STUDY: one effect size per study, MEASURE: one measure of a study with several
+# measures) instead of the "orange" / "black" strings of the Color column, and the
+# Author / Color / moderator strings are only built by to_frame, for plots and exports.
+"""
+
+from dataclasses import dataclass, fields, replace
+
+import numpy as np
+import pandas as pd
+from numpy.typing import NDArray
+
+from modules.utils import build_study_index
+
+STUDY, MEASURE = 0, 1
+ROLE_COLORS = np.array(["orange", "black"], dtype=object)
+MEAN_SUFFIX = "_mean"
+
+NUMERIC_COLUMNS = [
+    "CI95inf",
+    "d",
+    "CI95sup",
+    "Weight",
+    "Var",
+    "MCI_size",
+    "Control_size",
+    "MMSE_score",
+    "MoCA_score",
+]
+# Columns a meta_frame must have, the other NUMERIC_COLUMNS (sizes and scores) being
+# optional moderators
+REQUIRED_COLUMNS = ["Author", "Color", "CI95inf", "d", "CI95sup", "Weight", "Var"]
+CATEGORICAL_MODERATORS = ["Task_difficulty", "NamingVsSemantic", "Task"]
+MIXED = "Mixed"
+
+
+@dataclass
+class MetaDataset:
+    """
+    Rows of a meta_frame as arrays of the same length.
+
+    The STUDY rows come first, so the studies of the meta-analysis (study_rows) are a
+    view on the arrays and not a copy. Slicing a MetaDataset also returns views.
+
+    Attributes
+    ----------
+    CI95inf, d, CI95sup, Weight, Var, MCI_size, Control_size, MMSE_score, MoCA_score :
+    NDArray
+        float64 columns of the meta_frame.
+    study_codes : NDArray
+        int64 code of the study of each row, its name being studies[code].
+    role : NDArray
+        int8 role of each row, STUDY or MEASURE.
+    is_mean : NDArray
+        True for the STUDY rows that average the measures of a study.
+    moderator_codes : dict
+        int64 code of each categorical moderator (-1 if missing), its label being
+        moderator_levels[moderator][code].
+    studies : pd.Index
+    moderator_levels : dict
+    """
+
+    CI95inf: NDArray
+    d: NDArray
+    CI95sup: NDArray
+    Weight: NDArray
+    Var: NDArray
+    MCI_size: NDArray
+    Control_size: NDArray
+    MMSE_score: NDArray
+    MoCA_score: NDArray
+    study_codes: NDArray
+    role: NDArray
+    is_mean: NDArray
+    moderator_codes: dict
+    studies: pd.Index
+    moderator_levels: dict
+
+    def __len__(self):
+        return len(self.d)
+
+    def __getitem__(self, rows):
+        """A column (by name), or a subset of the rows (views for a slice)."""
+        if isinstance(rows, str):
+            if rows in self.moderator_codes:
+                return self.moderator_labels(rows)
+            return getattr(self, rows)
+        return self.take(rows)
+
+    def _row_arrays(self):
+        return [
+            field.name
+            for field in fields(self)
+            if isinstance(getattr(self, field.name), np.ndarray)
+        ]
+
+    def take(self, rows):
+        """Subset of the rows: views for a slice, copies for an index or a mask."""
+        return replace(
+            self,
+            **{name: getattr(self, name)[rows] for name in self._row_arrays()},
+            moderator_codes={
+                moderator: codes[rows]
+                for moderator, codes in self.moderator_codes.items()
+            },
+        )
+
+    @property
+    def nb_study_rows(self):
+        return int(np.searchsorted(self.role, MEASURE))
+
+    def study_rows(self):
+        """The STUDY rows (the global scores of the meta-analysis), without copy."""
+        return self[: self.nb_study_rows]
+
+    @property
+    def nb_studies(self):
+        return len(np.unique(self.study_codes))
+
+    def authors(self, mean_suffix: bool = True):
+        """Author of each row, with "_mean" after the averaged studies if mean_suffix."""
+        authors = self.studies.to_numpy(dtype=object)[self.study_codes]
+        if mean_suffix and self.is_mean.any():
+            authors[self.is_mean] = authors[self.is_mean] + MEAN_SUFFIX
+        return authors
+
+    def colors(self):
+        return ROLE_COLORS[self.role]
+
+    def moderator_labels(self, moderator: str):
+        # The code -1 (missing) picks the NaN added after the levels
+        labels = np.append(
+            np.asarray(self.moderator_levels[moderator], dtype=object), np.nan
+        )
+        return labels[self.moderator_codes[moderator]]
+
+    def to_frame(self, mean_suffix: bool = True, sort_by_weight: bool = False):
+        """
+        The rows as a meta_frame (Author, numeric columns, moderators, Color).
+
+        Parameters
+        ----------
+        mean_suffix : bool
+            Keep "_mean" at the end of the Author of the averaged studies (the
+            global_scores_table drops it).
+        sort_by_weight : bool
+            Order the rows by increasing Weight, whatever their role, as in the
+            meta_frame written by prepare_meta_dataframe.
+        """
+        frame = pd.DataFrame(
+            {
+                "Author": self.authors(mean_suffix),
+                **{column: getattr(self, column) for column in NUMERIC_COLUMNS},
+                **{
+                    moderator: self.moderator_labels(moderator)
+                    for moderator in self.moderator_codes
+                },
+                "Color": self.colors(),
+            }
+        )
+        if sort_by_weight:
+            order = np.argsort(self.Weight, kind="stable")
+            frame = frame.iloc[order].reset_index(drop=True)
+        return frame
+
+    @classmethod
+    def from_frame(cls, meta_frame: pd.DataFrame):
+        """
+        MetaDataset of a meta_frame (e.g. read back from output/meta_frame.csv).
+
+        The optional numeric columns missing from the frame are filled with NaN.
+        """
+        missing = [column for column in REQUIRED_COLUMNS if column not in meta_frame]
+        if missing:
+            raise ValueError(
+                "The meta_frame misses the required columns: {} (required: {})".format(
+                    ", ".join(missing), ", ".join(REQUIRED_COLUMNS)
+                )
+            )
+
+        authors = meta_frame["Author"].astype(str)
+        is_mean = authors.str.endswith(MEAN_SUFFIX).to_numpy()
+        names = authors.str.slice(stop=-len(MEAN_SUFFIX)).where(is_mean, authors)
+        study_codes, studies = build_study_index(names)
+        role = np.where(
+            meta_frame["Color"].to_numpy() == ROLE_COLORS[STUDY], STUDY, MEASURE
+        ).astype(np.int8)
+
+        moderator_codes, moderator_levels = {}, {}
+        for moderator in CATEGORICAL_MODERATORS:
+            if moderator in meta_frame:
+                codes, levels = pd.factorize(meta_frame[moderator], sort=True)
+                moderator_codes[moderator] = codes.astype(np.int64)
+                moderator_levels[moderator] = list(levels)
+
+        dataset = cls(
+            **{
+                column: (
+                    meta_frame[column].to_numpy(dtype=np.float64)
+                    if column in meta_frame
+                    else np.full(len(meta_frame), np.nan)
+                )
+                for column in NUMERIC_COLUMNS
+            },
+            study_codes=study_codes.astype(np.int64),
+            role=role,
+            is_mean=is_mean,
+            moderator_codes=moderator_codes,
+            studies=studies,
+            moderator_levels=moderator_levels,
+        )
+        # STUDY rows first, in the order of the frame
+        return dataset.take(np.argsort(role, kind="stable"))
+
+
+def group_nanmean(codes: NDArray, values: NDArray, nb_groups: int):
+    """
+    Mean of values per group, ignoring NaN (NaN for a group without values).
+
+    The grouped mean of pandas sums with compensated (Kahan) summation, so the means are
+    the same to the last digit as those of a DataFrame groupby (a bincount of the
+    values can differ in the last digit, e.g. 26.599999999999998 instead of 26.6).
+    """
+    means = pd.Series(values).groupby(codes).mean()
+    return means.reindex(np.arange(nb_groups)).to_numpy(dtype=np.float64)
+
+
+def summarize_category_codes(codes: NDArray, values: NDArray, nb_groups: int, mixed):
+    """
+    Code shared by all the (non-missing) values of each group, mixed if they differ and
+    -1 if the group has no value.
+    """
+    present = values >= 0
+    lowest = np.full(nb_groups, np.iinfo(np.int64).max)
+    highest = np.full(nb_groups, -1)
+    np.minimum.at(lowest, codes[present], values[present])
+    np.maximum.at(highest, codes[present], values[present])
+    return np.where(highest < 0, -1, np.where(lowest == highest, lowest, mixed))
@@ -0,0 +1,320 @@
+"""
+Creation date: 2026, October
+Author: L. Gardy
+E-mail: ludovic.gardy@cnrs.fr
+Encoding: UTF-8
+
+Related publication
+--------------------
+Title: A meta-analysis of semantic memory in prodromal Alzheimer’s Disease.
+Authors: Joubert S., Gardy L., Didic M., Rouleau I., Barbeau E.J.
+Journal: Neuropsychology Review, 31(2): 221-232, 2021.
+DOI: https://doi.org/10.1007/s11065-020-09453-5
+"""
+
+from dataclasses import dataclass
+from typing import List
+
+import numpy as np
+import pandas as pd
+from numpy.typing import NDArray
+from scipy.special import chdtrc, ndtr
+
+MODERATORS = ["MMSE_score", "MoCA_score", "Task_difficulty", "NamingVsSemantic", "Task"]
+
+
+@dataclass
+class MetaRegressionResults:
+    moderators: list
+    coefficient_names: list
+    coefficients: NDArray
+    SE: NDArray
+    Z: NDArray
+    p_value: NDArray
+    CI95inf: NDArray
+    CI95sup: NDArray
+    T_squared: float
+    QE: float
+    QE_p_value: float
+    QM: float
+    QM_p_value: float
+    R_squared: float
+    k: int
+    estimable: bool = True
+
+    def to_frame(self):
+        return pd.DataFrame(
+            {
+                "coefficient": self.coefficients,
+                "SE": self.SE,
+                "Z": self.Z,
+                "p_value": self.p_value,
+                "CI95inf": self.CI95inf,
+                "CI95sup": self.CI95sup,
+            },
+            index=pd.Index(self.coefficient_names, name="term"),
+        )
+
+
+def build_design_matrix(table: pd.DataFrame, moderators: List[str]):
+    """
+    Design matrix of a meta-regression: an intercept, the numeric moderators as they are
+    and the categorical moderators dummy-encoded (first category as reference).
+
+    Rows with a missing moderator are excluded, and dummy columns that are constant
+    over the included rows are dropped.
+
+    Returns
+    -------
+    X : NDArray
+        (number of rows of the table x number of coefficients). Excluded rows are 0.
+    coefficient_names : list
+    included : NDArray
+        Boolean mask of the rows used in the model.
+    """
+    included = np.ones(len(table), dtype=bool)
+    for moderator in moderators:
+        included &= table[moderator].notna().to_numpy()
+
+    columns = [np.ones(len(table))]
+    coefficient_names = ["intercept"]
+    for moderator in moderators:
+        values = table[moderator]
+        if pd.api.types.is_numeric_dtype(values):
+            columns.append(values.fillna(0).to_numpy(dtype=float))
+            coefficient_names.append(moderator)
+            continue
+
+        categories = sorted(values[included].unique())
+        for category in categories[1:]:
+            columns.append((values == category).to_numpy(dtype=float))
+            coefficient_names.append(f"{moderator}[{category}]")
+
+    X = np.column_stack(columns) * included[:, np.newaxis]
+    varying = np.ones(X.shape[1], dtype=bool)
+    varying[1:] = np.ptp(X[included][:, 1:], axis=0) > 0 if included.any() else False
+
+    return (
+        X[:, varying],
+        [n for n, keep in zip(coefficient_names, varying) if keep],
+        included,
+    )
+
+
+def _weighted_qr(X: NDArray, weights: NDArray):
+    """QR decomposition of sqrt(weights) * X, for a stack of design matrices."""
+    return np.linalg.qr(np.sqrt(weights)[..., np.newaxis] * X)
+
+
+def _is_full_rank(R: NDArray, nb_rows: int):
+    """
+    True for the triangular factors R (m x p x p) of full column rank: no diagonal term
+    is negligible next to the largest one (the tolerance of np.linalg.matrix_rank).
+    """
+    diagonal = np.abs(np.diagonal(R, axis1=-2, axis2=-1))
+    largest = diagonal.max(axis=-1, initial=0.0)
+    tolerance = largest * max(nb_rows, R.shape[-1]) * np.finfo(float).eps
+    return (largest > 0) & np.all(diagonal > tolerance[:, np.newaxis], axis=-1)
+
+
+def _solvable(R: NDArray, estimable: NDArray):
+    """R with an identity in place of the factors of the models that are not estimable."""
+    return np.where(estimable[:, np.newaxis, np.newaxis], R, np.eye(R.shape[-1]))
+
+
+def fit_stacked_meta_regressions(
+    Y: NDArray, W: NDArray, var: NDArray, X: NDArray, included: NDArray
+):
+    """
+    Mixed-effects meta-regressions sharing the same number of coefficients, solved
+    together.
+
+    The residual T^2 is the method of moments estimator
+    (QE - (k - p)) / (sum(W) - trace((X'WX)^-1 X'W^2X)), truncated at 0. The models are
+    solved through the QR decomposition of the weighted design matrices, without
+    forming (X'WX)^-1.
+
+    Parameters
+    ----------
+    Y, W, var : NDArray
+        Effect sizes, weights and variances (n).
+    X : NDArray
+        Stack of design matrices (m x n x p).
+    included : NDArray
+        Rows used by each model (m x n).
+
+    Returns
+    -------
+    dict
+        Arrays with one entry (or row) per model. "estimable" is False for the models
+        with no more rows than coefficients or with a rank deficient design (e.g. two
+        aliased moderators): all their statistics are NaN, and the other models of the
+        stack are not affected.
+    """
+    p = X.shape[2]
+    if X.shape[1] < p:
+        # Fewer rows than coefficients: excluded rows are added so that R is p x p
+        padding = p - X.shape[1]
+        X = np.pad(X, ((0, 0), (0, padding), (0, 0)))
+        included = np.pad(included, ((0, 0), (0, padding)))
+        Y, W = np.pad(Y, (0, padding)), np.pad(W, (0, padding))
+        var = np.pad(var, (0, padding), constant_values=1.0)
+    k = included.sum(axis=1)
+    W = np.where(included, W, 0.0)
+
+    # Fixed effect fit: residual heterogeneity QE and the moment estimator of T^2
+    Q_fixed, R_fixed = _weighted_qr(X, W)
+    estimable = (k > p) & _is_full_rank(R_fixed, X.shape[1])
+    weighted_Y = np.sqrt(W) * Y
+    beta_fixed = np.linalg.solve(
+        _solvable(R_fixed, estimable),
+        np.einsum("mnp,mn->mp", Q_fixed, weighted_Y)[..., np.newaxis],
+    )[..., 0]
+    QE = np.sum(W * (Y - np.einsum("mnp,mp->mn", X, beta_fixed)) ** 2, axis=1)
+    trace_term = np.einsum("mn,mnp->m", W, Q_fixed**2)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        T_squared = np.maximum((QE - (k - p)) / (W.sum(axis=1) - trace_term), 0)
+    T_squared = np.where(estimable, np.nan_to_num(T_squared, nan=0.0), np.nan)
+
+    # Random effects fit
+    Wstar = np.where(included, 1 / (var + np.nan_to_num(T_squared)[:, np.newaxis]), 0.0)
+    Q_random, R_random = _weighted_qr(X, Wstar)
+    R_random = _solvable(R_random, estimable)
+    beta = np.linalg.solve(
+        R_random,
+        np.einsum("mnp,mn->mp", Q_random, np.sqrt(Wstar) * Y)[..., np.newaxis],
+    )[..., 0]
+
+    # Covariance of the coefficients: R^-1 R^-T, from a triangular solve
+    R_inverse = np.linalg.solve(R_random, np.broadcast_to(np.eye(p), R_random.shape))
+    covariance = R_inverse @ np.swapaxes(R_inverse, -1, -2)
+    SE = np.sqrt(np.diagonal(covariance, axis1=-2, axis2=-1))
+
+    if p > 1:
+        beta_moderators = beta[:, 1:]
+        QM = np.einsum(
+            "mp,mp->m",
+            beta_moderators,
+            np.linalg.solve(covariance[:, 1:, 1:], beta_moderators[..., np.newaxis])[
+                ..., 0
+            ],
+        )
+    else:
+        QM = np.zeros(len(k))
+
+    not_estimable = ~estimable
+    beta[not_estimable] = np.nan
+    SE[not_estimable] = np.nan
+    QE[not_estimable] = np.nan
+    QM[not_estimable] = np.nan
+
+    return {
+        "k": k,
+        "estimable": estimable,
+        "coefficients": beta,
+        "SE": SE,
+        "T_squared": T_squared,
+        "QE": QE,
+        "QM": QM,
+    }
+
+
+def _make_results(moderators, coefficient_names, fit, i, T_squared_null):
+    beta, SE = fit["coefficients"][i], fit["SE"][i]
+    k, p = int(fit["k"][i]), len(coefficient_names)
+    Z = beta / SE
+    T_squared = fit["T_squared"][i]
+    # Share of the heterogeneity explained by the moderators
+    if np.isnan(T_squared):
+        R_squared = np.nan
+    elif T_squared_null > 0:
+        R_squared = max(0.0, (T_squared_null - T_squared) / T_squared_null)
+    else:
+        R_squared = 0.0
+    return MetaRegressionResults(
+        moderators=list(moderators),
+        coefficient_names=coefficient_names,
+        coefficients=beta,
+        SE=SE,
+        Z=Z,
+        p_value=2 * (1 - ndtr(np.abs(Z))),
+        CI95inf=beta - 1.96 * SE,
+        CI95sup=beta + 1.96 * SE,
+        T_squared=T_squared,
+        QE=fit["QE"][i],
+        QE_p_value=chdtrc(k - p, fit["QE"][i]),
+        QM=fit["QM"][i],
+        QM_p_value=chdtrc(p - 1, fit["QM"][i]) if p > 1 else np.nan,
+        R_squared=R_squared,
+        k=k,
+        estimable=bool(fit["estimable"][i]),
+    )
+
+
+def fit_meta_regression_batch(
+    table: pd.DataFrame, moderator_sets: List[List[str]]
+) -> List[MetaRegressionResults]:
+    """
+    Fit one meta-regression per candidate set of moderators.
+
+    Candidate sets with the same number of coefficients are stacked and solved together,
+    each with its own rows (a study missing a moderator only drops out of the models
+    using that moderator). R^2 compares the residual T^2 with the T^2 of an intercept
+    only model on the same rows. A set that cannot be estimated (fewer rows than
+    coefficients, or aliased moderators) gets NaN statistics and estimable=False,
+    without stopping the other sets.
+    """
+    Y = table["d"].to_numpy(dtype=float)
+    W = table["Weight"].to_numpy(dtype=float)
+    var = table["Var"].to_numpy(dtype=float)
+
+    designs = [build_design_matrix(table, moderators) for moderators in moderator_sets]
+
+    null_fit = fit_stacked_meta_regressions(
+        Y,
+        W,
+        var,
+        np.stack([included[:, np.newaxis] * 1.0 for _, _, included in designs]),
+        np.stack([included for _, _, included in designs]),
+    )
+
+    results = [None] * len(designs)
+    nb_coefficients = np.array([X.shape[1] for X, _, _ in designs])
+    for p in np.unique(nb_coefficients):
+        members = np.flatnonzero(nb_coefficients == p)
+        fit = fit_stacked_meta_regressions(
+            Y,
+            W,
+            var,
+            np.stack([designs[i][0] for i in members]),
+            np.stack([designs[i][2] for i in members]),
+        )
+        for position, i in enumerate(members):
+            results[i] = _make_results(
+                moderator_sets[i],
+                designs[i][1],
+                fit,
+                position,
+                null_fit["T_squared"][i],
+            )
+
+    return results
+
+
+def fit_meta_regression(table: pd.DataFrame, moderators: List[str] = MODERATORS):
+    """
+    Mixed-effects meta-regression of the effect sizes of a table (global_scores_table
+    or meta_frame) on study moderators. Categorical moderators are dummy-encoded.
+    """
+    return fit_meta_regression_batch(table, [moderators])[0]
+
+
+if __name__ == "__main__":
+    global_scores_table = pd.read_csv(r"output/global_scores_table.csv")
+    results = fit_meta_regression(
+        global_scores_table, ["MMSE_score", "Task_difficulty"]
+    )
+    print(results.to_frame())
+    print(
+        f"T^2 = {results.T_squared:.3f} | QM = {results.QM:.3f} (p = {results.QM_p_value:.4f}) | QE = {results.QE:.3f} (p = {results.QE_p_value:.4f}) | R^2 = {results.R_squared:.3f}"
+    )
@@ -0,0 +1,293 @@
+"""
+Creation date: 2026, October
+Author: L. Gardy
+E-mail: ludovic.gardy@cnrs.fr
+Encoding: UTF-8
+
+Related publication
+--------------------
+Title: A meta-analysis of semantic memory in prodromal Alzheimer’s Disease.
+Authors: Joubert S., Gardy L., Didic M., Rouleau I., Barbeau E.J.
+Journal: Neuropsychology Review, 31(2): 221-232, 2021.
+DOI: https://doi.org/10.1007/s11065-020-09453-5
+
+# Note
+#---------
+# Models keeping every measure of the studies with several measures, instead of their
+# "_mean" row: a three-level random effect model (measures within studies) and robust
+# variance estimation (RVE) with correlated effects weights.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from numpy.typing import NDArray
+from scipy.optimize import minimize
+from scipy.special import ndtr, stdtr
+
+from modules.calculate_effect_size import get_t_critical_value
+from modules.calculate_random_effect import calculate_random_effect
+from modules.storage import read_table
+from modules.utils import build_study_index
+
+
+@dataclass
+class ThreeLevelResults:
+    Mstar: float
+    SE_Mstar: float
+    Z: float
+    p_value: float
+    CI95inf: float
+    CI95sup: float
+    sigma2_within: float  # level 2: between measures of a study
+    sigma2_between: float  # level 3: between studies
+    I2_within: float
+    I2_between: float
+    robust_SE: float
+    robust_p_value: float
+    log_likelihood: float  # restricted (REML)
+    k: int  # measures
+    m: int  # studies
+    converged: bool
+
+
+@dataclass
+class RVEResults:
+    Mstar: float
+    SE_Mstar: float
+    t_value: float
+    df: int
+    p_value: float
+    CI95inf: float
+    CI95sup: float
+    T_squared: float
+    rho: float
+    k: int
+    m: int
+
+
+def get_measure_table(meta_frame: pd.DataFrame):
+    """Rows of the meta_frame with one measure each (without the "_mean" rows)."""
+    is_mean = meta_frame["Author"].str.endswith("_mean")
+    return meta_frame[~is_mean].reset_index(drop=True)
+
+
+def _cluster_sums(codes: NDArray, m: int, *values):
+    return [np.bincount(codes, weights=value, minlength=m) for value in values]
+
+
+def _three_level_terms(
+    sigma2_within: float,
+    sigma2_between: float,
+    Y: NDArray,
+    var: NDArray,
+    codes: NDArray,
+    m: int,
+):
+    """
+    Sums of one REML evaluation, cluster by cluster.
+
+    The covariance of the measures of study i is V_i = D_i + sigma2_between * J, with D_i
+    = diag(var + sigma2_within) and J a matrix of ones. Its inverse comes from the
+    Sherman-Morrison formula, V_i^-1 = D_i^-1 - s D_i^-1 J D_i^-1 / (1 + s 1'D_i^-1 1), so
+    every quantity is a per-study sum (bincount): the cost grows with the number of
+    measures and no k x k matrix is ever formed.
+    """
+    a = 1 / (var + sigma2_within)
+    A, B = _cluster_sums(codes, m, a, a * Y)
+    denominator = 1 + sigma2_between * A
+
+    sum_1V1 = np.sum(A / denominator)  # 1' V^-1 1
+    Mstar = np.sum(B / denominator) / sum_1V1
+
+    residuals = Y - Mstar
+    A_r, A_rr = _cluster_sums(codes, m, a * residuals, a * residuals**2)
+    # 1' V_i^-1 r_i, per study
+    score = A_r / denominator
+    quadratic_form = np.sum(A_rr - sigma2_between * A_r**2 / denominator)
+    log_determinant = np.sum(np.log(var + sigma2_within)) + np.sum(np.log(denominator))
+
+    return {
+        "Mstar": Mstar,
+        "sum_1V1": sum_1V1,
+        "score": score,
+        "restricted_log_likelihood": -0.5
+        * (log_determinant + np.log(sum_1V1) + quadratic_form),
+    }
+
+
+def fit_three_level_model_arrays(
+    Y: NDArray, var: NDArray, codes: NDArray, tol: float = 1e-10
+):
+    """
+    Three-level random effect model, fitted by REML.
+
+    y_ij = M + u_i + e_ij + sampling error, with u_i ~ N(0, sigma2_between) the effect
+    of study i and e_ij ~ N(0, sigma2_within) the deviation of its measure j.
+
+    Parameters
+    ----------
+    Y, var : NDArray
+        Effect size and variance of every measure.
+    codes : NDArray
+        Integer code of the study of every measure (0 ... m - 1).
+    tol : float
+        Tolerance of the optimizer.
+
+    Returns
+    -------
+    ThreeLevelResults
+        The robust SE is the cluster-robust (sandwich) SE of M, with the small sample
+        correction m / (m - 1).
+    """
+    Y = np.asarray(Y, dtype=float)
+    var = np.asarray(var, dtype=float)
+    codes = np.asarray(codes, dtype=np.int64)
+    k = len(Y)
+    m = int(codes.max()) + 1
+
+    def objective(parameters):
+        return -_three_level_terms(*parameters, Y, var, codes, m)[
+            "restricted_log_likelihood"
+        ]
+
+    # Start from the DerSimonian-Laird T^2 of all the measures, split between levels
+    T_squared = calculate_random_effect(Y, 1 / var, var, k).T_squared
+    start = np.full(2, max(T_squared, 0.01) / 2)
+    optimum = minimize(
+        objective,
+        start,
+        method="L-BFGS-B",
+        bounds=[(0, None), (0, None)],
+        options={"ftol": tol, "gtol": tol},
+    )
+    sigma2_within, sigma2_between = optimum.x
+    terms = _three_level_terms(sigma2_within, sigma2_between, Y, var, codes, m)
+
+    Mstar = terms["Mstar"]
+    SE_Mstar = np.sqrt(1 / terms["sum_1V1"])
+    Z = Mstar / SE_Mstar
+    robust_SE = np.sqrt(
+        m / (m - 1) * np.sum(terms["score"] ** 2) / terms["sum_1V1"] ** 2
+    )
+
+    # I^2 of each level, with the typical sampling variance of the measures
+    W = 1 / var
+    typical_var = (k - 1) * np.sum(W) / (np.sum(W) ** 2 - np.sum(W**2))
+    total_var = sigma2_within + sigma2_between + typical_var
+
+    return ThreeLevelResults(
+        Mstar=Mstar,
+        SE_Mstar=SE_Mstar,
+        Z=Z,
+        p_value=2 * (1 - ndtr(abs(Z))),
+        CI95inf=Mstar - 1.96 * SE_Mstar,
+        CI95sup=Mstar + 1.96 * SE_Mstar,
+        sigma2_within=sigma2_within,
+        sigma2_between=sigma2_between,
+        I2_within=sigma2_within / total_var,
+        I2_between=sigma2_between / total_var,
+        robust_SE=robust_SE,
+        robust_p_value=2 * stdtr(m - 1, -abs(Mstar / robust_SE)),
+        log_likelihood=terms["restricted_log_likelihood"],
+        k=k,
+        m=m,
+        converged=bool(optimum.success),
+    )
+
+
+def robust_variance_estimation_arrays(
+    Y: NDArray, var: NDArray, codes: NDArray, rho: float = 0.8
+):
+    """
+    Robust variance estimation of the mean effect, with the correlated effects weights
+    of Hedges, Tipton and Johnson (2010).
+
+    The measures of study i get the weight 1 / (k_i * (mean(var_i) + T^2)), T^2 being the
+    method of moments estimate of the between-study variance under an assumed
+    correlation rho between the measures of a study. The SE is the sandwich estimator
+    over studies, with the small sample correction m / (m - 1), and the t test has
+    m - 1 degrees of freedom.
+
+    Parameters
+    ----------
+    Y, var : NDArray
+        Effect size and variance of every measure.
+    codes : NDArray
+        Integer code of the study of every measure (0 ... m - 1).
+    rho : float
+        Assumed correlation between the measures of a study (0.8 by convention; the
+        results are usually insensitive to it).
+    """
+    Y = np.asarray(Y, dtype=float)
+    var = np.asarray(var, dtype=float)
+    codes = np.asarray(codes, dtype=np.int64)
+    k = len(Y)
+    m = int(codes.max()) + 1
+
+    nb_measures, sum_var = _cluster_sums(codes, m, np.ones(k), var)
+    mean_var = sum_var / nb_measures
+
+    # Method of moments T^2 with the weights 1 / (k_i * mean(var_i)): E[QE] equals
+    # T^2 * (S - sum((k_i w_i)^2) / S) + m - sum(w_i^2 k_i mean(var_i)
+    # (1 + (k_i - 1) rho)) / S, with S = sum(k_i w_i)
+    w = 1 / (nb_measures * mean_var)
+    S = np.sum(nb_measures * w)
+    M = np.sum(w[codes] * Y) / S
+    QE = np.sum(w[codes] * (Y - M) ** 2)
+    correlated_term = (
+        np.sum(w**2 * nb_measures * mean_var * (1 + (nb_measures - 1) * rho)) / S
+    )
+    T_squared = max(
+        0.0,
+        (QE - m + correlated_term) / (S - np.sum((nb_measures * w) ** 2) / S),
+    )
+
+    w = 1 / (nb_measures * (mean_var + T_squared))
+    sum_w = np.sum(nb_measures * w)
+    Mstar = np.sum(w[codes] * Y) / sum_w
+    (weighted_residuals,) = _cluster_sums(codes, m, w[codes] * (Y - Mstar))
+    SE_Mstar = np.sqrt(m / (m - 1) * np.sum(weighted_residuals**2) / sum_w**2)
+
+    df = m - 1
+    t_value = Mstar / SE_Mstar
+    t_critical = get_t_critical_value(float(df))
+
+    return RVEResults(
+        Mstar=Mstar,
+        SE_Mstar=SE_Mstar,
+        t_value=t_value,
+        df=df,
+        p_value=2 * stdtr(df, -abs(t_value)),
+        CI95inf=Mstar - t_critical * SE_Mstar,
+        CI95sup=Mstar + t_critical * SE_Mstar,
+        T_squared=T_squared,
+        rho=rho,
+        k=k,
+        m=m,
+    )
+
+
+def fit_three_level_model(meta_frame: pd.DataFrame, **kwargs):
+    """Three-level model of every measure of the meta_frame, clustered by study."""
+    measures = get_measure_table(meta_frame)
+    codes, _ = build_study_index(measures["Author"])
+    return fit_three_level_model_arrays(
+        measures["d"].to_numpy(), measures["Var"].to_numpy(), codes, **kwargs
+    )
+
+
+def robust_variance_estimation(meta_frame: pd.DataFrame, rho: float = 0.8):
+    """RVE of every measure of the meta_frame, clustered by study."""
+    measures = get_measure_table(meta_frame)
+    codes, _ = build_study_index(measures["Author"])
+    return robust_variance_estimation_arrays(
+        measures["d"].to_numpy(), measures["Var"].to_numpy(), codes, rho
+    )
+
+
+if __name__ == "__main__":
+    meta_frame = read_table(r"output/meta_frame.csv")
+    print(fit_three_level_model(meta_frame))
+    print(robust_variance_estimation(meta_frame))
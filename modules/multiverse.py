@@ -0,0 +1,311 @@
+"""
+Creation date: 2026, October
+Author: L. Gardy
+E-mail: ludovic.gardy@cnrs.fr
+Encoding: UTF-8
+
+Related publication
+--------------------
+Title: A meta-analysis of semantic memory in prodromal Alzheimer’s Disease.
+Authors: Joubert S., Gardy L., Didic M., Rouleau I., Barbeau E.J.
+Journal: Neuropsychology Review, 31(2): 221-232, 2021.
+DOI: https://doi.org/10.1007/s11065-020-09453-5
+
+# Note
+#---------
+# Multiverse (specification curve) analysis: the meta-analysis is run for every
+# combination of the analysis choices (effect size, averaging of the studies with
+# several measures, Task_difficulty / NamingVsSemantic / Task subgroup).
+"""
+
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from modules.calculate_effect_size import calculate_effect_size_table
+from modules.calculate_random_effect import calculate_random_effect
+from modules.meta_analysis import solve_fail_safe_N
+from modules.streaming import MEASURE_COLUMNS
+from modules.utils import build_study_index
+
+EFFECT_SIZE_METHODS = ["Hedges_g", "Cohens_d", "Glass_delta"]
+FILTER_COLUMNS = ["Task_difficulty", "NamingVsSemantic", "Task"]
+RESULT_COLUMNS = [
+    "measures",
+    "studies",
+    "Mstar",
+    "T_squared",
+    "SE_Mstar",
+    "p_value",
+    "CI95inf",
+    "CI95sup",
+    "fail_safe_N",
+]
+
+# Arrays of the worker processes, views on the shared memory blocks of the parent
+_arrays = {}
+_blocks = []
+_effect_sizes = {}
+
+
+def parse_input_arrays(input_data: pd.DataFrame, filter_columns=FILTER_COLUMNS):
+    """
+    Numeric arrays of an extraction table, shared by every specification.
+
+    Returns
+    -------
+    arrays : dict
+        "measures": the 6 measure columns (n x 6 float64), "codes": the study code and
+        the code of each filter column (n x (1 + number of filters) int64, -1 if
+        missing).
+    levels : dict
+        Labels of the codes of each filter column.
+    """
+    study_codes, _ = build_study_index(input_data["Authors"])
+    codes = [study_codes]
+    levels = {}
+    for column in filter_columns:
+        column_codes, labels = pd.factorize(
+            input_data[column].astype("string").str.strip(), sort=True
+        )
+        codes.append(column_codes)
+        levels[column] = list(labels)
+
+    arrays = {
+        "measures": np.ascontiguousarray(
+            input_data[MEASURE_COLUMNS].to_numpy(dtype=np.float64)
+        ),
+        "codes": np.ascontiguousarray(np.column_stack(codes).astype(np.int64)),
+    }
+    return arrays, levels
+
+
+def build_specification_grid(
+    levels: dict,
+    effect_size_methods=EFFECT_SIZE_METHODS,
+    average_measures=(True, False),
+    filters: dict = None,
+):
+    """
+    Every combination of the analysis choices, one row per specification.
+
+    Parameters
+    ----------
+    levels : dict
+        Levels of each filter column (from parse_input_arrays).
+    effect_size_methods : list
+    average_measures : tuple
+        True: the measures of a study are averaged into one effect size (as in
+        prepare_meta_dataframe). False: every measure counts as a study.
+    filters : dict, optional
+        Values to try for each filter column, None meaning no filter. By default, no
+        filter and every level of the column.
+
+    Returns
+    -------
+    pd.DataFrame
+        effect_size_method, average_measures and one column per filter ("all" when the
+        column is not filtered).
+    """
+    if filters is None:
+        filters = {column: [None] + list(values) for column, values in levels.items()}
+
+    specifications = pd.DataFrame(
+        list(
+            itertools.product(effect_size_methods, average_measures, *filters.values())
+        ),
+        columns=["effect_size_method", "average_measures", *filters],
+    )
+    for column in filters:
+        specifications[column] = specifications[column].fillna("all")
+    specifications.index.name = "specification"
+    return specifications
+
+
+def encode_specifications(specifications: pd.DataFrame, levels: dict):
+    """Specifications as small tuples (method, average, filter codes) for the workers."""
+    filter_codes = []
+    for column, column_levels in levels.items():
+        if column in specifications:
+            lookup = {level: code for code, level in enumerate(column_levels)}
+            filter_codes.append(
+                specifications[column].map(lookup).fillna(-1).astype(int).tolist()
+            )
+        else:
+            filter_codes.append([-1] * len(specifications))
+    return list(
+        zip(
+            specifications["effect_size_method"].tolist(),
+            specifications["average_measures"].tolist(),
+            zip(*filter_codes),
+        )
+    )
+
+
+def share_arrays(arrays: dict):
+    """Copy arrays into shared memory blocks. Returns the blocks and their descriptors."""
+    blocks = []
+    descriptors = {}
+    for name, array in arrays.items():
+        block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+        blocks.append(block)
+        descriptors[name] = (block.name, array.shape, array.dtype.str)
+    return blocks, descriptors
+
+
+def _attach_shared_arrays(descriptors: dict):
+    """Pool initializer: map the shared blocks of the parent, without any copy."""
+    _effect_sizes.clear()
+    for name, (block_name, shape, dtype) in descriptors.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        _blocks.append(block)
+        _arrays[name] = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+
+
+def _get_effect_sizes(effect_size_method: str):
+    """Effect sizes of every row, computed once per method and per process."""
+    if effect_size_method not in _effect_sizes:
+        measures = _arrays["measures"]
+        _effect_sizes[effect_size_method] = calculate_effect_size_table(
+            *measures.T, effect_size_method
+        )
+    return _effect_sizes[effect_size_method]
+
+
+def run_specification(effect_size_method, average_measures, filter_codes):
+    """Random effect model and fail-safe N of one specification (RESULT_COLUMNS)."""
+    codes = _arrays["codes"]
+    effect_data = _get_effect_sizes(effect_size_method)
+
+    rows = effect_data["valid"].copy()
+    for column, code in enumerate(filter_codes, start=1):
+        if code >= 0:
+            rows &= codes[:, column] == code
+    nb_measures = int(rows.sum())
+
+    Y = effect_data["d"][rows]
+    var = effect_data["Var"][rows]
+    W = effect_data["Weight"][rows]
+    if average_measures and nb_measures > 0:
+        _, study = np.unique(codes[rows, 0], return_inverse=True)
+        nb_per_study = np.bincount(study)
+        Y = np.bincount(study, weights=Y) / nb_per_study
+        var = np.bincount(study, weights=var) / nb_per_study
+        W = np.bincount(study, weights=W) / nb_per_study
+
+    k = len(Y)
+    if k < 2:
+        # Not estimable: a single study has no random effect model
+        return [nb_measures, k] + [np.nan] * (len(RESULT_COLUMNS) - 2)
+
+    random_effect_results = calculate_random_effect(Y, W, var, k)
+    Mstar = random_effect_results.Mstar
+    sum_Wstar = np.sum(random_effect_results.Wstar)
+    SE_Mstar = np.sqrt(1 / sum_Wstar)
+    fail_safe_N = solve_fail_safe_N(sum_Wstar, Mstar * sum_Wstar, np.mean(W))
+
+    return [
+        nb_measures,
+        k,
+        Mstar,
+        random_effect_results.T_squared,
+        SE_Mstar,
+        random_effect_results.p_value,
+        Mstar - 1.96 * SE_Mstar,
+        Mstar + 1.96 * SE_Mstar,
+        fail_safe_N,
+    ]
+
+
+def _run_specifications(specifications: list):
+    return np.array(
+        [run_specification(*specification) for specification in specifications]
+    )
+
+
+def run_multiverse(
+    input_data: pd.DataFrame,
+    specifications: pd.DataFrame = None,
+    processes: int = None,
+    chunk_size: int = 256,
+):
+    """
+    Run the meta-analysis of every specification of the multiverse.
+
+    The input table is parsed once into numeric arrays, which are put in shared memory
+    and mapped by each worker process (pool initializer): the tasks only carry the
+    specifications, never the data. Each worker computes the effect sizes of a method
+    once, then fits the random effect model and the fail-safe N of its specifications.
+
+    Parameters
+    ----------
+    input_data : pd.DataFrame
+        Extraction table (input_data/input_data.csv).
+    specifications : pd.DataFrame, optional
+        From build_specification_grid (default: the full grid).
+    processes : int, optional
+        Number of worker processes (default: number of CPUs). 1 runs in the current
+        process.
+    chunk_size : int
+        Specifications per task.
+
+    Returns
+    -------
+    pd.DataFrame
+        The specifications with their results (RESULT_COLUMNS). estimable is
+        False for the specifications with fewer than 2 studies, whose results are NaN.
+    """
+    arrays, levels = parse_input_arrays(input_data)
+    if specifications is None:
+        specifications = build_specification_grid(levels)
+
+    encoded = encode_specifications(specifications, levels)
+    chunks = [
+        encoded[start : start + chunk_size]
+        for start in range(0, len(encoded), chunk_size)
+    ]
+
+    if processes == 1:
+        _arrays.update(arrays)
+        _effect_sizes.clear()
+        blocks = [_run_specifications(chunk) for chunk in chunks]
+    else:
+        shared_blocks, descriptors = share_arrays(arrays)
+        try:
+            with ProcessPoolExecutor(
+                max_workers=processes,
+                initializer=_attach_shared_arrays,
+                initargs=(descriptors,),
+            ) as executor:
+                blocks = list(executor.map(_run_specifications, chunks))
+        finally:
+            for block in shared_blocks:
+                block.close()
+                block.unlink()
+
+    results = pd.DataFrame(
+        np.concatenate(blocks) if blocks else np.empty((0, len(RESULT_COLUMNS))),
+        columns=RESULT_COLUMNS,
+        index=specifications.index,
+    )
+    for column in ["measures", "studies"]:
+        results[column] = results[column].astype(int)
+    results.insert(2, "estimable", results["studies"] >= 2)
+    results["fail_safe_N"] = results["fail_safe_N"].astype("Int64")
+
+    return pd.concat([specifications, results], axis=1)
+
+
+if __name__ == "__main__":
+    input_data = pd.read_csv(r"input_data/input_data.csv")
+    multiverse = run_multiverse(input_data, processes=2)
+    multiverse = multiverse[multiverse["estimable"]]
+    print(multiverse.sort_values("Mstar"))
+
+    from modules.plot_results import plot_specification_curve
+
+    plot_specification_curve(multiverse)
@@ -12,68 +12,144 @@ Journal: Neuropsychology Review, 31(2): 221-232, 2021.
 DOI: https://doi.org/10.1007/s11065-020-09453-5
 """
 
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+
 import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
+from matplotlib.artist import Artist
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.backends.backend_pdf import PdfPages
+from matplotlib.collections import LineCollection
+from matplotlib.figure import Figure
 from matplotlib.markers import MarkerStyle
+from matplotlib.text import Text
+from matplotlib.transforms import Bbox, blended_transform_factory
 
+from modules.instrumentation import count, instrumented
+from modules.storage import read_table
 
-def plot_meta_analysis(
-    nb_plots: int,
+logger = logging.getLogger(__name__)
+
+SIZES_DICT = {"orange": 20, "black": 5}
+WIDTH_DICT = {"orange": 2, "black": 0.7}
+MARKERS_DICT = {"orange": "D", "black": "o"}
+
+
+class TextColumn(Artist):
+    """
+    A column of labels (one per row, at x and the y of each row) drawn as a single
+    artist: one Text is moved from row to row when the column is drawn, instead of
+    adding one Text artist per cell to the axes.
+    """
+
+    def __init__(self, x: float, y, labels, **text_kwargs):
+        super().__init__()
+        self._x = x
+        self._y = np.asarray(y, dtype=float)
+        self._labels = [str(label) for label in labels]
+        self._text = Text(x, 0, "", clip_on=False, **text_kwargs)
+
+    def set_figure(self, fig):
+        super().set_figure(fig)
+        self._text.set_figure(fig)
+
+    def _cells(self):
+        self._text.set_transform(self.get_transform())
+        for y, label in zip(self._y, self._labels):
+            self._text.set_position((self._x, y))
+            self._text.set_text(label)
+            yield self._text
+
+    def draw(self, renderer):
+        if not self.get_visible():
+            return
+        for text in self._cells():
+            text.draw(renderer)
+        self.stale = False
+
+    def get_window_extent(self, renderer=None):
+        extents = [text.get_window_extent(renderer) for text in self._cells()]
+        return Bbox.union(extents) if extents else Bbox.null()
+
+
+def add_text_columns(ax, columns: dict, y, **text_kwargs):
+    """Add {x: labels} to ax, one TextColumn per x, the labels being at the rows y."""
+    for x, labels in columns.items():
+        ax.add_artist(TextColumn(x, y, labels, **text_kwargs))
+
+
+def draw_forest_plot(
+    ax,
     global_scores_table: pd.DataFrame,
     weight_of_studies: list,
     randomeffect_model_result: float,
-    nb_studies: int,
-    T_squared: float,
-    p_val_text: str,
-    IC95text: str,
-    fail_safe_N: int,
 ):
-    fig, ax = plt.subplots(figsize=(15, 16))
-    plt.xticks(fontsize=14)
+    """
+    Draw the forest plot of the global_scores_table on ax.
+
+    The CI bars of all the studies are one LineCollection, the effect sizes one scatter
+    per marker type, and each label column one TextColumn artist.
+    """
+    nb_plots = global_scores_table.shape[0]
+    y = np.arange(nb_plots)
+    colors = global_scores_table["Color"].to_numpy()
+    d = global_scores_table["d"].to_numpy()
+    CI95inf = global_scores_table["CI95inf"].to_numpy()
+    CI95sup = global_scores_table["CI95sup"].to_numpy()
+
     ax.axvline(0, color="red", linestyle="--", linewidth=1)
     ax.set_xlim(-4, 10)
     ax.set_ylabel("Studies", fontsize=18)
     ax.set_xlabel("Score", fontsize=18)
+    ax.tick_params(axis="x", labelsize=14)
 
-    sizes_dict = {"orange": 20, "black": 5}
-    width_dict = {"orange": 2, "black": 0.7}
-    markers_dict = {"orange": "D", "black": "o"}
-
-    for i in range(nb_plots):
-        row = global_scores_table.iloc[i]
-        ax.plot(
-            [row["CI95inf"], row["CI95sup"]],
-            [i, i],
-            color="dimgrey",
-            linewidth=width_dict[row["Color"]],
+    segments = np.stack(
+        [np.column_stack([CI95inf, y]), np.column_stack([CI95sup, y])], axis=1
+    )
+    ax.add_collection(
+        LineCollection(
+            segments,
+            colors="dimgrey",
+            linewidths=[WIDTH_DICT[color] for color in colors],
             zorder=1,
         )
-        ax.scatter(
-            row["d"],
-            [i],
-            color="black",
-            s=sizes_dict[row["Color"]],
-            marker=markers_dict[row["Color"]],
-            zorder=2,
-        )
-        ax.text(-3.8, i, row["Author"], fontsize=14)
-        N_subjects = int(round(row["MCI_size"], 0)) + int(round(row["Control_size"], 0))
-        ax.text(
-            4,
-            i,
-            f"{N_subjects} ({int(round(row['MCI_size'], 0))}; {int(round(row['Control_size'], 0))})",
-            fontsize=14,
-        )
-        ax.text(6, i, f"{row['d']:.2f}", fontsize=14)
-        ax.text(6.5, i, f"({row['CI95inf']:.2f}; {row['CI95sup']:.2f})", fontsize=14)
+    )
+    for color in MARKERS_DICT:
+        rows = colors == color
+        if rows.any():
+            ax.scatter(
+                d[rows],
+                y[rows],
+                color="black",
+                s=SIZES_DICT[color],
+                marker=MARKERS_DICT[color],
+                zorder=2,
+            )
+
+    MCI_size = np.round(global_scores_table["MCI_size"].to_numpy()).astype(int)
+    Control_size = np.round(global_scores_table["Control_size"].to_numpy()).astype(int)
+    columns = {
+        -3.8: global_scores_table["Author"].tolist(),
+        4: [
+            f"{mci + ctrl} ({mci}; {ctrl})" for mci, ctrl in zip(MCI_size, Control_size)
+        ],
+        6: [f"{value:.2f}" for value in d],
+        6.5: [f"({inf:.2f}; {sup:.2f})" for inf, sup in zip(CI95inf, CI95sup)],
+    }
 
     total_weight = sum(weight_of_studies)
-    for i in range(nb_plots):
-        if global_scores_table["Color"][i] == "orange":
-            weight = round(global_scores_table["Weight"][i], 2)
-            weight_percent = (weight * 100) / total_weight
-            ax.text(8.5, i, f"{weight:.2f}", fontsize=14)
-            ax.text(9.1, i, f"({weight_percent:.2f})", fontsize=14)
+    weighted_rows = np.flatnonzero(colors == "orange")
+    weights = np.round(global_scores_table["Weight"].to_numpy()[weighted_rows], 2)
+    weight_columns = {
+        8.5: [f"{weight:.2f}" for weight in weights],
+        9.1: [f"({(weight * 100) / total_weight:.2f})" for weight in weights],
+    }
+
+    add_text_columns(ax, columns, y, fontsize=14)
+    add_text_columns(ax, weight_columns, weighted_rows, fontsize=14)
 
     header_y = nb_plots + 2
     ax.text(-3.8, header_y, "Authors. Date [ref]", fontweight="bold", fontsize=14)
@@ -95,19 +171,682 @@ def plot_meta_analysis(
     t._transform = t.get_transform().rotate_deg(90)
     ax.scatter(randomeffect_model_result, -5, s=400, marker=t, color="crimson")
 
-    print(f"mean effect size = {randomeffect_model_result}")
-    print(
+    ax.get_yaxis().set_ticks([])
+
+
+def render_forest_plot(
+    global_scores_table: pd.DataFrame,
+    weight_of_studies: list,
+    randomeffect_model_result: float,
+    output_path: str,
+    dpi: int = 100,
+):
+    """
+    Headless forest plot written straight to output_path (PNG, SVG or PDF, from the
+    extension). Uses a bare Agg figure, so it never opens a window and can run in
+    worker processes.
+    """
+    fig = Figure(figsize=(15, 16))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    draw_forest_plot(
+        ax, global_scores_table, weight_of_studies, randomeffect_model_result
+    )
+    fig.tight_layout()
+    fig.savefig(output_path, dpi=dpi)
+    return output_path
+
+
+def _render_forest_plot(job):
+    return render_forest_plot(**job)
+
+
+@instrumented
+def render_forest_plots(jobs: list, processes: int = None):
+    """
+    Render many forest plots in a process pool.
+
+    Parameters
+    ----------
+    jobs : list of dict
+        Keyword arguments of render_forest_plot, one dict per figure.
+    processes : int, optional
+        Number of worker processes (default: number of CPUs). 1 renders in the current
+        process.
+
+    Returns
+    -------
+    list
+        The output paths, in the order of the jobs.
+    """
+    count("studies_plotted", sum(len(job["global_scores_table"]) for job in jobs))
+    if processes == 1:
+        return [_render_forest_plot(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        return list(executor.map(_render_forest_plot, jobs))
+
+
+@instrumented
+def plot_meta_analysis(
+    nb_plots: int,
+    global_scores_table: pd.DataFrame,
+    weight_of_studies: list,
+    randomeffect_model_result: float,
+    nb_studies: int,
+    T_squared: float,
+    p_val_text: str,
+    IC95text: str,
+    fail_safe_N: int,
+    output_path: str = None,
+):
+    if output_path is None:
+        fig, ax = plt.subplots(figsize=(15, 16))
+        draw_forest_plot(
+            ax,
+            global_scores_table.iloc[:nb_plots],
+            weight_of_studies,
+            randomeffect_model_result,
+        )
+    else:
+        render_forest_plot(
+            global_scores_table.iloc[:nb_plots],
+            weight_of_studies,
+            randomeffect_model_result,
+            output_path,
+        )
+
+    count("studies_plotted", nb_plots)
+    logger.info("mean effect size = %s", randomeffect_model_result)
+    logger.info(
         f"Nb studies = {nb_studies} | Tau squared = {round(T_squared, 3)} | {p_val_text} | {IC95text} | Fail Safe N = {fail_safe_N}"
     )
 
+    if output_path is None:
+        plt.tight_layout()
+        plt.show()
+
+
+# x position (figure fraction) of the text columns of the paginated forest plots
+PAGE_COLUMNS = {"Author": 0.01, "N": 0.69, "effect": 0.78, "weight": 0.91}
+MAX_AUTHOR_LENGTH = 48
+
+
+def paginate_forest_rows(
+    table: pd.DataFrame,
+    rows_per_page: int = 40,
+    sort_by=None,
+    ascending: bool = True,
+    group_by: str = None,
+):
+    """
+    Split the rows of a forest plot into pages of rows_per_page lines.
+
+    The rows are sorted by sort_by (a column or a list of columns), within each group of
+    group_by if given. Each group starts with a header line, repeated with
+    "(continued)" at the top of a page when the group runs over a page break.
+
+    Returns
+    -------
+    list of list
+        One list per page, with for each line the position of its row in table, or
+        the text of a group header.
+    """
+    if rows_per_page < 2:
+        raise ValueError("A page needs at least 2 rows")
+    for column in [*np.atleast_1d(sort_by if sort_by is not None else []), group_by]:
+        if column is not None and column not in table:
+            raise ValueError("Unknown forest plot column: {}".format(column))
+    order = np.arange(len(table))
+    if sort_by is not None:
+        order = (
+            table.reset_index(drop=True)
+            .sort_values(sort_by, ascending=ascending, kind="stable")
+            .index.to_numpy()
+        )
+
+    if group_by is None:
+        groups = [(None, order)]
+    else:
+        labels = table[group_by].astype(str).str.strip().to_numpy()[order]
+        groups = [
+            (
+                f"{group_by}: {label} (k = {np.sum(labels == label)})",
+                order[labels == label],
+            )
+            for label in sorted(set(labels))
+        ]
+
+    pages = [[]]
+    for header, rows in groups:
+        if header is not None:
+            if len(pages[-1]) >= rows_per_page - 1:
+                pages.append([])
+            pages[-1].append(header)
+        for row in rows:
+            if len(pages[-1]) == rows_per_page:
+                pages.append([] if header is None else [header + " (continued)"])
+            pages[-1].append(int(row))
+    return [page for page in pages if page]
+
+
+def make_page_data(table: pd.DataFrame, page: list, total_weight: float):
+    """
+    Arrays and labels of the lines of one page. The strings are only built for the
+    rows of the page.
+    """
+    lines = np.arange(len(page))
+    is_row = np.array([not isinstance(line, str) for line in page])
+    rows = np.array([line for line in page if not isinstance(line, str)], dtype=int)
+    page_table = table.iloc[rows]
+
+    colors = (
+        page_table["Color"].to_numpy()
+        if "Color" in page_table
+        else np.full(len(rows), "orange", dtype=object)
+    )
+    d = page_table["d"].to_numpy(dtype=float)
+    CI95inf = page_table["CI95inf"].to_numpy(dtype=float)
+    CI95sup = page_table["CI95sup"].to_numpy(dtype=float)
+    MCI_size = np.round(page_table["MCI_size"].to_numpy(dtype=float)).astype(int)
+    Control_size = np.round(page_table["Control_size"].to_numpy(dtype=float)).astype(
+        int
+    )
+    weights = page_table["Weight"].to_numpy(dtype=float)
+
+    labels = {column: [""] * len(page) for column in PAGE_COLUMNS}
+    for line, header in zip(
+        lines[~is_row], [line for line in page if isinstance(line, str)]
+    ):
+        labels["Author"][line] = header
+    for i, line in enumerate(lines[is_row]):
+        author = str(page_table["Author"].iat[i])
+        if len(author) > MAX_AUTHOR_LENGTH:
+            author = author[: MAX_AUTHOR_LENGTH - 3] + "..."
+        labels["Author"][line] = author
+        labels["N"][
+            line
+        ] = f"{MCI_size[i] + Control_size[i]} ({MCI_size[i]}; {Control_size[i]})"
+        labels["effect"][line] = f"{d[i]:.2f} ({CI95inf[i]:.2f}; {CI95sup[i]:.2f})"
+        if colors[i] == "orange":
+            labels["weight"][
+                line
+            ] = f"{weights[i]:.2f} ({weights[i] * 100 / total_weight:.2f})"
+
+    return {
+        "line": lines[is_row],
+        "colors": colors,
+        "d": d,
+        "CI95inf": CI95inf,
+        "CI95sup": CI95sup,
+        "headers": lines[~is_row],
+        "labels": labels,
+    }
+
+
+class ForestPlotTemplate:
+    """
+    Figure of one page of a paginated forest plot, built once and reused for every
+    page.
+
+    The axes, column headers, x range and summary diamond are static. draw_page only
+    updates the data artists (the CI LineCollection, one scatter per marker type and
+    the pre-created text lines of each column), so a page costs a redraw and not a
+    new figure.
+
+    Parameters
+    ----------
+    rows_per_page : int
+    x_limits : tuple
+        Shared by every page, so the pages can be compared.
+    Mstar : float, optional
+        Summary effect, drawn as a diamond under the rows of every page.
+    summary_text : str, optional
+        Text written next to the diamond (e.g. the 95% CI of M*).
+    """
+
+    def __init__(
+        self,
+        rows_per_page: int,
+        x_limits: tuple,
+        Mstar: float = None,
+        summary_text: str = None,
+    ):
+        self.rows_per_page = rows_per_page
+        self.fig = Figure(figsize=(15, 2.5 + 0.28 * rows_per_page))
+        FigureCanvasAgg(self.fig)
+        ax = self.fig.add_axes([0.36, 0.1, 0.31, 0.82])
+        self.ax = ax
+
+        ax.axvline(0, color="red", linestyle="--", linewidth=1)
+        ax.set_xlim(*x_limits)
+        ax.set_ylim(-2.5, rows_per_page + 0.5)
+        ax.set_xlabel("Score", fontsize=12)
+        ax.get_yaxis().set_ticks([])
+        text_transform = blended_transform_factory(self.fig.transFigure, ax.transData)
+
+        header_y = rows_per_page + 0.2
+        headers = {
+            "Author": "Authors. Date [ref]",
+            "N": "N (MCI; Ctrl)",
+            "effect": "Effect size (95% CI)",
+            "weight": "Weights (%)",
+        }
+        for column, header in headers.items():
+            ax.text(
+                PAGE_COLUMNS[column],
+                header_y,
+                header,
+                fontweight="bold",
+                fontsize=10,
+                transform=text_transform,
+            )
+
+        y = rows_per_page - 1 - np.arange(rows_per_page)
+        self.line_y = y
+        self.texts = {
+            column: [
+                ax.text(
+                    x,
+                    line_y,
+                    "",
+                    fontsize=9,
+                    va="center",
+                    transform=text_transform,
+                )
+                for line_y in y
+            ]
+            for column, x in PAGE_COLUMNS.items()
+        }
+
+        self.intervals = LineCollection([], colors="dimgrey", zorder=1)
+        ax.add_collection(self.intervals)
+        self.points = {
+            color: ax.scatter(
+                [],
+                [],
+                color="black",
+                s=SIZES_DICT[color],
+                marker=MARKERS_DICT[color],
+                zorder=2,
+            )
+            for color in MARKERS_DICT
+        }
+
+        if Mstar is not None:
+            marker = MarkerStyle(marker="d")
+            marker._transform = marker.get_transform().rotate_deg(90)
+            ax.scatter(Mstar, -1.5, s=300, marker=marker, color="crimson")
+            ax.text(
+                PAGE_COLUMNS["Author"],
+                -1.5,
+                "Random effects model",
+                fontweight="bold",
+                fontsize=10,
+                va="center",
+                transform=text_transform,
+            )
+            if summary_text:
+                ax.text(
+                    PAGE_COLUMNS["effect"],
+                    -1.5,
+                    summary_text,
+                    fontsize=10,
+                    va="center",
+                    transform=text_transform,
+                )
+        self.page_label = self.fig.text(0.99, 0.01, "", ha="right", fontsize=9)
+
+    def draw_page(self, page_data: dict, page_number: int, nb_pages: int):
+        y = self.line_y[page_data["line"]]
+        colors = page_data["colors"]
+        self.intervals.set_segments(
+            np.stack(
+                [
+                    np.column_stack([page_data["CI95inf"], y]),
+                    np.column_stack([page_data["CI95sup"], y]),
+                ],
+                axis=1,
+            )
+        )
+        self.intervals.set_linewidths([WIDTH_DICT[color] for color in colors])
+        for color, points in self.points.items():
+            rows = colors == color
+            points.set_offsets(np.column_stack([page_data["d"][rows], y[rows]]))
+
+        headers = set(page_data["headers"].tolist())
+        for column, texts in self.texts.items():
+            for line, (text, label) in enumerate(
+                zip(texts, page_data["labels"][column] + [""] * len(texts))
+            ):
+                text.set_text(label)
+                if column == "Author":
+                    text.set_fontweight("bold" if line in headers else "normal")
+        self.page_label.set_text(f"Page {page_number} / {nb_pages}")
+        return self.fig
+
+
+def _render_forest_pages(job):
+    """Render some pages of a paginated forest plot, one file per page."""
+    template = ForestPlotTemplate(**job["template"])
+    for page_data, page_number, path in zip(
+        job["pages"], job["page_numbers"], job["paths"]
+    ):
+        template.draw_page(page_data, page_number, job["nb_pages"])
+        template.fig.savefig(path, dpi=job["dpi"])
+    return job["paths"]
+
+
+@instrumented
+def render_paginated_forest_plot(
+    table: pd.DataFrame,
+    output_path: str,
+    rows_per_page: int = 40,
+    sort_by=None,
+    ascending: bool = True,
+    group_by: str = None,
+    Mstar: float = None,
+    summary_text: str = None,
+    processes: int = None,
+    dpi: int = 100,
+):
+    """
+    Forest plot of many studies or measures, split into pages of rows_per_page lines.
+
+    A '.pdf' output_path gives one multi-page PDF: the pages go through a single
+    PdfPages stream, so they are drawn in one process. Other extensions ('.svg',
+    '.png') give one file per page (name_p001.svg, ...), rendered in parallel: each
+    worker process builds one ForestPlotTemplate and draws its share of the pages on
+    it. The x range is shared by every page.
+
+    Parameters
+    ----------
+    table : pd.DataFrame
+        global_scores_table or meta_frame (Author, d, CI95inf, CI95sup, Weight,
+        MCI_size, Control_size, and optionally Color).
+    output_path : str
+    rows_per_page : int
+        Lines per page, group headers included.
+    sort_by, ascending, group_by :
+        See paginate_forest_rows.
+    Mstar, summary_text : optional
+        Summary effect drawn at the bottom of every page.
+    processes : int, optional
+        Worker processes for the per-page files (default: number of CPUs).
+    dpi : int
+
+    Returns
+    -------
+    list
+        The written paths (empty, with no file written, for a table without rows).
+    """
+    if len(table) == 0:
+        return []
+
+    pages = paginate_forest_rows(table, rows_per_page, sort_by, ascending, group_by)
+    colors = table["Color"].to_numpy() if "Color" in table else None
+    weights = table["Weight"].to_numpy(dtype=float)
+    total_weight = np.sum(weights if colors is None else weights[colors == "orange"])
+    pages_data = [make_page_data(table, page, total_weight) for page in pages]
+
+    low = np.nanmin(table["CI95inf"].to_numpy(dtype=float))
+    high = np.nanmax(table["CI95sup"].to_numpy(dtype=float))
+    low, high = min(low, 0, Mstar or 0), max(high, 0, Mstar or 0)
+    margin = 0.05 * (high - low or 1)
+    template = {
+        "rows_per_page": rows_per_page,
+        "x_limits": (low - margin, high + margin),
+        "Mstar": Mstar,
+        "summary_text": summary_text,
+    }
+    count("studies_plotted", len(table))
+    nb_pages = len(pages_data)
+
+    if os.path.splitext(output_path)[1].lower() == ".pdf":
+        plot_template = ForestPlotTemplate(**template)
+        with PdfPages(output_path) as pdf:
+            for page_number, page_data in enumerate(pages_data, start=1):
+                pdf.savefig(plot_template.draw_page(page_data, page_number, nb_pages))
+        return [output_path]
+
+    root, extension = os.path.splitext(output_path)
+    paths = [f"{root}_p{number:03d}{extension}" for number in range(1, nb_pages + 1)]
+    nb_jobs = min(processes or os.cpu_count() or 1, nb_pages)
+    bounds = np.linspace(0, nb_pages, nb_jobs + 1).astype(int)
+    jobs = [
+        {
+            "template": template,
+            "pages": pages_data[start:stop],
+            "page_numbers": list(range(start + 1, stop + 1)),
+            "paths": paths[start:stop],
+            "nb_pages": nb_pages,
+            "dpi": dpi,
+        }
+        for start, stop in zip(bounds[:-1], bounds[1:])
+    ]
+    if nb_jobs == 1:
+        return [path for job in jobs for path in _render_forest_pages(job)]
+    with ProcessPoolExecutor(max_workers=nb_jobs) as executor:
+        return [
+            path
+            for job_paths in executor.map(_render_forest_pages, jobs)
+            for path in job_paths
+        ]
+
+
+def plot_cumulative_meta_analysis(cumulative_table: pd.DataFrame):
+    """
+    Forest plot of a cumulative meta-analysis: one row per added study, showing M* and
+    its 95% CI once that study is included. The first study added is at the top.
+    """
+    nb_plots = cumulative_table.shape[0]
+    fig, ax = plt.subplots(figsize=(15, max(4, 0.5 * nb_plots + 2)))
+    plt.xticks(fontsize=14)
+    ax.axvline(0, color="red", linestyle="--", linewidth=1)
+    ax.set_xlim(-4, 10)
+    ax.set_ylabel("Studies", fontsize=18)
+    ax.set_xlabel("Score", fontsize=18)
+
+    y = nb_plots - 1 - np.arange(nb_plots)
+    ax.hlines(
+        y,
+        cumulative_table["CI95inf"],
+        cumulative_table["CI95sup"],
+        color="dimgrey",
+        linewidth=2,
+        zorder=1,
+    )
+    ax.scatter(
+        cumulative_table["Mstar"], y, color="crimson", s=40, marker="D", zorder=2
+    )
+
+    for i, row in cumulative_table.iterrows():
+        ax.text(-3.8, y[i], f"+ {row['Author']}", fontsize=14)
+        ax.text(6, y[i], f"{row['Mstar']:.2f}", fontsize=14)
+        ax.text(6.5, y[i], f"({row['CI95inf']:.2f}; {row['CI95sup']:.2f})", fontsize=14)
+        ax.text(8.5, y[i], f"{row['T_squared']:.3f}", fontsize=14)
+
+    header_y = nb_plots + 0.5
+    ax.text(-3.8, header_y, "Added study", fontweight="bold", fontsize=14)
+    ax.text(6, header_y, "Cumulative effect (95% CI)", fontweight="bold", fontsize=14)
+    ax.text(8.5, header_y, "Tau squared", fontweight="bold", fontsize=14)
+    ax.set_ylim(-1, nb_plots + 1.5)
+
     ax.get_yaxis().set_ticks([])
 
     plt.tight_layout()
     plt.show()
 
 
+def plot_specification_curve(
+    multiverse: pd.DataFrame,
+    choice_columns: list = None,
+    output_path: str = None,
+    alpha: float = 0.05,
+):
+    """
+    Specification curve of a multiverse analysis (multiverse.run_multiverse).
+
+    Top: M* and its 95% CI for every specification, sorted by M* (black: p < alpha,
+    grey: not significant). Bottom: the analysis choices of each specification, one
+    line per choice. The specifications that are not estimable (fewer than 2 studies)
+    are left out. Saved to output_path if given (headless), shown otherwise.
+    """
+    if choice_columns is None:
+        result_columns = {"measures", "studies", "estimable", "Mstar", "T_squared"}
+        result_columns |= {"SE_Mstar", "p_value", "CI95inf", "CI95sup", "fail_safe_N"}
+        choice_columns = [c for c in multiverse.columns if c not in result_columns]
+    if "estimable" in multiverse:
+        multiverse = multiverse[multiverse["estimable"]]
+    table = multiverse.dropna(subset=["Mstar"]).sort_values("Mstar")
+    x = np.arange(len(table))
+
+    choices = [
+        (column, value)
+        for column in choice_columns
+        for value in pd.unique(table[column].astype(str))
+    ]
+    height = 6 + 0.25 * len(choices)
+    if output_path is None:
+        fig = plt.figure(figsize=(15, height))
+    else:
+        fig = Figure(figsize=(15, height))
+        FigureCanvasAgg(fig)
+    ax_curve, ax_choices = fig.subplots(
+        2, 1, sharex=True, gridspec_kw={"height_ratios": [6, 0.25 * len(choices)]}
+    )
+
+    significant = (table["p_value"] < alpha).to_numpy()
+    colors = np.where(significant, "black", "darkgrey")
+    ax_curve.add_collection(
+        LineCollection(
+            np.stack(
+                [
+                    np.column_stack([x, table["CI95inf"]]),
+                    np.column_stack([x, table["CI95sup"]]),
+                ],
+                axis=1,
+            ),
+            colors=colors,
+            linewidths=1,
+            alpha=0.5,
+        )
+    )
+    ax_curve.scatter(x, table["Mstar"], c=colors, s=8, zorder=2)
+    ax_curve.axhline(0, color="red", linestyle="--", linewidth=1)
+    ax_curve.set_ylabel("M* (95% CI)", fontsize=14)
+    ax_curve.autoscale_view()
+
+    for row, (column, value) in enumerate(choices):
+        selected = (table[column].astype(str) == value).to_numpy()
+        ax_choices.scatter(
+            x[selected],
+            np.full(selected.sum(), row),
+            c=colors[selected],
+            marker="|",
+            s=30,
+        )
+    ax_choices.set_yticks(np.arange(len(choices)))
+    ax_choices.set_yticklabels(
+        [f"{column}: {value}" for column, value in choices], fontsize=8
+    )
+    ax_choices.set_ylim(len(choices) - 0.5, -0.5)
+    ax_choices.set_xlabel("Specifications (sorted by M*)", fontsize=14)
+
+    fig.tight_layout()
+    if output_path is None:
+        plt.show()
+    else:
+        fig.savefig(output_path)
+    return output_path
+
+
+def plot_funnel(
+    global_scores_table: pd.DataFrame,
+    trim_and_fill_results=None,
+    Mstar: float = None,
+    contours: bool = True,
+    output_path: str = None,
+):
+    """
+    Funnel plot of the studies: effect size against its standard error (inverted axis),
+    with the pseudo 95% confidence region around Mstar.
+
+    With contours, the background is shaded by the significance of a study at each
+    position (contour-enhanced funnel plot: p < 0.01, 0.01-0.05 and 0.05-0.10). The
+    studies imputed by publication_bias.trim_and_fill are drawn as open circles. Saved
+    to output_path if given (headless), shown otherwise.
+    """
+    d = global_scores_table["d"].to_numpy(dtype=float)
+    SE = np.sqrt(global_scores_table["Var"].to_numpy(dtype=float))
+    if Mstar is None:
+        if trim_and_fill_results is not None:
+            Mstar = trim_and_fill_results.Mstar
+        else:
+            W = 1 / SE**2
+            Mstar = np.sum(W * d) / np.sum(W)
+
+    if output_path is None:
+        fig, ax = plt.subplots(figsize=(10, 8))
+    else:
+        fig = Figure(figsize=(10, 8))
+        FigureCanvasAgg(fig)
+        ax = fig.add_subplot()
+
+    SE_max = 1.1 * SE.max()
+    SE_grid = np.linspace(0, SE_max, 100)
+    d_extent = max(np.abs(d).max(), abs(Mstar) + 1.96 * SE_max) * 1.1
+
+    if contours:
+        # |d| / SE above 1.645, 1.96, 2.576: p below 0.10, 0.05, 0.01
+        bands = [
+            (1.645, 1.96, "gainsboro", "0.05 < p < 0.10"),
+            (1.96, 2.576, "darkgrey", "0.01 < p < 0.05"),
+            (2.576, None, "grey", "p < 0.01"),
+        ]
+        for z_inner, z_outer, color, label in bands:
+            outer = np.full_like(SE_grid, d_extent)
+            if z_outer is not None:
+                outer = np.minimum(z_outer * SE_grid, d_extent)
+            inner = np.minimum(z_inner * SE_grid, d_extent)
+            ax.fill_betweenx(SE_grid, inner, outer, color=color, label=label, lw=0)
+            ax.fill_betweenx(SE_grid, -outer, -inner, color=color, lw=0)
+
+    ax.plot(Mstar - 1.96 * SE_grid, SE_grid, color="black", linestyle="--", lw=1)
+    ax.plot(Mstar + 1.96 * SE_grid, SE_grid, color="black", linestyle="--", lw=1)
+    ax.axvline(Mstar, color="black", lw=1)
+    ax.axvline(0, color="red", linestyle="--", linewidth=1)
+
+    ax.scatter(d, SE, color="black", s=40, zorder=3, label="Studies")
+    if trim_and_fill_results is not None and trim_and_fill_results.k0 > 0:
+        ax.scatter(
+            trim_and_fill_results.filled_d,
+            np.sqrt(trim_and_fill_results.filled_var),
+            facecolors="white",
+            edgecolors="black",
+            s=40,
+            zorder=3,
+            label=f"Imputed studies (k0 = {trim_and_fill_results.k0})",
+        )
+        ax.axvline(
+            trim_and_fill_results.Mstar_adjusted, color="orange", lw=1, linestyle="-."
+        )
+
+    ax.set_xlim(-d_extent, d_extent)
+    ax.set_ylim(SE_max, 0)
+    ax.set_xlabel("Effect size", fontsize=14)
+    ax.set_ylabel("Standard error", fontsize=14)
+    ax.legend(loc="best", fontsize=10)
+
+    fig.tight_layout()
+    if output_path is None:
+        plt.show()
+    else:
+        fig.savefig(output_path)
+    return output_path
+
+
 if __name__ == "__main__":
-    table = pd.read_csv(r"output/global_scores_table.csv")
+    table = read_table(r"output/global_scores_table.csv")
     nb_plots = table.shape[0]
     weight_of_studies = [0.1, 0.2, 0.3, 0.4]  # Example weights
     effect_size = 0.5
@@ -12,105 +12,124 @@ Journal: Neuropsychology Review, 31(2): 221-232, 2021.
 DOI: https://doi.org/10.1007/s11065-020-09453-5
 """
 
-import os
-
 import numpy as np
 import pandas as pd
 
 import modules.calculate_effect_size as calculate_effect_size
+from modules.instrumentation import count, instrumented
+from modules.meta_dataset import (
+    CATEGORICAL_MODERATORS,
+    MEASURE,
+    MIXED,
+    STUDY,
+    MetaDataset,
+    group_nanmean,
+    summarize_category_codes,
+)
+from modules.storage import get_output_path, write_table
+from modules.utils import build_study_index
+
+
+def factorize_labels(values):
+    """Codes (-1 if missing) and sorted labels of a column of strings."""
+    codes, labels = pd.factorize(pd.Series(values).str.strip(), sort=True)
+    return codes.astype(np.int64), list(labels)
 
 
-def calculate_meta_data(mean1, mean2, sd1, sd2, size1, size2, effect_size_method):
-    CI95 = calculate_effect_size.calulate_confint_of_effect_size(
-        mean1, mean2, sd1, sd2, size1, size2, effect_size_method
+@instrumented
+def build_meta_dataset(input_data, studies_with_multiple_measures, effect_size_method):
+    """
+    MetaDataset of an extraction table: one MEASURE row per measure of the studies with
+    several measures, and one STUDY row per study (its only measure, or the mean of
+    its measures). Everything is computed on arrays, with one grouped reduction
+    (group_nanmean) over all the studies with several measures.
+    """
+    effect_data = calculate_effect_size.calculate_effect_size_table(
+        input_data["MCI_Mean"],
+        input_data["Control_Mean"],
+        input_data["MCI_SD"],
+        input_data["Control_SD"],
+        input_data["MCI_size"],
+        input_data["Control_size"],
+        effect_size_method,
     )
-    Weight = calculate_effect_size.calculate_weights(
-        mean1, mean2, sd1, sd2, size1, size2, effect_size_method
+    valid = effect_data["valid"]
+    count("rows_ingested", len(valid))
+    count("rows_skipped", (~valid).sum())
+    authors = input_data["Authors"].to_numpy()[valid]
+    is_multiple_measure = (
+        pd.Series(authors).isin(studies_with_multiple_measures).to_numpy()
     )
-    return {
-        "CI95inf": CI95[0],
-        "d": CI95[1],
-        "CI95sup": CI95[2],
-        "Weight": Weight[1],
-        "Var": Weight[0],
-    }
-
+    study_codes, studies = build_study_index(authors)
 
-def prepare_meta_dataframe(
-    input_data, studies_with_multiple_measures, effect_size_method
-):
-    meta_dict = {
-        "Author": [],
-        "CI95inf": [],
-        "d": [],
-        "CI95sup": [],
-        "Weight": [],
-        "Var": [],
-        "MCI_size": [],
-        "Control_size": [],
-        "MMSE_score": [],
-        "Color": [],
+    columns = {
+        **{
+            column: effect_data[column][valid]
+            for column in ["CI95inf", "d", "CI95sup", "Weight", "Var"]
+        },
+        **{
+            column: input_data[column].to_numpy(dtype=np.float64)[valid]
+            for column in ["MCI_size", "Control_size", "MMSE_score", "MoCA_score"]
+        },
     }
+    moderator_codes, moderator_levels = {}, {}
+    for moderator in CATEGORICAL_MODERATORS:
+        codes, levels = factorize_labels(input_data[moderator].to_numpy()[valid])
+        moderator_codes[moderator], moderator_levels[moderator] = codes, levels
 
-    for i in range(len(input_data["MCI_Mean"])):
-        if not (
-            np.isnan(input_data["MCI_Mean"][i])
-            or np.isnan(input_data["Control_Mean"][i])
-            or np.isnan(input_data["MCI_SD"][i])
-            or np.isnan(input_data["Control_SD"][i])
-            or np.isnan(input_data["MCI_size"][i])
-            or np.isnan(input_data["Control_size"][i])
-        ):
-            effect_data = calculate_meta_data(
-                input_data["MCI_Mean"][i],
-                input_data["Control_Mean"][i],
-                input_data["MCI_SD"][i],
-                input_data["Control_SD"][i],
-                input_data["MCI_size"][i],
-                input_data["Control_size"][i],
-                effect_size_method,
-            )
-
-            meta_dict["Author"].append(input_data["Authors"][i])
-            meta_dict["CI95inf"].append(effect_data["CI95inf"])
-            meta_dict["d"].append(effect_data["d"])
-            meta_dict["CI95sup"].append(effect_data["CI95sup"])
-            meta_dict["Weight"].append(effect_data["Weight"])
-            meta_dict["Var"].append(effect_data["Var"])
-            meta_dict["MCI_size"].append(input_data["MCI_size"][i])
-            meta_dict["Control_size"].append(input_data["Control_size"][i])
-            meta_dict["MMSE_score"].append(input_data["MMSE_score"][i])
-            meta_dict["Color"].append(
-                "orange"
-                if input_data["Authors"][i] not in studies_with_multiple_measures
-                else "black"
-            )
+    ### Add means for multiple measures (one grouped reduction over all the studies)
+    mean_studies, groups = np.unique(
+        study_codes[is_multiple_measure], return_inverse=True
+    )
+    nb_means = len(mean_studies)
+    for column, values in columns.items():
+        means = group_nanmean(groups, values[is_multiple_measure], nb_means)
+        columns[column] = np.concatenate([values, means])
+    for moderator, codes in moderator_codes.items():
+        levels = moderator_levels[moderator]
+        means = summarize_category_codes(
+            groups, codes[is_multiple_measure], nb_means, len(levels)
+        )
+        if np.any(means == len(levels)):
+            levels.append(MIXED)
+        moderator_codes[moderator] = np.concatenate([codes, means])
 
-    meta_frame = pd.DataFrame(meta_dict)
+    role = np.concatenate(
+        [np.where(is_multiple_measure, MEASURE, STUDY), np.full(nb_means, STUDY)]
+    ).astype(np.int8)
+    dataset = MetaDataset(
+        **columns,
+        study_codes=np.concatenate([study_codes, mean_studies]).astype(np.int64),
+        role=role,
+        is_mean=np.concatenate(
+            [np.zeros(len(authors), dtype=bool), np.ones(nb_means, dtype=bool)]
+        ),
+        moderator_codes=moderator_codes,
+        studies=studies,
+        moderator_levels=moderator_levels,
+    )
+    # STUDY rows first, each role by increasing weight
+    return dataset.take(np.lexsort((dataset.Weight, role)))
 
-    ### Add means for multiple measures
-    for study in studies_with_multiple_measures:
-        indices = meta_frame.index[meta_frame["Author"] == study].tolist()
-        if indices:
-            meta_dict["Author"].append(study + "_mean")
-            meta_dict["CI95inf"].append(meta_frame.loc[indices, "CI95inf"].mean())
-            meta_dict["d"].append(meta_frame.loc[indices, "d"].mean())
-            meta_dict["CI95sup"].append(meta_frame.loc[indices, "CI95sup"].mean())
-            meta_dict["Weight"].append(meta_frame.loc[indices, "Weight"].mean())
-            meta_dict["Var"].append(meta_frame.loc[indices, "Var"].mean())
-            meta_dict["MCI_size"].append(meta_frame.loc[indices, "MCI_size"].mean())
-            meta_dict["Control_size"].append(
-                meta_frame.loc[indices, "Control_size"].mean()
-            )
-            meta_dict["MMSE_score"].append(meta_frame.loc[indices, "MMSE_score"].mean())
-            meta_dict["Color"].append("orange")
 
-    meta_frame = pd.DataFrame(meta_dict)
-    meta_frame = meta_frame.sort_values(by="Weight", ascending=True).reset_index(
-        drop=True
+@instrumented
+def prepare_meta_dataframe(
+    input_data,
+    studies_with_multiple_measures,
+    effect_size_method,
+    output_format="csv",
+    output_dir="output",
+    as_dataset=False,
+):
+    """
+    Build the meta_frame of an extraction table and write it to output_dir. Returns the
+    meta_frame (sorted by Weight), or its MetaDataset if as_dataset.
+    """
+    dataset = build_meta_dataset(
+        input_data, studies_with_multiple_measures, effect_size_method
     )
+    meta_frame = dataset.to_frame(sort_by_weight=True)
 
-    if "meta_frame.csv" not in os.listdir("output/"):
-        meta_frame.to_csv("output/meta_frame.csv", index=False)
+    write_table(meta_frame, get_output_path("meta_frame", output_format, output_dir))
 
-    return meta_frame
+    return dataset if as_dataset else meta_frame
@@ -0,0 +1,299 @@
+"""
+Creation date: 2026, October
+Author: L. Gardy
+E-mail: ludovic.gardy@cnrs.fr
+Encoding: UTF-8
+
+Related publication
+--------------------
+Title: A meta-analysis of semantic memory in prodromal Alzheimer’s Disease.
+Authors: Joubert S., Gardy L., Didic M., Rouleau I., Barbeau E.J.
+Journal: Neuropsychology Review, 31(2): 221-232, 2021.
+DOI: https://doi.org/10.1007/s11065-020-09453-5
+
+# Note
+#---------
+# Publication bias diagnostics of the studies of global_scores_table (d, Var):
+# Egger's regression test, Begg's rank correlation test and Duval & Tweedie's
+# trim-and-fill (L0 and R0 estimators). See plot_results.plot_funnel for the funnel plot.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from numpy.typing import NDArray
+from scipy.special import ndtr, stdtr
+
+from modules.calculate_random_effect import calculate_random_effect
+
+
+@dataclass
+class EggerTestResults:
+    intercept: float
+    SE: float
+    t_value: float
+    p_value: float
+    slope: float
+    df: int
+
+
+@dataclass
+class BeggTestResults:
+    tau: float
+    z_value: float
+    p_value: float
+
+
+@dataclass
+class TrimAndFillResults:
+    estimator: str
+    side: str
+    k0: int
+    iterations: int
+    Mstar: float
+    Mstar_adjusted: float
+    T_squared_adjusted: float
+    SE_adjusted: float
+    CI95inf_adjusted: float
+    CI95sup_adjusted: float
+    p_value_adjusted: float
+    filled_d: NDArray
+    filled_var: NDArray
+
+
+def egger_test(Y: NDArray, var: NDArray):
+    """
+    Egger's regression test: the standardized effect Y / SE regressed on the precision
+    1 / SE. An intercept away from 0 means small studies report different effects
+    (funnel plot asymmetry). t test with k - 2 degrees of freedom.
+    """
+    Y = np.asarray(Y, dtype=float)
+    SE = np.sqrt(np.asarray(var, dtype=float))
+    k = len(Y)
+    if k < 3:
+        return EggerTestResults(np.nan, np.nan, np.nan, np.nan, np.nan, k - 2)
+
+    x = 1 / SE
+    y = Y / SE
+    x_mean, y_mean = np.mean(x), np.mean(y)
+    Sxx = np.sum((x - x_mean) ** 2)
+    slope = np.sum((x - x_mean) * (y - y_mean)) / Sxx
+    intercept = y_mean - slope * x_mean
+
+    residual_variance = np.sum((y - intercept - slope * x) ** 2) / (k - 2)
+    SE_intercept = np.sqrt(residual_variance * (1 / k + x_mean**2 / Sxx))
+    t_value = intercept / SE_intercept
+    p_value = 2 * stdtr(k - 2, -abs(t_value))
+
+    return EggerTestResults(intercept, SE_intercept, t_value, p_value, slope, k - 2)
+
+
+def begg_test(Y: NDArray, var: NDArray):
+    """
+    Begg and Mazumdar's rank correlation test: Kendall's tau between the standardized
+    effects (Y - M) / sqrt(var - 1 / sum(W)) and the variances, M being the fixed effect
+    estimate. Normal approximation of Kendall's S (computed in O(k log k)).
+    """
+    from scipy.stats import kendalltau
+
+    Y = np.asarray(Y, dtype=float)
+    var = np.asarray(var, dtype=float)
+    k = len(Y)
+    if k < 3:
+        return BeggTestResults(np.nan, np.nan, np.nan)
+
+    W = 1 / var
+    M = np.sum(W * Y) / np.sum(W)
+    standardized = (Y - M) / np.sqrt(var - 1 / np.sum(W))
+
+    tau = kendalltau(standardized, var).statistic
+    # Kendall's S and its variance without ties
+    S = tau * k * (k - 1) / 2
+    z_value = S / np.sqrt(k * (k - 1) * (2 * k + 5) / 18)
+    p_value = 2 * (1 - ndtr(abs(z_value)))
+
+    return BeggTestResults(tau, z_value, p_value)
+
+
+def estimate_missing_studies(
+    y_sorted: NDArray, beta: float, estimator: str = "L0"
+) -> float:
+    """
+    L0 or R0 estimate of the number of missing studies, from the ranks of |y - beta|.
+
+    y_sorted is sorted, so the negative deviations (reversed) and the positive ones are
+    two sorted runs of |y - beta|: the rank of each deviation is its position in its run
+    plus the number of smaller deviations in the other run (searchsorted), without
+    sorting again. Ties are ranked in the order of y_sorted: a negative deviation ranks
+    below a positive one of the same size.
+    """
+    k = len(y_sorted)
+    split = np.searchsorted(y_sorted, beta, side="right")
+    negative = (beta - y_sorted[:split])[::-1]
+    positive = y_sorted[split:] - beta
+
+    if estimator == "L0":
+        positive_ranks = np.arange(1, len(positive) + 1) + np.searchsorted(
+            negative, positive, side="right"
+        )
+        T_n = np.sum(positive_ranks)
+        return (4 * T_n - k * (k + 1)) / (2 * k - 1)
+
+    if estimator == "R0":
+        if len(negative) == 0:
+            return k - 1
+        # Length of the run of positive deviations above the largest negative one
+        largest_negative_rank = len(negative) + np.searchsorted(
+            positive, negative[-1], side="left"
+        )
+        return k - largest_negative_rank - 1
+
+    raise ValueError(
+        "Unknown trim-and-fill estimator: {} (expected 'L0' or 'R0')".format(estimator)
+    )
+
+
+def trim_and_fill(
+    Y: NDArray,
+    var: NDArray,
+    estimator: str = "L0",
+    side: str = None,
+    max_iter: int = 100,
+):
+    """
+    Duval and Tweedie's trim-and-fill.
+
+    The k0 most extreme studies of the side opposite to the missing studies are trimmed,
+    the fixed effect estimate is refitted on the others, and k0 is re-estimated from
+    the ranks of the deviations, until k0 stops changing. The effects are sorted once:
+    trimming the k0 most extreme studies is then a prefix of the sorted arrays, so each
+    refit is a lookup in the prefix sums of W and WY, and the ranks come from
+    estimate_missing_studies. The trimmed studies are then mirrored around the
+    estimate and the random effect model is fitted with them.
+
+    Parameters
+    ----------
+    Y, var : NDArray
+        Effect sizes and variances.
+    estimator : str
+        'L0' or 'R0'.
+    side : str, optional
+        Side of the funnel plot where studies are missing, 'left' or 'right'. By
+        default, from the sign of Egger's intercept (positive: missing on the left).
+    max_iter : int
+    """
+    Y = np.asarray(Y, dtype=float)
+    var = np.asarray(var, dtype=float)
+    k = len(Y)
+
+    if side is None:
+        side = "left" if egger_test(Y, var).intercept > 0 else "right"
+    if side not in ("left", "right"):
+        raise ValueError("side must be 'left' or 'right'")
+
+    # The estimators assume the studies are missing on the left, so that the studies to
+    # trim are the largest ones: flip the effects when they are missing on the right
+    sign = -1.0 if side == "right" else 1.0
+    y = sign * Y
+    order = np.argsort(y, kind="stable")
+    y_sorted = y[order]
+    var_sorted = var[order]
+    W_sorted = 1 / var_sorted
+    cumulative_W = np.concatenate([[0.0], np.cumsum(W_sorted)])
+    cumulative_WY = np.concatenate([[0.0], np.cumsum(W_sorted * y_sorted)])
+
+    k0 = 0
+    iterations = 0
+    for iterations in range(1, max_iter + 1):
+        beta = cumulative_WY[k - k0] / cumulative_W[k - k0]
+        estimate = estimate_missing_studies(y_sorted, beta, estimator)
+        new_k0 = int(min(max(0, round(estimate)), k - 1))
+        if new_k0 == k0:
+            break
+        k0 = new_k0
+
+    beta = cumulative_WY[k - k0] / cumulative_W[k - k0]
+    filled_d = sign * (2 * beta - y_sorted[k - k0 :])
+    filled_var = var_sorted[k - k0 :]
+
+    original = calculate_random_effect(Y, 1 / var, var, k)
+    Y_filled = np.concatenate([Y, filled_d])
+    var_filled = np.concatenate([var, filled_var])
+    adjusted = calculate_random_effect(
+        Y_filled, 1 / var_filled, var_filled, len(Y_filled)
+    )
+    SE_adjusted = np.sqrt(1 / np.sum(adjusted.Wstar))
+
+    return TrimAndFillResults(
+        estimator=estimator,
+        side=side,
+        k0=k0,
+        iterations=iterations,
+        Mstar=original.Mstar,
+        Mstar_adjusted=adjusted.Mstar,
+        T_squared_adjusted=adjusted.T_squared,
+        SE_adjusted=SE_adjusted,
+        CI95inf_adjusted=adjusted.Mstar - 1.96 * SE_adjusted,
+        CI95sup_adjusted=adjusted.Mstar + 1.96 * SE_adjusted,
+        p_value_adjusted=adjusted.p_value,
+        filled_d=filled_d,
+        filled_var=filled_var,
+    )
+
+
+def assess_publication_bias(global_scores_table: pd.DataFrame, estimator: str = "L0"):
+    """Egger, Begg and trim-and-fill of the studies of a table, as one summary row."""
+    Y = global_scores_table["d"].to_numpy(dtype=float)
+    var = global_scores_table["Var"].to_numpy(dtype=float)
+    egger = egger_test(Y, var)
+    begg = begg_test(Y, var)
+
+    summary = {
+        "k": len(Y),
+        "Egger_intercept": egger.intercept,
+        "Egger_p_value": egger.p_value,
+        "Begg_tau": begg.tau,
+        "Begg_p_value": begg.p_value,
+    }
+    if len(Y) >= 3:
+        fill = trim_and_fill(Y, var, estimator)
+        summary.update(
+            {
+                "side": fill.side,
+                "k0": fill.k0,
+                "Mstar": fill.Mstar,
+                "Mstar_adjusted": fill.Mstar_adjusted,
+                "CI95inf_adjusted": fill.CI95inf_adjusted,
+                "CI95sup_adjusted": fill.CI95sup_adjusted,
+                "p_value_adjusted": fill.p_value_adjusted,
+            }
+        )
+    return summary
+
+
+def assess_publication_bias_by_group(
+    global_scores_table: pd.DataFrame, group_by: str, estimator: str = "L0"
+):
+    """assess_publication_bias for the whole table and each subgroup of group_by."""
+    rows = {"all": assess_publication_bias(global_scores_table, estimator)}
+    for group, table in global_scores_table.groupby(group_by, sort=True):
+        rows[group] = assess_publication_bias(table, estimator)
+    summary = pd.DataFrame.from_dict(rows, orient="index")
+    summary.index.name = group_by
+    return summary
+
+
+if __name__ == "__main__":
+    global_scores_table = pd.read_csv(r"output/global_scores_table.csv")
+    print(egger_test(global_scores_table["d"], global_scores_table["Var"]))
+    print(begg_test(global_scores_table["d"], global_scores_table["Var"]))
+    trim_and_fill_results = trim_and_fill(
+        global_scores_table["d"], global_scores_table["Var"]
+    )
+    print(trim_and_fill_results)
+    print(assess_publication_bias_by_group(global_scores_table, "Task_difficulty"))
+
+    from modules.plot_results import plot_funnel
+
+    plot_funnel(global_scores_table, trim_and_fill_results)
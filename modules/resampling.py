@@ -0,0 +1,228 @@
+"""
+Creation date: 2026, October
+Author: L. Gardy
+E-mail: ludovic.gardy@cnrs.fr
+Encoding: UTF-8
+
+Related publication
+--------------------
+Title: A meta-analysis of semantic memory in prodromal Alzheimer’s Disease.
+Authors: Joubert S., Gardy L., Didic M., Rouleau I., Barbeau E.J.
+Journal: Neuropsychology Review, 31(2): 221-232, 2021.
+DOI: https://doi.org/10.1007/s11065-020-09453-5
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from numpy.typing import NDArray
+from scipy.special import ndtr, ndtri
+
+from modules.calculate_random_effect import (
+    calculate_random_effect,
+    calculate_random_effect_batch,
+)
+from modules.leave_one_out import calculate_leave_one_out_arrays
+
+
+@dataclass
+class ResamplingResults:
+    method: str
+    B: int
+    Mstar: float
+    T_squared: float
+    Mstar_replicates: NDArray
+    T_squared_replicates: NDArray
+    Mstar_percentile_CI: tuple
+    Mstar_BCa_CI: tuple
+    T_squared_percentile_CI: tuple
+    T_squared_BCa_CI: tuple
+    p_value: float
+
+
+def evaluate_replicates(Y: NDArray, W: NDArray, var: NDArray):
+    """
+    Random effect estimates of a block of replicates.
+
+    Y, W and var are 2-D (one replicate per row, k studies per row).
+    """
+    nb_replicates, k = Y.shape
+    offsets = np.arange(0, (nb_replicates + 1) * k, k)
+    results = calculate_random_effect_batch(Y.ravel(), W.ravel(), var.ravel(), offsets)
+    return results.Mstar, results.T_squared
+
+
+def run_replicate_block(method, Y, W, var, nb_replicates, seed_sequence):
+    """
+    Draw and evaluate one block of replicates with its own random stream.
+
+    "bootstrap" resamples the studies with replacement, "permutation" flips the sign
+    of each effect size at random (null hypothesis M* = 0).
+    """
+    rng = np.random.default_rng(seed_sequence)
+    k = len(Y)
+    if method == "bootstrap":
+        indices = rng.integers(0, k, size=(nb_replicates, k))
+        return evaluate_replicates(Y[indices], W[indices], var[indices])
+    elif method == "permutation":
+        signs = rng.choice(np.array([-1.0, 1.0]), size=(nb_replicates, k))
+        replicate_var = np.broadcast_to(var, (nb_replicates, k))
+        replicate_W = np.broadcast_to(W, (nb_replicates, k))
+        return evaluate_replicates(signs * Y, replicate_W, replicate_var)
+    raise ValueError(
+        "Unknown resampling method: {} (expected 'bootstrap' or 'permutation')".format(
+            method
+        )
+    )
+
+
+def _run_replicate_block(arguments):
+    return run_replicate_block(*arguments)
+
+
+def calculate_percentile_CI(replicates: NDArray, alpha: float = 0.05):
+    lower, upper = np.quantile(replicates, [alpha / 2, 1 - alpha / 2])
+    return lower, upper
+
+
+def calculate_BCa_CI(
+    replicates: NDArray, estimate: float, jackknife: NDArray, alpha: float = 0.05
+):
+    """
+    Bias-corrected and accelerated interval. The bias correction comes from the share
+    of replicates below the estimate, the acceleration from the jackknife (leave-one-out)
+    estimates.
+    """
+    z0 = ndtri(np.mean(replicates < estimate))
+
+    jackknife_deviation = np.mean(jackknife) - jackknife
+    denominator = 6 * np.sum(jackknife_deviation**2) ** 1.5
+    acceleration = (
+        np.sum(jackknife_deviation**3) / denominator if denominator > 0 else 0.0
+    )
+
+    z_alpha = ndtri(np.array([alpha / 2, 1 - alpha / 2]))
+    adjusted = ndtr(z0 + (z0 + z_alpha) / (1 - acceleration * (z0 + z_alpha)))
+    if not np.all(np.isfinite(adjusted)):
+        return np.nan, np.nan
+
+    lower, upper = np.quantile(replicates, adjusted)
+    return lower, upper
+
+
+def resample_random_effect_arrays(
+    Y: NDArray,
+    W: NDArray,
+    var: NDArray,
+    B: int = 10000,
+    method: str = "bootstrap",
+    seed: int = None,
+    block_size: int = None,
+    processes: int = 1,
+    alpha: float = 0.05,
+):
+    """
+    Bootstrap or permutation distribution of the random effect model.
+
+    Parameters
+    ----------
+    Y, W, var : NDArray
+        Effect sizes, weights and variances of the studies.
+    B : int
+        Number of replicates.
+    method : str
+        "bootstrap" (resampling of studies) or "permutation" (sign flipping).
+    seed : int, optional
+        Root seed. Every block gets its own child of numpy.random.SeedSequence(seed),
+        so the replicates are the same whatever the number of processes.
+    block_size : int, optional
+        Replicates evaluated together. Defaults to about one million values per block.
+    processes : int
+        Number of worker processes. 1 runs the blocks in the current process.
+    alpha : float
+        1 - confidence level of the intervals.
+    """
+    Y = np.asarray(Y, dtype=float)
+    W = np.asarray(W, dtype=float)
+    var = np.asarray(var, dtype=float)
+    k = len(Y)
+
+    if block_size is None:
+        block_size = max(1, 2**20 // k)
+    block_sizes = [min(block_size, B - start) for start in range(0, B, block_size)]
+    seed_sequences = np.random.SeedSequence(seed).spawn(len(block_sizes))
+    tasks = [
+        (method, Y, W, var, nb_replicates, seed_sequence)
+        for nb_replicates, seed_sequence in zip(block_sizes, seed_sequences)
+    ]
+
+    if processes == 1:
+        blocks = [_run_replicate_block(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            blocks = list(executor.map(_run_replicate_block, tasks))
+
+    Mstar_replicates = np.concatenate([block[0] for block in blocks])
+    T_squared_replicates = np.concatenate([block[1] for block in blocks])
+
+    observed = calculate_random_effect(Y, W, var, k)
+
+    if method == "permutation":
+        # Replicates are drawn under the null, so only the p-value is meaningful
+        exceedances = np.sum(np.abs(Mstar_replicates) >= abs(observed.Mstar))
+        p_value = (1 + exceedances) / (B + 1)
+        return ResamplingResults(
+            method,
+            B,
+            observed.Mstar,
+            observed.T_squared,
+            Mstar_replicates,
+            T_squared_replicates,
+            (np.nan, np.nan),
+            (np.nan, np.nan),
+            (np.nan, np.nan),
+            (np.nan, np.nan),
+            p_value,
+        )
+
+    jackknife = calculate_leave_one_out_arrays(Y, W, var)
+
+    return ResamplingResults(
+        method,
+        B,
+        observed.Mstar,
+        observed.T_squared,
+        Mstar_replicates,
+        T_squared_replicates,
+        calculate_percentile_CI(Mstar_replicates, alpha),
+        calculate_BCa_CI(Mstar_replicates, observed.Mstar, jackknife["Mstar"], alpha),
+        calculate_percentile_CI(T_squared_replicates, alpha),
+        calculate_BCa_CI(
+            T_squared_replicates, observed.T_squared, jackknife["T_squared"], alpha
+        ),
+        np.nan,
+    )
+
+
+def resample_random_effect(global_scores_table: pd.DataFrame, **kwargs):
+    """
+    Bootstrap or permutation distribution of the random effect model of the studies in
+    the global_scores_table. See resample_random_effect_arrays for the parameters.
+    """
+    return resample_random_effect_arrays(
+        global_scores_table["d"].to_numpy(),
+        global_scores_table["Weight"].to_numpy(),
+        global_scores_table["Var"].to_numpy(),
+        **kwargs,
+    )
+
+
+if __name__ == "__main__":
+    global_scores_table = pd.read_csv(r"output/global_scores_table.csv")
+    bootstrap = resample_random_effect(global_scores_table, B=10000, seed=0)
+    print(f"Percentile 95% CI of M* = {bootstrap.Mstar_percentile_CI}")
+    print(f"BCa 95% CI of M* = {bootstrap.Mstar_BCa_CI}")
+    print(f"Percentile 95% CI of T^2 = {bootstrap.T_squared_percentile_CI}")
+    print(f"BCa 95% CI of T^2 = {bootstrap.T_squared_BCa_CI}")
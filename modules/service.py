@@ -0,0 +1,459 @@
+"""
+Creation date: 2026, October
+Author: L. Gardy
+E-mail: ludovic.gardy@cnrs.fr
+Encoding: UTF-8
+
+Related publication
+--------------------
+Title: A meta-analysis of semantic memory in prodromal Alzheimer’s Disease.
+Authors: Joubert S., Gardy L., Didic M., Rouleau I., Barbeau E.J.
+Journal: Neuropsychology Review, 31(2): 221-232, 2021.
+DOI: https://doi.org/10.1007/s11065-020-09453-5
+
+# Note
+#---------
+# Local query service: the extraction tables are parsed once and kept in memory, and
+# small HTTP/JSON queries are answered from the arrays (asyncio, standard library only):
+#   python -m modules serve --dataset main=input_data/input_data.csv --port 8765
+#   curl "http://127.0.0.1:8765/datasets/main/random_effect?method=Cohens_d&Task_difficulty=Effortfull"
+#   curl "http://127.0.0.1:8765/datasets/main/subgroup?group_by=Task"
+#   curl "http://127.0.0.1:8765/datasets/main/leave_one_out?exclude=Clague%20et%20al.%202011"
+#   curl "http://127.0.0.1:8765/datasets/main/fail_safe?alpha=0.01"
+#   curl -X POST "http://127.0.0.1:8765/datasets/main/reload"
+# With --unix-socket PATH, the same HTTP requests go through a Unix socket
+# (curl --unix-socket PATH http://localhost/health).
+"""
+
+import asyncio
+import json
+import logging
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from modules.calculate_effect_size import calculate_effect_size_table
+from modules.calculate_random_effect import calculate_random_effect
+from modules.leave_one_out import calculate_leave_one_out_arrays
+from modules.meta_analysis import solve_fail_safe_N
+from modules.multiverse import EFFECT_SIZE_METHODS, FILTER_COLUMNS, parse_input_arrays
+from modules.utils import build_study_index
+
+logger = logging.getLogger(__name__)
+
+QUERIES = ["random_effect", "subgroup", "leave_one_out", "fail_safe"]
+STATISTICS = [
+    "Mstar",
+    "T_squared",
+    "SE_Mstar",
+    "p_value",
+    "CI95inf",
+    "CI95sup",
+    "fail_safe_N",
+]
+RESERVED_PARAMETERS = {"method", "exclude", "group_by", "alpha"}
+MAX_HEADER_LINES = 100
+
+
+class WarmDataset:
+    """
+    Extraction table parsed once into arrays (measures, study and filter codes), with
+    the effect sizes of each method computed on the first query that needs them.
+
+    reload() parses the file again and swaps the whole state at once, so the queries
+    running at that time finish on the previous state.
+    """
+
+    def __init__(self, path: str, filter_columns=FILTER_COLUMNS):
+        self.path = path
+        self.filter_columns = list(filter_columns)
+        self._lock = threading.Lock()
+        self.reload()
+
+    def reload(self):
+        input_data = pd.read_csv(self.path)
+        arrays, levels = parse_input_arrays(input_data, self.filter_columns)
+        _, studies = build_study_index(input_data["Authors"])
+        self._state = {
+            "arrays": arrays,
+            "levels": levels,
+            "studies": studies,
+            "effect_sizes": {},
+            "loaded_at": time.time(),
+        }
+        return self.describe()
+
+    def describe(self):
+        state = self._state
+        return {
+            "path": self.path,
+            "rows": len(state["arrays"]["measures"]),
+            "studies": len(state["studies"]),
+            "levels": state["levels"],
+            "loaded_at": state["loaded_at"],
+        }
+
+    def _get_effect_sizes(self, state: dict, effect_size_method: str):
+        if effect_size_method not in EFFECT_SIZE_METHODS:
+            raise ValueError(
+                "Unknown effect size method: {} (expected one of {})".format(
+                    effect_size_method, ", ".join(EFFECT_SIZE_METHODS)
+                )
+            )
+        with self._lock:
+            if effect_size_method not in state["effect_sizes"]:
+                state["effect_sizes"][effect_size_method] = calculate_effect_size_table(
+                    *state["arrays"]["measures"].T, effect_size_method
+                )
+            return state["effect_sizes"][effect_size_method]
+
+    def select_studies(
+        self,
+        effect_size_method: str = "Hedges_g",
+        filters: dict = None,
+        exclude: list = (),
+    ):
+        """
+        Effect size, weight and variance of each study (mean of its measures, as in
+        prepare_meta_dataframe) among the rows matching filters ({column: value}),
+        without the studies of exclude.
+
+        Returns
+        -------
+        authors, Y, W, var, nb_measures
+        """
+        state = self._state
+        effect_data = self._get_effect_sizes(state, effect_size_method)
+        codes = state["arrays"]["codes"]
+
+        rows = effect_data["valid"].copy()
+        for column, value in (filters or {}).items():
+            if column not in state["levels"]:
+                raise ValueError("Unknown filter column: {}".format(column))
+            levels = state["levels"][column]
+            if value not in levels:
+                raise ValueError(
+                    "Unknown value of {}: {} (expected one of {})".format(
+                        column, value, ", ".join(map(str, levels))
+                    )
+                )
+            rows &= codes[:, 1 + self.filter_columns.index(column)] == levels.index(
+                value
+            )
+        if len(exclude):
+            excluded = state["studies"].get_indexer(list(exclude))
+            if np.any(excluded < 0):
+                unknown = [name for name, i in zip(exclude, excluded) if i < 0]
+                raise KeyError("Unknown study: {}".format(", ".join(unknown)))
+            rows &= ~np.isin(codes[:, 0], excluded)
+
+        study_codes, study = np.unique(codes[rows, 0], return_inverse=True)
+        nb_measures = np.bincount(study, minlength=len(study_codes))
+        Y, W, var = [
+            np.bincount(study, weights=effect_data[name][rows]) / nb_measures
+            for name in ["d", "Weight", "Var"]
+        ]
+        return state["studies"][study_codes], Y, W, var, nb_measures
+
+
+def fit_random_effect(Y, W, var, nb_measures, alpha: float = 0.05):
+    """
+    Random effect model and fail-safe N of one set of studies, as a JSON dict. Below 2
+    studies the model is not estimable: estimable is false and the statistics are null.
+    """
+    k = len(Y)
+    results = {"measures": int(np.sum(nb_measures)), "studies": k, "estimable": k >= 2}
+    if k < 2:
+        results.update(dict.fromkeys(STATISTICS))
+        return results
+
+    random_effect_results = calculate_random_effect(Y, W, var, k)
+    Mstar = random_effect_results.Mstar
+    sum_Wstar = np.sum(random_effect_results.Wstar)
+    SE_Mstar = np.sqrt(1 / sum_Wstar)
+    results.update(
+        {
+            "Mstar": Mstar,
+            "T_squared": random_effect_results.T_squared,
+            "SE_Mstar": SE_Mstar,
+            "p_value": random_effect_results.p_value,
+            "CI95inf": Mstar - 1.96 * SE_Mstar,
+            "CI95sup": Mstar + 1.96 * SE_Mstar,
+            "fail_safe_N": solve_fail_safe_N(
+                sum_Wstar, Mstar * sum_Wstar, np.mean(W), alpha
+            ),
+        }
+    )
+    return results
+
+
+def run_query(dataset: WarmDataset, query: str, parameters: dict):
+    """Answer one query on a dataset (runs in the worker threads)."""
+    effect_size_method = parameters.get("method", ["Hedges_g"])[-1]
+    exclude = parameters.get("exclude", [])
+    alpha = float(parameters.get("alpha", [0.05])[-1])
+    if not 0 < alpha < 1:
+        raise ValueError("alpha must be between 0 and 1 (got {})".format(alpha))
+    filters = {
+        column: values[-1]
+        for column, values in parameters.items()
+        if column not in RESERVED_PARAMETERS
+    }
+
+    if query == "subgroup":
+        group_by = parameters.get("group_by", [None])[-1]
+        if group_by not in dataset.filter_columns:
+            raise ValueError(
+                "group_by must be one of {}".format(", ".join(dataset.filter_columns))
+            )
+        groups = []
+        for level in dataset.describe()["levels"][group_by]:
+            _, Y, W, var, nb_measures = dataset.select_studies(
+                effect_size_method, {**filters, group_by: level}, exclude
+            )
+            groups.append(
+                {group_by: level, **fit_random_effect(Y, W, var, nb_measures, alpha)}
+            )
+        return {"group_by": group_by, "groups": groups}
+
+    authors, Y, W, var, nb_measures = dataset.select_studies(
+        effect_size_method, filters, exclude
+    )
+    if query == "random_effect":
+        return fit_random_effect(Y, W, var, nb_measures, alpha)
+    if query == "fail_safe":
+        results = fit_random_effect(Y, W, var, nb_measures, alpha)
+        return {
+            "studies": results["studies"],
+            "estimable": results["estimable"],
+            "alpha": alpha,
+            "fail_safe_N": results["fail_safe_N"],
+        }
+    if query == "leave_one_out":
+        if len(Y) < 3:
+            raise ValueError("The leave-one-out analysis needs at least 3 studies")
+        leave_one_out = pd.DataFrame(calculate_leave_one_out_arrays(Y, W, var))
+        leave_one_out.insert(0, "Author", authors)
+        return {"studies": leave_one_out.to_dict(orient="records")}
+    raise KeyError("Unknown query: {}".format(query))
+
+
+def to_json_value(value):
+    """Plain Python value of numpy scalars and arrays, NaN and infinities as None."""
+    if isinstance(value, dict):
+        return {str(key): to_json_value(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return [to_json_value(item) for item in value]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+class MetaAnalysisService:
+    """
+    asyncio HTTP/1.1 server answering JSON queries on warm datasets.
+
+    The queries run in a pool of worker threads, so the event loop keeps accepting
+    connections while numpy computes. At most max_pending queries are queued or
+    running at a time: above that, the service answers 503 at once instead of letting
+    the queue grow.
+
+    Parameters
+    ----------
+    datasets : dict
+        {name: WarmDataset}.
+    workers : int
+        Worker threads.
+    max_pending : int
+        Queries queued or running before the service answers 503.
+    """
+
+    def __init__(self, datasets: dict, workers: int = 4, max_pending: int = 64):
+        self.datasets = datasets
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="meta-analysis"
+        )
+        self.max_pending = max_pending
+        self.pending = 0
+
+    async def dispatch(self, method: str, path: str, parameters: dict):
+        """(HTTP status, JSON payload) of a request."""
+        parts = [unquote(part) for part in path.split("/") if part]
+
+        if parts in ([], ["health"]):
+            return HTTPStatus.OK, {"status": "ok", "datasets": list(self.datasets)}
+        if parts == ["datasets"]:
+            return HTTPStatus.OK, {
+                name: dataset.describe() for name, dataset in self.datasets.items()
+            }
+        if len(parts) != 3 or parts[0] != "datasets":
+            return HTTPStatus.NOT_FOUND, {"error": "Unknown path: {}".format(path)}
+
+        _, name, query = parts
+        if name not in self.datasets:
+            return HTTPStatus.NOT_FOUND, {"error": "Unknown dataset: {}".format(name)}
+        if query == "reload":
+            if method != "POST":
+                return HTTPStatus.METHOD_NOT_ALLOWED, {"error": "Use POST to reload"}
+            function, arguments = self.datasets[name].reload, ()
+        elif query in QUERIES:
+            if method != "GET":
+                return HTTPStatus.METHOD_NOT_ALLOWED, {"error": "Use GET for queries"}
+            function, arguments = run_query, (self.datasets[name], query, parameters)
+        else:
+            return HTTPStatus.NOT_FOUND, {"error": "Unknown query: {}".format(query)}
+
+        if self.pending >= self.max_pending:
+            return HTTPStatus.SERVICE_UNAVAILABLE, {"error": "Too many pending queries"}
+        self.pending += 1
+        start = time.perf_counter()
+        try:
+            payload = await asyncio.get_running_loop().run_in_executor(
+                self.executor, function, *arguments
+            )
+        except Exception as error:
+            # A bad query is the client's error, anything else (e.g. the reload of a
+            # moved or malformed file) is answered with 500 instead of dropping the
+            # connection
+            if query in QUERIES and isinstance(error, (ValueError, KeyError)):
+                return HTTPStatus.BAD_REQUEST, {"error": str(error).strip("'\"")}
+            logger.exception("%s %s failed", method, path)
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {
+                "error": "{}: {}".format(type(error).__name__, error)
+            }
+        finally:
+            self.pending -= 1
+        payload["elapsed_ms"] = (time.perf_counter() - start) * 1000
+        return HTTPStatus.OK, payload
+
+    async def handle_connection(self, reader, writer):
+        """Serve the requests of one (keep-alive) connection."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    await self.respond(
+                        writer, HTTPStatus.BAD_REQUEST, {"error": "Bad request"}, False
+                    )
+                    break
+
+                headers = {}
+                for _ in range(MAX_HEADER_LINES):
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    key, _, value = line.decode("latin-1").partition(":")
+                    headers[key.strip().lower()] = value.strip()
+                else:
+                    # The other header lines are not read: the connection is closed
+                    await self.respond(
+                        writer,
+                        HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE,
+                        {"error": "More than {} header lines".format(MAX_HEADER_LINES)},
+                        False,
+                    )
+                    break
+                try:
+                    content_length = int(headers.get("content-length", 0) or 0)
+                    if content_length < 0:
+                        raise ValueError(content_length)
+                except ValueError:
+                    await self.respond(
+                        writer,
+                        HTTPStatus.BAD_REQUEST,
+                        {"error": "Bad Content-Length header"},
+                        False,
+                    )
+                    break
+                if content_length:
+                    await reader.readexactly(content_length)
+
+                url = urlsplit(target)
+                status, payload = await self.dispatch(
+                    method.upper(), url.path, parse_qs(url.query)
+                )
+                keep_alive = (
+                    headers.get("connection", "").lower() != "close"
+                    and version.upper() == "HTTP/1.1"
+                )
+                logger.debug("%s %s -> %d", method, target, status)
+                await self.respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def respond(self, writer, status, payload, keep_alive):
+        body = json.dumps(to_json_value(payload)).encode()
+        head = (
+            "HTTP/1.1 {} {}\r\n"
+            "Content-Type: application/json\r\n"
+            "Content-Length: {}\r\n"
+            "Connection: {}\r\n\r\n".format(
+                status.value,
+                status.phrase,
+                len(body),
+                "keep-alive" if keep_alive else "close",
+            )
+        )
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+    async def serve(
+        self, host: str = "127.0.0.1", port: int = 8765, unix_socket: str = None
+    ):
+        """Serve until cancelled, on host:port or on a Unix socket."""
+        if unix_socket is None:
+            server = await asyncio.start_server(self.handle_connection, host, port)
+            address = "http://{}:{}".format(host, port)
+        else:
+            server = await asyncio.start_unix_server(
+                self.handle_connection, unix_socket
+            )
+            address = unix_socket
+        logger.info(
+            "Serving %s on %s", ", ".join(self.datasets) or "no dataset", address
+        )
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def run_service(
+    dataset_paths: dict,
+    host: str = "127.0.0.1",
+    port: int = 8765,
+    unix_socket: str = None,
+    workers: int = 4,
+    max_pending: int = 64,
+):
+    """Load the datasets ({name: CSV path}) and serve them until interrupted."""
+    datasets = {name: WarmDataset(path) for name, path in dataset_paths.items()}
+    service = MetaAnalysisService(datasets, workers, max_pending)
+    try:
+        asyncio.run(service.serve(host, port, unix_socket))
+    except KeyboardInterrupt:
+        logger.info("Service stopped")
+
+
+if __name__ == "__main__":
+    from modules.instrumentation import configure_logging
+
+    configure_logging()
+    run_service({"main": r"input_data/input_data.csv"})
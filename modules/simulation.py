@@ -0,0 +1,250 @@
+"""
+Creation date: 2026, October
+Author: L. Gardy
+E-mail: ludovic.gardy@cnrs.fr
+Encoding: UTF-8
+
+Related publication
+--------------------
+Title: A meta-analysis of semantic memory in prodromal Alzheimer’s Disease.
+Authors: Joubert S., Gardy L., Didic M., Rouleau I., Barbeau E.J.
+Journal: Neuropsychology Review, 31(2): 221-232, 2021.
+DOI: https://doi.org/10.1007/s11065-020-09453-5
+
+# Note
+#---------
+# Monte Carlo simulation of meta-analyses with a known true effect and T^2, to check
+# the bias, CI coverage, type I error and power of the random effect model.
+"""
+
+from dataclasses import asdict, dataclass
+
+import numpy as np
+import pandas as pd
+from numpy.typing import NDArray
+
+from modules.calculate_effect_size import calculate_effect_size_table
+from modules.calculate_random_effect import calculate_random_effect_batch
+
+
+@dataclass
+class SimulationResults:
+    true_effect: float
+    tau_squared: float
+    nb_studies: int
+    effect_size_method: str
+    tau2_method: str
+    replicates: int
+    mean_Mstar: float
+    bias: float
+    empirical_SE: float
+    RMSE: float
+    mean_T_squared: float
+    T_squared_bias: float
+    coverage: float
+    rejection_rate: float  # type I error when true_effect == 0, power otherwise
+    Mstar: NDArray = None
+    T_squared: NDArray = None
+
+
+def get_empirical_sizes(input_data: pd.DataFrame):
+    """(MCI_size, Control_size) pairs of the measures of an extraction table."""
+    sizes = input_data[["MCI_size", "Control_size"]].dropna().to_numpy()
+    return sizes.astype(np.int64)
+
+
+def generate_meta_analyses(
+    rng: np.random.Generator,
+    size_pairs: NDArray,
+    true_effect: float,
+    tau_squared: float,
+    nb_studies: int,
+    nb_replicates: int,
+):
+    """
+    Summary statistics of nb_replicates meta-analyses of nb_studies studies each.
+
+    The true effect of each study is drawn from N(true_effect, tau_squared). Its group
+    sizes are a pair drawn from size_pairs, and its means and SDs are the sample
+    statistics of normal groups with SD 1: the control group is shifted by the study
+    effect, so d = (Control_Mean - MCI_Mean) / SD estimates it.
+
+    Returns
+    -------
+    list of NDArray
+        MCI_Mean, Control_Mean, MCI_SD, Control_SD, MCI_size, Control_size, each of
+        shape (nb_replicates x nb_studies).
+    """
+    shape = (nb_replicates, nb_studies)
+    pairs = size_pairs[rng.integers(0, len(size_pairs), size=shape)]
+    size_1, size_2 = pairs[..., 0], pairs[..., 1]
+
+    study_effect = true_effect + np.sqrt(tau_squared) * rng.standard_normal(shape)
+    mean_1 = rng.standard_normal(shape) / np.sqrt(size_1)
+    mean_2 = study_effect + rng.standard_normal(shape) / np.sqrt(size_2)
+    sd_1 = np.sqrt(rng.chisquare(size_1 - 1) / (size_1 - 1))
+    sd_2 = np.sqrt(rng.chisquare(size_2 - 1) / (size_2 - 1))
+
+    return [mean_1, mean_2, sd_1, sd_2, size_1, size_2]
+
+
+def simulate_meta_analyses(
+    size_pairs: NDArray,
+    true_effect: float = 0.0,
+    tau_squared: float = 0.0,
+    nb_studies: int = 20,
+    nb_replicates: int = 10000,
+    effect_size_method: str = "Hedges_g",
+    tau2_method: str = "DL",
+    alpha: float = 0.05,
+    chunk_size: int = 20000,
+    seed: int = None,
+    keep_replicates: bool = False,
+):
+    """
+    Bias, CI coverage and rejection rate of the random effect model on simulated data.
+
+    The replicates are generated and fitted in chunks of chunk_size meta-analyses: each
+    chunk goes through calculate_effect_size_table and calculate_random_effect_batch
+    as whole arrays, and only running sums are kept between chunks (unless
+    keep_replicates), so memory does not grow with nb_replicates.
+
+    Parameters
+    ----------
+    size_pairs : NDArray
+        Empirical (MCI_size, Control_size) pairs (get_empirical_sizes).
+    true_effect, tau_squared : float
+        Mean and variance of the true study effects.
+    nb_studies : int
+        Studies per meta-analysis.
+    nb_replicates : int
+        Number of simulated meta-analyses.
+    effect_size_method, tau2_method : str
+        As in calculate_effect_size_table and calculate_random_effect_batch.
+    alpha : float
+        Level of the test of M* (p < alpha is a rejection).
+    chunk_size : int
+        Meta-analyses generated and fitted at a time.
+    seed : int, optional
+    keep_replicates : bool
+        Also return the M* and T^2 of every replicate.
+    """
+    size_pairs = np.asarray(size_pairs, dtype=np.int64)
+    if np.any(size_pairs < 2):
+        raise ValueError("Every group needs at least 2 subjects")
+
+    chunk_sizes = [
+        min(chunk_size, nb_replicates - start)
+        for start in range(0, nb_replicates, chunk_size)
+    ]
+    rngs = [
+        np.random.default_rng(seed_sequence)
+        for seed_sequence in np.random.SeedSequence(seed).spawn(len(chunk_sizes))
+    ]
+
+    totals = dict.fromkeys(
+        ["Mstar", "Mstar_squared", "T_squared", "covered", "rejected"], 0.0
+    )
+    Mstar_chunks, T_squared_chunks = [], []
+    for rng, nb_chunk_replicates in zip(rngs, chunk_sizes):
+        columns = generate_meta_analyses(
+            rng,
+            size_pairs,
+            true_effect,
+            tau_squared,
+            nb_studies,
+            nb_chunk_replicates,
+        )
+        effect_data = calculate_effect_size_table(
+            *[column.ravel() for column in columns], effect_size_method
+        )
+        results = calculate_random_effect_batch(
+            effect_data["d"],
+            effect_data["Weight"],
+            effect_data["Var"],
+            np.arange(0, nb_chunk_replicates * nb_studies + 1, nb_studies),
+            tau2_method=tau2_method,
+        )
+
+        totals["Mstar"] += np.sum(results.Mstar)
+        totals["Mstar_squared"] += np.sum((results.Mstar - true_effect) ** 2)
+        totals["T_squared"] += np.sum(results.T_squared)
+        totals["covered"] += np.sum(
+            (results.IC95_inf <= true_effect) & (true_effect <= results.IC95_sup)
+        )
+        totals["rejected"] += np.sum(results.p_value < alpha)
+        if keep_replicates:
+            Mstar_chunks.append(results.Mstar)
+            T_squared_chunks.append(results.T_squared)
+
+    mean_Mstar = totals["Mstar"] / nb_replicates
+    mean_squared_error = totals["Mstar_squared"] / nb_replicates
+    mean_T_squared = totals["T_squared"] / nb_replicates
+
+    return SimulationResults(
+        true_effect=true_effect,
+        tau_squared=tau_squared,
+        nb_studies=nb_studies,
+        effect_size_method=effect_size_method,
+        tau2_method=tau2_method,
+        replicates=nb_replicates,
+        mean_Mstar=mean_Mstar,
+        bias=mean_Mstar - true_effect,
+        empirical_SE=np.sqrt(
+            max(mean_squared_error - (mean_Mstar - true_effect) ** 2, 0)
+        ),
+        RMSE=np.sqrt(mean_squared_error),
+        mean_T_squared=mean_T_squared,
+        T_squared_bias=mean_T_squared - tau_squared,
+        coverage=totals["covered"] / nb_replicates,
+        rejection_rate=totals["rejected"] / nb_replicates,
+        Mstar=np.concatenate(Mstar_chunks) if keep_replicates else None,
+        T_squared=np.concatenate(T_squared_chunks) if keep_replicates else None,
+    )
+
+
+def run_simulation_grid(
+    size_pairs: NDArray,
+    true_effects=(0.0, 0.2, 0.5, 0.8),
+    tau_squared=(0.0, 0.1),
+    nb_studies=(5, 10, 20),
+    seed: int = None,
+    **kwargs,
+):
+    """
+    simulate_meta_analyses for every combination of true effect, T^2 and number of
+    studies (one row per combination). The rejection rate is the type I error in the
+    rows with a null true effect, and the power in the others.
+    """
+    combinations = [
+        (effect, tau2, k)
+        for effect in true_effects
+        for tau2 in tau_squared
+        for k in nb_studies
+    ]
+    seeds = np.random.SeedSequence(seed).spawn(len(combinations))
+    rows = []
+    for (effect, tau2, k), seed_sequence in zip(combinations, seeds):
+        results = simulate_meta_analyses(
+            size_pairs,
+            effect,
+            tau2,
+            k,
+            seed=seed_sequence.generate_state(1)[0],
+            **kwargs,
+        )
+        row = asdict(results)
+        del row["Mstar"], row["T_squared"]
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    input_data = pd.read_csv(r"input_data/input_data.csv")
+    size_pairs = get_empirical_sizes(input_data)
+    print(
+        run_simulation_grid(size_pairs, nb_replicates=10000, seed=0)[
+            ["true_effect", "tau_squared", "nb_studies", "bias", "coverage"]
+            + ["rejection_rate", "T_squared_bias"]
+        ]
+    )
@@ -0,0 +1,128 @@
+"""
+Creation date: 2026, October
+Author: L. Gardy
+E-mail: ludovic.gardy@cnrs.fr
+Encoding: UTF-8
+
+Related publication
+--------------------
+Title: A meta-analysis of semantic memory in prodromal Alzheimer’s Disease.
+Authors: Joubert S., Gardy L., Didic M., Rouleau I., Barbeau E.J.
+Journal: Neuropsychology Review, 31(2): 221-232, 2021.
+DOI: https://doi.org/10.1007/s11065-020-09453-5
+
+# Note
+#---------
+# The intermediate tables (meta_frame, global_scores_table) can be stored as CSV,
+# Parquet or Arrow IPC (Feather v2). The columnar formats need the optional pyarrow
+# package: pip install pyarrow
+"""
+
+import os
+
+import pandas as pd
+
+OUTPUT_FORMATS = {"csv": ".csv", "parquet": ".parquet", "arrow": ".arrow"}
+CATEGORICAL_COLUMNS = ["Author", "Color", "Task_difficulty", "NamingVsSemantic", "Task"]
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.feather
+        import pyarrow.parquet
+    except ImportError as error:
+        raise ImportError(
+            "The parquet and arrow output formats need pyarrow: pip install pyarrow"
+        ) from error
+    return pyarrow
+
+
+def get_output_path(name: str, output_format: str = "csv", output_dir: str = "output"):
+    """Path of an intermediate table, e.g. output/meta_frame.parquet."""
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(
+            "Unknown output format: {} (expected one of {})".format(
+                output_format, ", ".join(OUTPUT_FORMATS)
+            )
+        )
+    return os.path.join(output_dir, name + OUTPUT_FORMATS[output_format])
+
+
+def to_columnar_types(table: pd.DataFrame):
+    """float64 numeric columns and categorical labels, as stored in the columnar files."""
+    table = table.copy()
+    for column in table.columns:
+        if column in CATEGORICAL_COLUMNS:
+            table[column] = table[column].astype("category")
+        elif pd.api.types.is_numeric_dtype(table[column]):
+            table[column] = table[column].astype("float64")
+    return table
+
+
+def write_table(table: pd.DataFrame, path: str):
+    """Write a table as CSV, Parquet or Arrow IPC, depending on the extension of path."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    extension = os.path.splitext(path)[1]
+
+    if extension == ".csv":
+        table.to_csv(path, index=False)
+        return path
+
+    pyarrow = _import_pyarrow()
+    arrow_table = pyarrow.Table.from_pandas(
+        to_columnar_types(table), preserve_index=False
+    )
+    if extension == ".parquet":
+        pyarrow.parquet.write_table(arrow_table, path)
+    elif extension in (".arrow", ".feather"):
+        # Uncompressed, so the file can be memory-mapped without a copy
+        pyarrow.feather.write_feather(arrow_table, path, compression="uncompressed")
+    else:
+        raise ValueError("Unknown table format: {}".format(path))
+    return path
+
+
+def read_table(path: str, columns: list = None, memory_map: bool = True):
+    """
+    Read a table written by write_table.
+
+    Parameters
+    ----------
+    path : str
+        .csv, .parquet or .arrow / .feather file.
+    columns : list, optional
+        Only read these columns (e.g. ["d", "Var", "Weight"]). The columnar formats
+        never touch the other columns.
+    memory_map : bool
+        Memory-map the columnar files instead of reading them in memory.
+    """
+    extension = os.path.splitext(path)[1]
+
+    if extension == ".csv":
+        return pd.read_csv(path, usecols=columns)
+
+    pyarrow = _import_pyarrow()
+    if extension == ".parquet":
+        arrow_table = pyarrow.parquet.read_table(
+            path, columns=columns, memory_map=memory_map
+        )
+    elif extension in (".arrow", ".feather"):
+        arrow_table = pyarrow.feather.read_table(
+            path, columns=columns, memory_map=memory_map
+        )
+    else:
+        raise ValueError("Unknown table format: {}".format(path))
+    table = arrow_table.to_pandas()
+    # A categorical column keeps every level of the written table, even those of rows
+    # filtered out before the write: only the levels present in the rows are kept
+    for column in table.columns:
+        if isinstance(table[column].dtype, pd.CategoricalDtype):
+            table[column] = table[column].cat.remove_unused_categories()
+    return table
+
+
+if __name__ == "__main__":
+    meta_frame = read_table(r"output/meta_frame.csv")
+    write_table(meta_frame, get_output_path("meta_frame", "arrow"))
+    print(read_table(get_output_path("meta_frame", "arrow"), ["d", "Var", "Weight"]))
@@ -0,0 +1,177 @@
+"""
+Creation date: 2026, October
+Author: L. Gardy
+E-mail: ludovic.gardy@cnrs.fr
+Encoding: UTF-8
+
+Related publication
+--------------------
+Title: A meta-analysis of semantic memory in prodromal Alzheimer’s Disease.
+Authors: Joubert S., Gardy L., Didic M., Rouleau I., Barbeau E.J.
+Journal: Neuropsychology Review, 31(2): 221-232, 2021.
+DOI: https://doi.org/10.1007/s11065-020-09453-5
+"""
+
+import numpy as np
+import pandas as pd
+
+from modules.calculate_effect_size import calculate_effect_size_table
+from modules.calculate_random_effect import calculate_random_effect_batch
+from modules.instrumentation import count, instrumented
+from modules.meta_analysis import solve_fail_safe_N
+
+MEASURE_COLUMNS = [
+    "MCI_Mean",
+    "Control_Mean",
+    "MCI_SD",
+    "Control_SD",
+    "MCI_size",
+    "Control_size",
+]
+
+
+def accumulate_chunk(chunk: pd.DataFrame, effect_size_method: str, keys: list):
+    """
+    Effect sizes of one chunk of the extraction table, summed per study (and group).
+
+    Returns the sums of d, Var and Weight and the number of measures of each study,
+    and the number of rows skipped because of a missing value.
+    """
+    effect_data = calculate_effect_size_table(
+        *[chunk[column] for column in MEASURE_COLUMNS], effect_size_method
+    )
+    valid = effect_data["valid"]
+
+    measures = chunk.loc[valid, keys].assign(
+        d=effect_data["d"][valid],
+        Var=effect_data["Var"][valid],
+        Weight=effect_data["Weight"][valid],
+        measures=1,
+    )
+    sums = measures.groupby(keys, sort=False, dropna=False).sum()
+
+    return sums, int((~valid).sum())
+
+
+@instrumented
+def stream_meta_analysis(
+    input_path: str,
+    effect_size_method: str = "Hedges_g",
+    chunksize: int = 100000,
+    group_by: str = None,
+):
+    """
+    Random effect model and fail-safe N of an extraction table read in chunks.
+
+    Each chunk is turned into effect sizes and folded into running sums per study
+    (d, Var and Weight sums and the number of measures), so memory grows with the number
+    of studies and not with the number of rows. Studies with several measures are then
+    averaged as in prepare_meta_dataframe, and the model is fitted for every group at
+    once.
+
+    Parameters
+    ----------
+    input_path : str
+        CSV extraction table with the columns of input_data/input_data.csv.
+    effect_size_method : str
+        'Hedges_g', 'Cohens_d' or 'Glass_delta'.
+    chunksize : int
+        Number of rows read at a time.
+    group_by : str, optional
+        Column defining subgroups (e.g. 'Task_difficulty'). One model per group.
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per group: number of measures and studies, M*, T^2, p-value, 95% CI and
+        fail-safe N (the same values as meta_analysis.meta_analysis on the full table).
+        The groups with fewer than 2 studies are not estimable (estimable is False and
+        the model columns are missing).
+    """
+    keys = ["Authors"] if group_by is None else [group_by, "Authors"]
+    usecols = list(dict.fromkeys(keys + MEASURE_COLUMNS))
+
+    running_sums = None
+    skipped_rows = 0
+    for chunk in pd.read_csv(
+        input_path,
+        usecols=usecols,
+        chunksize=chunksize,
+        dtype={column: float for column in MEASURE_COLUMNS},
+    ):
+        if group_by is not None and chunk[group_by].dtype == object:
+            chunk[group_by] = chunk[group_by].str.strip()
+        sums, skipped = accumulate_chunk(chunk, effect_size_method, keys)
+        count("rows_ingested", len(chunk))
+        count("rows_skipped", skipped)
+        skipped_rows += skipped
+        running_sums = (
+            sums if running_sums is None else running_sums.add(sums, fill_value=0)
+        )
+
+    studies = running_sums.div(running_sums["measures"], axis=0)
+    studies["measures"] = running_sums["measures"]
+
+    if group_by is None:
+        group_codes = np.zeros(len(studies), dtype=np.int64)
+        group_names = pd.Index(["all"], name="group")
+    else:
+        group_codes, group_names = pd.factorize(
+            studies.index.get_level_values(group_by), sort=True
+        )
+        group_names = pd.Index(group_names, name=group_by)
+
+    order = np.argsort(group_codes, kind="stable")
+    studies = studies.iloc[order]
+    group_codes = group_codes[order]
+    nb_studies = np.bincount(group_codes, minlength=len(group_names))
+    offsets = np.concatenate([[0], np.cumsum(nb_studies)])
+
+    random_effect_results = calculate_random_effect_batch(
+        studies["d"].to_numpy(),
+        studies["Weight"].to_numpy(),
+        studies["Var"].to_numpy(),
+        offsets,
+    )
+
+    # A group of a single study has no meta-analysis: its model is reported as NaN
+    estimable = nb_studies >= 2
+    sum_Wstar = 1 / random_effect_results.SE_Mstar**2
+    mean_weights = np.bincount(
+        group_codes, weights=studies["Weight"].to_numpy()
+    ) / np.maximum(nb_studies, 1)
+    fail_safe_N = [
+        (
+            solve_fail_safe_N(
+                sum_Wstar[i],
+                random_effect_results.Mstar[i] * sum_Wstar[i],
+                mean_weights[i],
+            )
+            if estimable[i]
+            else None
+        )
+        for i in range(len(group_names))
+    ]
+
+    summary = random_effect_results.to_frame().drop(columns="k")
+    summary.loc[~estimable] = np.nan
+    summary.insert(
+        0,
+        "measures",
+        np.bincount(group_codes, weights=studies["measures"].to_numpy()).astype(int),
+    )
+    summary.insert(1, "studies", nb_studies)
+    summary.insert(2, "estimable", estimable)
+    summary["fail_safe_N"] = pd.array(fail_safe_N, dtype="Int64")
+    summary.index = group_names
+    summary.attrs["skipped_rows"] = skipped_rows
+
+    return summary
+
+
+if __name__ == "__main__":
+    summary = stream_meta_analysis(r"input_data/input_data.csv", chunksize=16)
+    print(summary)
+    print(
+        stream_meta_analysis(r"input_data/input_data.csv", group_by="Task_difficulty")
+    )
@@ -1,8 +1,21 @@
+import pandas as pd
+
+from modules.instrumentation import instrumented
+
+
+@instrumented
 def get_authors_with_multiple_measures(meta_data):
-    authors_list = []
-    for i in range(len(meta_data["Authors"])):
-        authors = meta_data["Authors"][i].split(", ")
-        for author in authors:
-            if author not in authors_list:
-                authors_list.append(author)
-    return authors_list
+    """Authors (studies) that appear on more than one row, in order of appearance."""
+    authors = meta_data["Authors"].str.split(", ").explode()
+    return authors[authors.duplicated(keep=False)].unique().tolist()
+
+
+def build_study_index(authors):
+    """
+    Integer code of the study of each row, and the study names (code i is studies[i]).
+
+    Built once with a hash table, so grouping rows by study does not need one scan of
+    the table per study.
+    """
+    study_codes, studies = pd.factorize(pd.Series(authors), sort=False)
+    return study_codes, pd.Index(studies)
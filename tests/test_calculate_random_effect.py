@@ -0,0 +1,65 @@
+"""
+Creation date: 2026, October
+Author: L. Gardy
+E-mail: ludovic.gardy@cnrs.fr
+Encoding: UTF-8
+
+Related publication
+--------------------
+Title: A meta-analysis of semantic memory in prodromal Alzheimer’s Disease.
+Authors: Joubert S., Gardy L., Didic M., Rouleau I., Barbeau E.J.
+Journal: Neuropsychology Review, 31(2): 221-232, 2021.
+DOI: https://doi.org/10.1007/s11065-020-09453-5
+"""
+
+import numpy as np
+
+from modules.calculate_random_effect import (
+    calculate_dersimonian_laird_tau2,
+    calculate_random_effect,
+    calculate_random_effect_batch,
+    format_random_effect_text,
+)
+
+
+def test_single_study_has_no_between_studies_variance():
+    # "Name to face matching": one study, C is rounding noise
+    Y, var = np.array([1.4352]), np.array([0.1377])
+    W = 1 / var
+
+    results = calculate_random_effect(Y, W, var, 1)
+
+    assert results.T_squared == 0
+    assert results.Mstar == Y[0]
+    assert np.isclose(results.Wstar[0], W[0])
+    assert np.isfinite(results.p_value)
+    assert results.p_val_text != "p value = NA"
+
+
+def test_dersimonian_laird_tau2_is_zero_below_two_studies():
+    _, _, T_squared = calculate_dersimonian_laird_tau2(
+        np.array([5.0, 0.0, 12.0]),
+        np.array([25.0, 0.0, 80.0]),
+        np.array([3.0, 0.0, 6.0]),
+        np.array([2.0, 0.0, 9.0]),
+        np.array([1, 0, 2]),
+    )
+    assert T_squared[0] == 0
+    assert T_squared[1] == 0
+    assert np.isfinite(T_squared[2])
+
+
+def test_batch_single_study_group():
+    Y = np.array([0.2, 0.5, 0.9, 1.4352])
+    var = np.array([0.04, 0.05, 0.06, 0.1377])
+
+    batch = calculate_random_effect_batch(Y, 1 / var, var, np.array([0, 3, 4]))
+
+    assert batch.T_squared[1] == 0
+    assert batch.Mstar[1] == Y[3]
+    assert np.all(np.isfinite(batch.p_value))
+
+
+def test_format_non_finite_p_value():
+    p_val_text, _ = format_random_effect_text(np.nan, np.nan, np.nan)
+    assert p_val_text == "p value = NA"
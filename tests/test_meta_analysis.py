@@ -0,0 +1,126 @@
+"""
+Creation date: 2026, October
+Author: L. Gardy
+E-mail: ludovic.gardy@cnrs.fr
+Encoding: UTF-8
+
+Related publication
+--------------------
+Title: A meta-analysis of semantic memory in prodromal Alzheimer’s Disease.
+Authors: Joubert S., Gardy L., Didic M., Rouleau I., Barbeau E.J.
+Journal: Neuropsychology Review, 31(2): 221-232, 2021.
+DOI: https://doi.org/10.1007/s11065-020-09453-5
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.special import ndtr
+
+from modules.calculate_random_effect import calculate_random_effect
+from modules.meta_analysis import (
+    calculate_fail_safe_N,
+    meta_analysis,
+    solve_fail_safe_N,
+)
+from modules.prepare_meta_dataframe import prepare_meta_dataframe
+from modules.utils import get_authors_with_multiple_measures
+
+INPUT_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "input_data",
+    "input_data.csv",
+)
+
+
+def naive_fail_safe_N(Wstar, Y, null_weight, alpha=0.05):
+    """Add null studies one at a time until the model is no longer significant."""
+    nb_null_studies = 0
+    while True:
+        all_Wstar = np.concatenate([Wstar, np.full(nb_null_studies, null_weight)])
+        all_Y = np.concatenate([Y, np.zeros(nb_null_studies)])
+        Mstar = np.sum(all_Wstar * all_Y) / np.sum(all_Wstar)
+        Z = Mstar / np.sqrt(1 / np.sum(all_Wstar))
+        if 2 * (1 - ndtr(abs(Z))) >= alpha:
+            return nb_null_studies
+        nb_null_studies += 1
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("alpha", [0.05, 0.01])
+def test_solve_fail_safe_N_matches_naive_loop(seed, alpha):
+    rng = np.random.default_rng(seed)
+    Y = rng.normal(0.6, 0.4, size=8)
+    Wstar = 1 / rng.uniform(0.05, 0.3, size=8)
+    null_weight = rng.uniform(3, 20)
+
+    assert solve_fail_safe_N(
+        np.sum(Wstar), np.sum(Wstar * Y), null_weight, alpha
+    ) == naive_fail_safe_N(Wstar, Y, null_weight, alpha)
+
+
+def test_solve_fail_safe_N_not_significant():
+    assert solve_fail_safe_N(10.0, 0.5, 5.0) == 0
+
+
+def test_solve_fail_safe_N_rejects_non_positive_weight():
+    with pytest.raises(ValueError):
+        solve_fail_safe_N(10.0, 5.0, 0.0)
+
+
+def test_calculate_fail_safe_N_matches_naive_loop():
+    Y = np.array([0.8, 1.2, 0.3, 0.9, 1.5])
+    var = np.array([0.1, 0.2, 0.15, 0.05, 0.3])
+    W = 1 / var
+
+    fail_safe_N = calculate_fail_safe_N(Y, W, var, len(Y), {"Weight": W})
+
+    tau2 = calculate_random_effect(Y, W, var, len(Y)).T_squared
+    assert fail_safe_N == naive_fail_safe_N(1 / (var + tau2), Y, np.mean(W))
+
+
+@pytest.mark.parametrize(
+    "effect_size_method, expected",
+    [("Hedges_g", 185), ("Cohens_d", 202), ("Glass_delta", 81)],
+)
+def test_fail_safe_N_on_input_data(tmp_path, effect_size_method, expected):
+    input_data = pd.read_csv(INPUT_PATH)
+    meta_frame = prepare_meta_dataframe(
+        input_data,
+        get_authors_with_multiple_measures(input_data),
+        effect_size_method,
+        output_dir=str(tmp_path),
+    )
+
+    _, fail_safe_N, global_scores_table = meta_analysis(
+        meta_frame, plot=False, output_dir=str(tmp_path)
+    )
+
+    assert fail_safe_N == expected
+    assert len(global_scores_table) == 22
+
+
+def test_meta_analysis_without_optional_columns(tmp_path):
+    input_data = pd.read_csv(INPUT_PATH)
+    meta_frame = prepare_meta_dataframe(
+        input_data,
+        get_authors_with_multiple_measures(input_data),
+        "Hedges_g",
+        output_dir=str(tmp_path),
+    )
+
+    _, fail_safe_N, global_scores_table = meta_analysis(
+        meta_frame.drop(columns=["MoCA_score", "MMSE_score"]),
+        plot=False,
+        output_dir=str(tmp_path),
+    )
+
+    assert fail_safe_N == 185
+    assert global_scores_table["MoCA_score"].isna().all()
+
+    with pytest.raises(ValueError, match="Weight"):
+        meta_analysis(
+            meta_frame.drop(columns=["Weight"]), plot=False, output_dir=str(tmp_path)
+        )
@@ -0,0 +1,78 @@
+"""
+Creation date: 2026, October
+Author: L. Gardy
+E-mail: ludovic.gardy@cnrs.fr
+Encoding: UTF-8
+
+Related publication
+--------------------
+Title: A meta-analysis of semantic memory in prodromal Alzheimer’s Disease.
+Authors: Joubert S., Gardy L., Didic M., Rouleau I., Barbeau E.J.
+Journal: Neuropsychology Review, 31(2): 221-232, 2021.
+DOI: https://doi.org/10.1007/s11065-020-09453-5
+"""
+
+import numpy as np
+import pandas as pd
+
+from modules.meta_regression import fit_meta_regression, fit_meta_regression_batch
+
+
+def make_table():
+    rng = np.random.default_rng(0)
+    var = rng.uniform(0.05, 0.2, 12)
+    return pd.DataFrame(
+        {
+            "d": rng.normal(1, 0.4, 12),
+            "Var": var,
+            "Weight": 1 / var,
+            "MMSE_score": rng.uniform(24, 29, 12),
+            "Task_difficulty": ["Effortfull", "Effortless"] * 6,
+        }
+    ).assign(
+        MMSE_copy=lambda table: 2 * table["MMSE_score"],
+        Label=lambda table: table["Task_difficulty"].map({"Effortfull": "A"}),
+    )
+
+
+def test_batch_with_an_aliased_set():
+    table = make_table()
+    moderator_sets = [
+        ["MMSE_score"],
+        ["MMSE_score", "MMSE_copy"],  # aliased numeric moderators
+        ["Task_difficulty"],
+        ["MMSE_score", "Task_difficulty"],
+    ]
+
+    results = fit_meta_regression_batch(table, moderator_sets)
+
+    assert [result.estimable for result in results] == [True, False, True, True]
+    assert np.all(np.isnan(results[1].coefficients))
+    assert np.isnan(results[1].T_squared)
+    for moderators, result in zip(moderator_sets, results):
+        if result.estimable:
+            single = fit_meta_regression(table, moderators)
+            assert np.allclose(result.coefficients, single.coefficients)
+            assert np.all(np.isfinite(result.SE))
+
+
+def test_more_coefficients_than_studies():
+    table = make_table().iloc[:2]
+
+    results = fit_meta_regression_batch(table, [["MMSE_score"], ["MMSE_score", "d"]])
+
+    assert not results[0].estimable
+    assert not results[1].estimable
+    assert np.all(np.isnan(results[1].coefficients))
+
+
+def test_weighted_least_squares_without_heterogeneity():
+    table = make_table()
+    # Exact linear effect: no residual heterogeneity, so the fit is weighted least squares
+    table["d"] = 0.5 + 0.1 * table["MMSE_score"]
+
+    result = fit_meta_regression(table, ["MMSE_score"])
+
+    assert result.estimable
+    assert result.T_squared == 0
+    assert np.allclose(result.coefficients, [0.5, 0.1])
@@ -0,0 +1,106 @@
+"""
+Creation date: 2026, October
+Author: L. Gardy
+E-mail: ludovic.gardy@cnrs.fr
+Encoding: UTF-8
+
+Related publication
+--------------------
+Title: A meta-analysis of semantic memory in prodromal Alzheimer’s Disease.
+Authors: Joubert S., Gardy L., Didic M., Rouleau I., Barbeau E.J.
+Journal: Neuropsychology Review, 31(2): 221-232, 2021.
+DOI: https://doi.org/10.1007/s11065-020-09453-5
+"""
+
+import numpy as np
+import pytest
+from scipy.stats import rankdata
+
+from modules.calculate_random_effect import calculate_random_effect
+from modules.publication_bias import estimate_missing_studies, trim_and_fill
+
+# Asymmetric funnel: the small studies (large var) report the large effects
+Y = np.array([0.10, 0.18, 0.22, 0.25, 0.31, 0.45, 0.60, 0.78, 0.95, 1.20])
+VAR = np.array([0.010, 0.015, 0.012, 0.020, 0.030, 0.050, 0.080, 0.100, 0.150, 0.200])
+
+
+def naive_missing_studies(y, beta, estimator):
+    """L0 and R0 from the signed ranks of |y - beta|, ties ranked in the order of y."""
+    k = len(y)
+    deviations = y - beta
+    ranks = rankdata(np.abs(deviations), method="ordinal")
+    if estimator == "L0":
+        T_n = np.sum(ranks[deviations > 0])
+        return (4 * T_n - k * (k + 1)) / (2 * k - 1)
+    # Length of the run of positive deviations among the largest |y - beta|
+    signs = deviations[np.argsort(ranks)][::-1] > 0
+    run = k if np.all(signs) else int(np.argmin(signs))
+    return run - 1
+
+
+def naive_trim_and_fill(y, var, estimator):
+    """Trim the k0 largest effects, refit the fixed effect and re-estimate k0."""
+    k = len(y)
+    order = np.argsort(y)
+    y, var = y[order], var[order]
+    k0 = 0
+    while True:
+        W = 1 / var[: k - k0]
+        beta = np.sum(W * y[: k - k0]) / np.sum(W)
+        new_k0 = int(
+            min(max(0, round(naive_missing_studies(y, beta, estimator))), k - 1)
+        )
+        if new_k0 == k0:
+            return k0, 2 * beta - y[k - k0 :], var[k - k0 :]
+        k0 = new_k0
+
+
+@pytest.mark.parametrize("estimator", ["L0", "R0"])
+@pytest.mark.parametrize("beta", [0.0, 0.2, 0.28, 0.5, 2.0])
+def test_estimate_missing_studies_matches_signed_ranks(estimator, beta):
+    assert estimate_missing_studies(Y, beta, estimator) == pytest.approx(
+        naive_missing_studies(Y, beta, estimator)
+    )
+
+
+@pytest.mark.parametrize("estimator", ["L0", "R0"])
+@pytest.mark.parametrize("side", ["left", "right"])
+def test_trim_and_fill_matches_naive_loop(estimator, side):
+    sign = 1.0 if side == "left" else -1.0
+    Y_side = sign * Y
+
+    results = trim_and_fill(Y_side, VAR, estimator, side=side)
+    k0, filled_y, filled_var = naive_trim_and_fill(sign * Y_side, VAR, estimator)
+
+    assert results.k0 == k0 > 0
+    np.testing.assert_allclose(results.filled_d, sign * filled_y, rtol=1e-12)
+    np.testing.assert_allclose(results.filled_var, filled_var)
+
+    Y_filled = np.concatenate([Y_side, sign * filled_y])
+    var_filled = np.concatenate([VAR, filled_var])
+    adjusted = calculate_random_effect(
+        Y_filled, 1 / var_filled, var_filled, len(Y_filled)
+    )
+    assert results.Mstar_adjusted == pytest.approx(adjusted.Mstar, rel=1e-12)
+    assert sign * results.Mstar_adjusted < sign * results.Mstar
+
+
+def test_trim_and_fill_side_from_egger_intercept():
+    assert trim_and_fill(Y, VAR).side == "left"
+    assert trim_and_fill(-Y, VAR).side == "right"
+
+
+def test_symmetric_funnel_has_no_missing_studies():
+    Y_symmetric = np.array([-0.4, -0.2, 0.0, 0.2, 0.4])
+    var = np.array([0.2, 0.1, 0.05, 0.1, 0.2])
+
+    for estimator in ("L0", "R0"):
+        results = trim_and_fill(Y_symmetric, var, estimator, side="left")
+        assert results.k0 == 0
+        assert len(results.filled_d) == 0
+        assert results.Mstar_adjusted == pytest.approx(results.Mstar)
+
+
+def test_unknown_estimator():
+    with pytest.raises(ValueError):
+        estimate_missing_studies(Y, 0.3, "Q0")
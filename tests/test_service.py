@@ -0,0 +1,176 @@
+"""
+Creation date: 2026, October
+Author: L. Gardy
+E-mail: ludovic.gardy@cnrs.fr
+Encoding: UTF-8
+
+Related publication
+--------------------
+Title: A meta-analysis of semantic memory in prodromal Alzheimer’s Disease.
+Authors: Joubert S., Gardy L., Didic M., Rouleau I., Barbeau E.J.
+Journal: Neuropsychology Review, 31(2): 221-232, 2021.
+DOI: https://doi.org/10.1007/s11065-020-09453-5
+"""
+
+import asyncio
+import json
+import os
+import shutil
+import threading
+
+import pandas as pd
+
+from modules.meta_analysis import meta_analysis
+from modules.prepare_meta_dataframe import prepare_meta_dataframe
+from modules.service import MAX_HEADER_LINES, MetaAnalysisService, WarmDataset
+from modules.utils import get_authors_with_multiple_measures
+
+INPUT_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "input_data",
+    "input_data.csv",
+)
+
+
+async def send(port: int, request: bytes):
+    """Send one raw HTTP request and return (status, JSON payload)."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(request)
+    await writer.drain()
+    status_line = await reader.readline()
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        key, _, value = line.decode("latin-1").partition(":")
+        headers[key.strip().lower()] = value.strip()
+    body = await reader.readexactly(int(headers["content-length"]))
+    writer.close()
+    return int(status_line.split()[1]), json.loads(body)
+
+
+def get(port: int, path: str, method: str = "GET"):
+    return send(port, f"{method} {path} HTTP/1.1\r\nConnection: close\r\n\r\n".encode())
+
+
+def run_with_service(scenario, datasets: dict = None, **kwargs):
+    """Start a MetaAnalysisService on a free port and run scenario(service, port)."""
+    service = MetaAnalysisService(
+        datasets or {"main": WarmDataset(INPUT_PATH)}, **kwargs
+    )
+
+    async def main():
+        server = await asyncio.start_server(service.handle_connection, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            async with server:
+                return await scenario(service, port)
+        finally:
+            service.executor.shutdown(wait=True)
+
+    return asyncio.run(main())
+
+
+def test_random_effect_matches_the_pipeline(tmp_path):
+    input_data = pd.read_csv(INPUT_PATH)
+    meta_frame = prepare_meta_dataframe(
+        input_data,
+        get_authors_with_multiple_measures(input_data),
+        "Hedges_g",
+        output_dir=str(tmp_path),
+    )
+    _, fail_safe_N, _, random_effect_results = meta_analysis(
+        meta_frame, plot=False, output_dir=str(tmp_path), return_random_effect=True
+    )
+
+    async def scenario(service, port):
+        return await get(port, "/datasets/main/random_effect?method=Hedges_g")
+
+    status, payload = run_with_service(scenario)
+
+    assert status == 200
+    assert payload["studies"] == 22
+    assert payload["estimable"] is True
+    assert round(payload["Mstar"], 4) == 1.0233
+    assert abs(payload["Mstar"] - random_effect_results.Mstar) < 1e-12
+    assert abs(payload["T_squared"] - random_effect_results.T_squared) < 1e-12
+    assert payload["fail_safe_N"] == fail_safe_N == 185
+
+
+def test_single_study_groups_are_not_estimable():
+    async def scenario(service, port):
+        return await get(port, "/datasets/main/subgroup?group_by=Task")
+
+    status, payload = run_with_service(scenario)
+
+    assert status == 200
+    for group in payload["groups"]:
+        if group["studies"] < 2:
+            assert group["estimable"] is False
+            assert group["p_value"] is None
+            assert group["fail_safe_N"] is None
+        else:
+            assert group["estimable"] is True
+
+
+def test_client_errors_and_server_errors(tmp_path):
+    path = tmp_path / "input_data.csv"
+    shutil.copy(INPUT_PATH, path)
+    datasets = {"main": WarmDataset(str(path))}
+
+    async def scenario(service, port):
+        responses = [
+            await get(port, "/datasets/main/random_effect?Task_difficulty=Effortful"),
+            await get(port, "/datasets/main/fail_safe?alpha=2"),
+            await get(port, "/datasets/main/random_effect?method=Unknown"),
+            await send(
+                port,
+                b"GET /health HTTP/1.1\r\nContent-Length: abc\r\n\r\n",
+            ),
+            await send(
+                port,
+                b"GET /health HTTP/1.1\r\n"
+                # No blank line: all the bytes sent are read before the 431
+                + b"X-Header: 1\r\n" * MAX_HEADER_LINES,
+            ),
+        ]
+        os.remove(path)
+        responses.append(await get(port, "/datasets/main/reload", "POST"))
+        responses.append(await get(port, "/health"))
+        return responses
+
+    responses = run_with_service(scenario, datasets)
+    statuses = [status for status, _ in responses]
+
+    assert statuses == [400, 400, 400, 400, 431, 500, 200]
+    assert "Effortfull" in responses[0][1]["error"]
+    assert "FileNotFoundError" in responses[5][1]["error"]
+
+
+def test_busy_service_answers_503():
+    dataset = WarmDataset(INPUT_PATH)
+    release = threading.Event()
+    started = threading.Event()
+
+    def blocking_reload():
+        started.set()
+        release.wait(10)
+        return dataset.describe()
+
+    dataset.reload = blocking_reload
+
+    async def scenario(service, port):
+        pending = asyncio.ensure_future(get(port, "/datasets/main/reload", "POST"))
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 10)
+        busy = await get(port, "/datasets/main/random_effect")
+        release.set()
+        return busy, await pending, await get(port, "/datasets/main/random_effect")
+
+    busy, reloaded, after = run_with_service(
+        scenario, {"main": dataset}, workers=1, max_pending=1
+    )
+
+    assert busy[0] == 503
+    assert reloaded[0] == 200
+    assert after[0] == 200
@@ -0,0 +1,122 @@
+"""
+Creation date: 2026, October
+Author: L. Gardy
+E-mail: ludovic.gardy@cnrs.fr
+Encoding: UTF-8
+
+Related publication
+--------------------
+Title: A meta-analysis of semantic memory in prodromal Alzheimer’s Disease.
+Authors: Joubert S., Gardy L., Didic M., Rouleau I., Barbeau E.J.
+Journal: Neuropsychology Review, 31(2): 221-232, 2021.
+DOI: https://doi.org/10.1007/s11065-020-09453-5
+"""
+
+import numpy as np
+import pytest
+from scipy.optimize import brentq, minimize_scalar
+
+from modules.calculate_random_effect import (
+    calculate_random_effect,
+    calculate_random_effect_batch,
+    estimate_tau2_iterative,
+)
+
+Y = np.array([0.12, 0.85, 0.40, 1.30, -0.20, 0.95])
+VAR = np.array([0.04, 0.09, 0.05, 0.12, 0.07, 0.03])
+
+
+def weighted_residuals(tau2):
+    Wstar = 1 / (VAR + tau2)
+    Mstar = np.sum(Wstar * Y) / np.sum(Wstar)
+    return Wstar, (Y - Mstar) ** 2
+
+
+def reference_pm():
+    k = len(Y)
+
+    def generalised_Q(tau2):
+        Wstar, residuals_squared = weighted_residuals(tau2)
+        return np.sum(Wstar * residuals_squared)
+
+    return brentq(lambda t: generalised_Q(t) - (k - 1), 0, 10)
+
+
+def reference_reml():
+    def negative_restricted_log_likelihood(tau2):
+        Wstar, residuals_squared = weighted_residuals(tau2)
+        return 0.5 * (
+            np.sum(np.log(VAR + tau2))
+            + np.log(np.sum(Wstar))
+            + np.sum(Wstar * residuals_squared)
+        )
+
+    return minimize_scalar(
+        negative_restricted_log_likelihood,
+        bounds=(0, 10),
+        method="bounded",
+        options={"xatol": 1e-12},
+    ).x
+
+
+def reference_eb():
+    k = len(Y)
+
+    def fixed_point(tau2):
+        Wstar, residuals_squared = weighted_residuals(tau2)
+        return np.sum(Wstar * (k / (k - 1) * residuals_squared - VAR)) / np.sum(Wstar)
+
+    return brentq(lambda t: fixed_point(t) - t, 0, 10)
+
+
+@pytest.mark.parametrize(
+    "tau2_method, reference",
+    [("REML", reference_reml), ("PM", reference_pm), ("EB", reference_eb)],
+)
+def test_iterative_estimators_match_reference(tau2_method, reference):
+    results = calculate_random_effect(Y, 1 / VAR, VAR, len(Y), tau2_method=tau2_method)
+
+    assert results.tau2_method == tau2_method
+    assert 0 < results.iterations < 100
+    assert results.T_squared == pytest.approx(reference(), rel=1e-6)
+
+
+@pytest.mark.parametrize("tau2_method", ["REML", "PM", "EB"])
+def test_homogeneous_studies_have_no_between_studies_variance(tau2_method):
+    Y_homogeneous = np.array([0.5, 0.52, 0.49, 0.51])
+    var = np.array([0.1, 0.2, 0.15, 0.3])
+
+    results = calculate_random_effect(
+        Y_homogeneous, 1 / var, var, len(var), tau2_method=tau2_method
+    )
+
+    assert results.T_squared == 0
+
+
+@pytest.mark.parametrize("tau2_method", ["REML", "PM", "EB"])
+def test_batch_matches_single_analyses(tau2_method):
+    offsets = np.array([0, 1, 4, 6])
+
+    batch = calculate_random_effect_batch(
+        Y, 1 / VAR, VAR, offsets, tau2_method=tau2_method
+    )
+
+    assert batch.T_squared[0] == 0
+    for i in (1, 2):
+        group = slice(offsets[i], offsets[i + 1])
+        single = calculate_random_effect(
+            Y[group],
+            1 / VAR[group],
+            VAR[group],
+            offsets[i + 1] - offsets[i],
+            tau2_method=tau2_method,
+        )
+        assert batch.T_squared[i] == pytest.approx(single.T_squared, abs=1e-12)
+        assert batch.Mstar[i] == pytest.approx(single.Mstar, abs=1e-12)
+
+
+def test_unknown_estimator():
+    with pytest.raises(ValueError):
+        estimate_tau2_iterative(
+            Y, VAR, np.zeros(len(Y), dtype=np.int64), np.zeros(1), "ML"
+        )